@@ -0,0 +1,297 @@
+#! /usr/bin/env python
+"""Benchmark the hot paths of the nlds client against a local stand-in server.
+
+The stand-in server in benchmarks/server.py is started in its own process, and
+the client is pointed at it with a config file and token in a temporary home
+directory.  The token has expired, so the first request also goes through the
+token endpoint.  The benchmarks are:
+
+  * main_loop:             GET requests to catalog/list, one after another
+  * putlist:               put_filelist of --put_paths paths (1M by default)
+  * find_fetch:            find_file of --find_files files (500k by default)
+  * print_find:            print_find of that response, to /dev/null
+  * stat_fetch:            monitor_transactions of --status_records transactions
+  * get_transaction_state: get_transaction_state of each of those transactions
+
+Each benchmark is run --runs times and the median is recorded.  The results can
+be written as JSON with --output, and compared with those of an earlier run with
+--compare, which exits with a non-zero status if any rate has fallen by more than
+--max_regression.  Run it from the root of the repository:
+
+    python benchmarks/client.py --output results.json
+    python benchmarks/client.py --compare results.json
+
+--quick uses small sizes, to check that the benchmarks work.
+"""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+# the root of the repository, so that the client is benchmarked from the source
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API = "api/1.0"
+
+SIZES = {
+    "requests": 200,
+    "put_paths": 1_000_000,
+    "find_files": 500_000,
+    "status_records": 20_000,
+    "sub_records": 4,
+}
+QUICK_SIZES = {
+    "requests": 10,
+    "put_paths": 2000,
+    "find_files": 2000,
+    "status_records": 200,
+    "sub_records": 4,
+}
+
+
+def start_server(sizes: dict, latency: float):
+    """Start the stand-in server in a new process and return the process and the
+    URL it is listening on."""
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            SERVER,
+            "--latency",
+            str(latency),
+            "--find_files",
+            str(sizes["find_files"]),
+            "--status_records",
+            str(sizes["status_records"]),
+            "--sub_records",
+            str(sizes["sub_records"]),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    url = proc.stdout.readline().strip()
+    if not url:
+        proc.kill()
+        raise RuntimeError("The stand-in server did not start")
+    return proc, url
+
+
+def write_home(home: str, url: str):
+    """Write the config file and an expired token into a home directory."""
+    config = {
+        "server": {"url": url, "api": API},
+        "user": {"default_user": "bench", "default_group": "bench"},
+        "authentication": {
+            "oauth_client_id": "bench",
+            "oauth_client_secret": "bench",
+            "oauth_token_url": f"{url}/token",
+            "oauth_scopes": "bench",
+            "oauth_token_file_location": os.path.join(home, ".nlds-token"),
+        },
+        "object_storage": {
+            "tenancy": "bench",
+            "access_key": "bench",
+            "secret_key": "bench",
+        },
+        "options": {"verify_certificates": False},
+    }
+    with open(os.path.join(home, ".nlds-config"), "w") as fh:
+        json.dump(config, fh)
+    token = {
+        "access_token": "expired",
+        "refresh_token": "refresh",
+        "expires_at": 0,
+    }
+    with open(os.path.join(home, ".nlds-token"), "w") as fh:
+        json.dump(token, fh)
+
+
+def _timed(fn, runs: int):
+    """Call fn runs times, returning the median time and the last return value."""
+    times = []
+    value = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), value
+
+
+def _result(seconds: float, count: int, unit: str) -> dict:
+    return {
+        "seconds": seconds,
+        "count": count,
+        "rate": count / seconds if seconds > 0 else float("inf"),
+        "unit": unit,
+    }
+
+
+def run_benchmarks(sizes: dict, runs: int) -> dict:
+    """Run the benchmarks, with the config in $HOME pointing at the stand-in
+    server, and return the result of each."""
+    # imported here, as the location of the config file is read from $HOME when
+    # the client is imported
+    from nlds_client.clientlib.config import load_config
+    from nlds_client.clientlib.transactions import (
+        construct_server_url,
+        main_loop,
+        put_filelist,
+        find_file,
+        monitor_transactions,
+        get_transaction_state,
+    )
+    from nlds_client.clientlib.authentication import load_token
+    from nlds_client.nlds_client import print_find
+
+    results = {}
+    config = load_config()
+
+    url = construct_server_url(config, "catalog/list")
+    params = {"user": "bench", "group": "bench"}
+    n = sizes["requests"]
+
+    def _main_loop():
+        for _ in range(n):
+            assert main_loop(url, params)["success"]
+
+    results["main_loop"] = _result(_timed(_main_loop, runs)[0], n, "requests/s")
+    # the expired token was refreshed by the first request
+    assert load_token(config)["access_token"] != "expired"
+
+    n = sizes["put_paths"]
+
+    def _putlist():
+        paths = (f"/gws/bench/dir{i // 1000}/file{i}.nc" for i in range(n))
+        response = put_filelist(paths, job_label="bench")
+        assert response["success"] and response["n_bytes"] > n
+        return response
+
+    results["putlist"] = _result(_timed(_putlist, runs)[0], n, "paths/s")
+
+    n = sizes["find_files"]
+    seconds, response = _timed(lambda: find_file("bench", "bench"), runs)
+    results["find_fetch"] = _result(seconds, n, "files/s")
+
+    def _print_find():
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                print_find(response, "bench", False, False)
+
+    results["print_find"] = _result(_timed(_print_find, runs)[0], n, "files/s")
+
+    n = sizes["status_records"]
+    seconds, response = _timed(lambda: monitor_transactions("bench", "bench"), runs)
+    results["stat_fetch"] = _result(seconds, n, "transactions/s")
+    records = response["data"]["records"]
+
+    def _states():
+        for tr in records:
+            get_transaction_state(tr)
+
+    results["get_transaction_state"] = _result(
+        _timed(_states, runs)[0], n, "transactions/s"
+    )
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """Print the change in the rate of each benchmark from the baseline, and
+    return the descriptions of those that have fallen by more than
+    max_regression (a fraction)."""
+    failures = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result["rate"] / baseline[name]["rate"] - 1.0
+        print(f"{name:<24}{change:+8.1%}")
+        if change < -max_regression:
+            failures.append(f"{name} is {-change:.1%} slower than the baseline")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="number of runs")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="the latency of the stand-in server, in seconds",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="use small sizes, as a smoke test"
+    )
+    for key, value in SIZES.items():
+        parser.add_argument(f"--{key}", type=int, default=None, help=f"({value})")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument(
+        "--compare", default=None, help="compare with the JSON results of a run"
+    )
+    parser.add_argument(
+        "--max_regression",
+        type=float,
+        default=0.1,
+        help="the largest fall in a rate, as a fraction, allowed by --compare",
+    )
+    args = parser.parse_args()
+
+    sizes = dict(QUICK_SIZES if args.quick else SIZES)
+    for key in SIZES:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+
+    with tempfile.TemporaryDirectory() as home:
+        proc, url = start_server(sizes, args.latency)
+        try:
+            write_home(home, url)
+            os.environ["HOME"] = home
+            sys.path.insert(0, ROOT)
+            results = run_benchmarks(sizes, args.runs)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    document = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": args.runs,
+        "latency": args.latency,
+        "sizes": sizes,
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as fh:
+            json.dump(document, fh, indent=2)
+
+    for name, result in results.items():
+        print(
+            f"{name:<24}{result['seconds'] * 1e3:10.1f}ms"
+            f"{result['rate']:14.0f} {result['unit']}"
+        )
+
+    failures = []
+    if args.compare is not None:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["results"]
+        failures = compare(results, baseline, args.max_regression)
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#! /usr/bin/env python
+"""A lightweight local stand-in for the NLDS server, used by the benchmarks.
+
+It answers the endpoints that the client uses with canned responses:
+
+  * PUT  <api>/files/          putlist and put, the request body is read and counted
+  * PUT  <api>/files/getlist/  getlist, as above
+  * GET  <api>/catalog/list/   a list of --holdings holdings
+  * GET  <api>/catalog/find/   --find_files files, in one holding
+  * POST <api>/catalog/meta/   a metadata change
+  * GET  <api>/status/         --status_records transactions of --sub_records each
+  * POST /token                the OAuth2 token endpoint
+
+Every response is delayed by --latency seconds.  Responses are built once, the
+first time they are asked for, and encoded twice as the real server does.  The
+catalog endpoints honour the limit and offset parameters, so that the client's
+paging can be exercised.  Run
+it on its own with:
+
+    python benchmarks/server.py --port 8000 --latency 0.01
+
+It prints the URL it is listening on and serves until it is interrupted.
+"""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+API = "api/1.0"
+# files in each transaction of the catalog/find response
+FILES_PER_TRANSACTION = 10000
+SUB_RECORD_STATES = ["COMPLETE", "TRANSFER_PUTTING", "ARCHIVE_PUTTING", "FAILED"]
+
+
+def _encode(document) -> bytes:
+    """Encode a response document twice, as the NLDS server does."""
+    return json.dumps(json.dumps(document)).encode("utf-8")
+
+
+def list_response(n_holdings: int) -> dict:
+    holdings = [
+        {
+            "id": i,
+            "label": f"holding-{i}",
+            "user": "bench",
+            "group": "bench",
+            "tags": {"key": "value"},
+            "date": "2024-01-29T12:00:00.000000",
+            "transactions": [str(uuid.UUID(int=i))],
+        }
+        for i in range(n_holdings)
+    ]
+    return {"msg": "", "data": {"holdings": holdings}, "details": {}}
+
+
+def find_response(n_files: int) -> dict:
+    transactions = {}
+    for start in range(0, n_files, FILES_PER_TRANSACTION):
+        tid = str(uuid.UUID(int=start))
+        transactions[tid] = {
+            "id": start,
+            "transaction_id": tid,
+            "ingest_time": "2024-01-29T12:00:00.000000",
+            "filelist": [
+                {
+                    "original_path": f"/gws/bench/dir{i // 1000}/file{i}.nc",
+                    "path_type": "FILE",
+                    "link_path": None,
+                    "size": 1024 * i,
+                    "user": 1000,
+                    "group": 1000,
+                    "permissions": 0o644,
+                    "locations": [
+                        {
+                            "storage_type": "OBJECT_STORAGE",
+                            "root": "nlds.bench",
+                            "url": f"https://example.org/nlds.bench/file{i}.nc",
+                        },
+                        {"storage_type": "TAPE", "root": "", "url": None},
+                    ],
+                }
+                for i in range(start, min(start + FILES_PER_TRANSACTION, n_files))
+            ],
+        }
+    holding = {
+        "holding_id": 1,
+        "label": "bench",
+        "user": "bench",
+        "group": "bench",
+        "tags": {},
+        "transactions": transactions,
+    }
+    return {"msg": "", "data": {"holdings": {"1": holding}}, "details": {}}
+
+
+def status_response(n_records: int, n_sub_records: int) -> dict:
+    records = []
+    for i in range(n_records):
+        sub_records = [
+            {
+                "id": i * n_sub_records + j,
+                "sub_id": str(uuid.UUID(int=i * n_sub_records + j)),
+                "state": SUB_RECORD_STATES[(i + j) % len(SUB_RECORD_STATES)],
+                "retry_count": 0,
+                "last_updated": f"2024-01-29T12:{j % 60:02d}:{i % 60:02d}.000000",
+                "failed_files": [],
+            }
+            for j in range(n_sub_records)
+        ]
+        records.append(
+            {
+                "id": i,
+                "transaction_id": str(uuid.UUID(int=i)),
+                "user": "bench",
+                "group": "bench",
+                "api_action": "putlist",
+                "job_label": f"job-{i}",
+                "creation_time": "2024-01-29T11:00:00.000000",
+                "warnings": [],
+                "sub_records": sub_records,
+            }
+        )
+    return {"msg": "", "data": {"records": records}, "details": {}}
+
+
+def page_response(endpoint: str, document: dict, offset: int, limit: int) -> dict:
+    """Get the records from offset to offset + limit of a catalog response, as the
+    server does when it is asked for a page.  limit can be None for no limit."""
+    end = None if limit is None else offset + limit
+    if endpoint == "catalog/list":
+        holdings = document["data"]["holdings"][offset:end]
+        return dict(document, data={"holdings": holdings})
+    # catalog/find: the files are paged across the transactions of all the holdings
+    files = [
+        (hid, tid, f)
+        for hid, h in document["data"]["holdings"].items()
+        for tid, t in h["transactions"].items()
+        for f in t["filelist"]
+    ][offset:end]
+    holdings = {}
+    for hid, tid, f in files:
+        h = document["data"]["holdings"][hid]
+        holding = holdings.setdefault(hid, dict(h, transactions={}))
+        transaction = holding["transactions"].setdefault(
+            tid, dict(h["transactions"][tid], filelist=[])
+        )
+        transaction["filelist"].append(f)
+    return dict(document, data={"holdings": holdings})
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # the headers and body are written separately, which would otherwise wait for
+    # the client's delayed acknowledgement on every keep-alive request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> int:
+        """Read the request body, returning its length in bytes."""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            n_bytes = 0
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    # the (empty) trailer ends the body
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return n_bytes
+                n_bytes += len(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length", 0))
+        return len(self.rfile.read(length))
+
+    def _send(self, status: int, body: bytes):
+        time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _endpoint(self) -> str:
+        path = urlsplit(self.path).path.strip("/")
+        if path.startswith(API):
+            path = path[len(API) :].strip("/")
+        return path
+
+    def do_GET(self):
+        self._read_body()
+        endpoint = self._endpoint()
+        query = parse_qs(urlsplit(self.path).query)
+        if endpoint in ("catalog/list", "catalog/find") and (
+            "offset" in query or "limit" in query
+        ):
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query["limit"][0]) if "limit" in query else None
+            page = page_response(
+                endpoint, self.server.document(endpoint), offset, limit
+            )
+            self._send(200, _encode(page))
+        elif endpoint in ("catalog/list", "catalog/find", "status"):
+            self._send(200, self.server.response(endpoint))
+        else:
+            self._send(404, _encode({"detail": f"Unknown endpoint {endpoint}"}))
+
+    def do_PUT(self):
+        n_bytes = self._read_body()
+        endpoint = self._endpoint()
+        if endpoint in ("files", "files/getlist"):
+            action = "PUTLIST" if endpoint == "files" else "GETLIST"
+            body = {
+                "transaction_id": str(uuid.uuid4()),
+                "msg": f"{action} transaction accepted for processing",
+                "user": "bench",
+                "group": "bench",
+                "api_action": action.lower(),
+                "n_bytes": n_bytes,
+            }
+            self._send(202, _encode(body))
+        else:
+            self._send(404, _encode({"detail": f"Unknown endpoint {endpoint}"}))
+
+    def do_POST(self):
+        self._read_body()
+        endpoint = self._endpoint()
+        if endpoint == "token":
+            token = {
+                "access_token": uuid.uuid4().hex,
+                "refresh_token": uuid.uuid4().hex,
+                "token_type": "Bearer",
+                "expires_in": 3600,
+            }
+            self._send(200, json.dumps(token).encode("utf-8"))
+        elif endpoint == "catalog/meta":
+            body = {"msg": "", "data": {"holdings": []}, "details": {}}
+            self._send(200, _encode(body))
+        else:
+            self._send(404, _encode({"detail": f"Unknown endpoint {endpoint}"}))
+
+
+class StandInServer(ThreadingHTTPServer):
+    """The stand-in server.  The sizes are the number of holdings in catalog/list,
+    the number of files in catalog/find, and the number of transactions, and
+    sub-records of each, in status."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency: float = 0.0,
+        holdings: int = 10,
+        find_files: int = 1000,
+        status_records: int = 100,
+        sub_records: int = 4,
+    ):
+        super().__init__(address, StandInHandler)
+        self.latency = latency
+        self._builders = {
+            "catalog/list": lambda: list_response(holdings),
+            "catalog/find": lambda: find_response(find_files),
+            "status": lambda: status_response(status_records, sub_records),
+        }
+        self._documents = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def document(self, endpoint: str) -> dict:
+        with self._lock:
+            if endpoint not in self._documents:
+                self._documents[endpoint] = self._builders[endpoint]()
+            return self._documents[endpoint]
+
+    def response(self, endpoint: str) -> bytes:
+        document = self.document(endpoint)
+        with self._lock:
+            if endpoint not in self._responses:
+                self._responses[endpoint] = _encode(document)
+            return self._responses[endpoint]
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="in seconds")
+    parser.add_argument("--holdings", type=int, default=10)
+    parser.add_argument("--find_files", type=int, default=1000)
+    parser.add_argument("--status_records", type=int, default=100)
+    parser.add_argument("--sub_records", type=int, default=4)
+    args = parser.parse_args()
+
+    server = StandInServer(
+        ("127.0.0.1", args.port),
+        latency=args.latency,
+        holdings=args.holdings,
+        find_files=args.find_files,
+        status_records=args.status_records,
+        sub_records=args.sub_records,
+    )
+    # the first line of output is the URL, for the benchmarks to read
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+"""Benchmark the start up time of the nlds command line client.
+
+Two measurements are made, each in a fresh Python process:
+
+  * the cumulative import time of nlds_client.nlds_client, from -X importtime
+  * the wall time of `nlds --version`
+
+The median of each over a number of runs is printed, and the script exits with a
+non-zero status if either median is over its budget, or if any of the modules
+that should only be imported when a command runs (e.g. requests) are imported at
+start up.  Run it from the root of the repository:
+
+    python benchmarks/startup.py --runs 20
+"""
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# modules that must not be imported by `nlds --version`
+LAZY_MODULES = [
+    "requests",
+    "urllib3",
+    "nlds_client.clientlib.transactions",
+    "nlds_client.clientlib.submission",
+]
+
+VERSION_CMD = [
+    sys.executable,
+    "-c",
+    "import sys; sys.argv = ['nlds', '--version'];"
+    "from nlds_client.nlds_client import main; main()",
+]
+
+
+def import_time_us() -> int:
+    """Return the cumulative import time of nlds_client.nlds_client, in
+    microseconds, as reported by -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import nlds_client.nlds_client"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        # lines are "import time: self [us] | cumulative | imported package"
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == "nlds_client.nlds_client":
+            return int(fields[1])
+    raise RuntimeError("nlds_client.nlds_client not found in -X importtime output")
+
+
+def version_wall_time_s() -> float:
+    """Return the wall time of `nlds --version`, in seconds."""
+    start = time.perf_counter()
+    subprocess.run(VERSION_CMD, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def lazy_modules_imported() -> list:
+    """Return the LAZY_MODULES that are imported by `nlds --version`."""
+    code = (
+        "import sys, json; sys.argv = ['nlds', '--version'];"
+        "from nlds_client.nlds_client import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass\n"
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="number of runs")
+    parser.add_argument(
+        "--import-budget-ms",
+        type=float,
+        default=100.0,
+        help="maximum median import time of nlds_client.nlds_client",
+    )
+    parser.add_argument(
+        "--version-budget-ms",
+        type=float,
+        default=300.0,
+        help="maximum median wall time of `nlds --version`",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="output the results as JSON"
+    )
+    args = parser.parse_args()
+
+    import_ms = statistics.median(import_time_us() for _ in range(args.runs)) / 1e3
+    version_ms = (
+        statistics.median(version_wall_time_s() for _ in range(args.runs)) * 1e3
+    )
+    imported = lazy_modules_imported()
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(
+            f"import time {import_ms:.1f}ms is over budget "
+            f"({args.import_budget_ms:.1f}ms)"
+        )
+    if version_ms > args.version_budget_ms:
+        failures.append(
+            f"`nlds --version` time {version_ms:.1f}ms is over budget "
+            f"({args.version_budget_ms:.1f}ms)"
+        )
+    if imported:
+        failures.append(f"modules imported at start up: {', '.join(imported)}")
+
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "runs": args.runs,
+                    "import_ms": import_ms,
+                    "version_ms": version_ms,
+                    "lazy_modules_imported": imported,
+                    "failures": failures,
+                }
+            )
+        )
+    else:
+        print(f"import nlds_client.nlds_client: {import_ms:.1f}ms (median)")
+        print(f"nlds --version:                 {version_ms:.1f}ms (median)")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
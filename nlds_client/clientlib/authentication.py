@@ -9,6 +9,7 @@ __contact__ = "neil.massey@stfc.ac.uk"
 import json
 import os.path
 import getpass
+import time
 
 import requests
 from requests.auth import HTTPBasicAuth
@@ -17,6 +18,16 @@ import random
 import string
 from nlds_client.clientlib.exceptions import *
 from nlds_client.clientlib.nlds_client_setup import CONFIG_FILE_LOCATION
+from nlds_client.clientlib.session import get_session
+from nlds_client.clientlib.config import get_option
+from nlds_client.clientlib.filelock import file_lock, atomic_write
+from nlds_client.clientlib.timings import timed, count
+from nlds_client.clientlib import hooks
+
+# In-process cache of the token files that have been read, keyed on the path of the
+# token file.  Each entry is ((st_ino, st_mtime_ns, st_size), token), so the file is
+# only read and parsed again when it has changed on disk.
+_TOKEN_CACHE = {}
 
 
 def get_password(config):
@@ -110,6 +121,7 @@ def process_fetch_oauth2_token_response(config, response):
         )
 
 
+@timed("oauth")
 def fetch_oauth2_token(config, username, password):
     """Contact the OAuth2 token server using the URL in:
         config['authentication'][oauth_token_url]
@@ -150,33 +162,64 @@ def fetch_oauth2_token(config, username, password):
     }
     # contact the oauth_token_url to get a token, we expect a 200 status code to
     # be returned
-    response = requests.post(
+    start = time.perf_counter()
+    response = get_session(config).post(
         auth_config["oauth_token_url"], data=token_data, headers=token_headers
     )
+    if hooks.active("token_refresh"):
+        hooks.emit(
+            "token_refresh",
+            url=auth_config["oauth_token_url"],
+            grant_type=token_data["grant_type"],
+            status_code=response.status_code,
+            elapsed=time.perf_counter() - start,
+        )
     # determine if any errors occurred
     process_fetch_oauth2_token_response(config, response)
     # save the token details after converting to JSON
     token = json.loads(response.text)
+    _set_token_expiry(token)
     save_token(config, token)
     return token
 
 
-def fetch_oauth2_token_from_refresh(config):
+@timed("oauth")
+def fetch_oauth2_token_from_refresh(config, stale_token=None):
     """Get a new token using the refresh token from an existing bearer token.
     The refresh token will be loaded from the existing token.
 
+    Many processes may share the same token file, and may all find that the token
+    needs refreshing at the same time.  The refresh is done while holding a lock
+    on the token file, so only one process refreshes the token and the others wait
+    for it and then use the token that it saved.
+
     :param config: the configuration loaded by config.load_config
     :type config: Dict
 
+    :param stale_token: the token that the caller found had expired.  If the token
+        file holds a different token once the lock is held, then another process
+        has already refreshed it, and that token is returned instead.
+    :type stale_token: Dict, optional
+
     :return: the token Dictionary
     :rtype: Dict
 
     """
+    with file_lock(_token_file(config)):
+        token = load_token(config)
+        if (
+            stale_token is not None
+            and token.get("access_token") != stale_token.get("access_token")
+        ):
+            return token
+        return _refresh_token(config, token)
+
+
+def _refresh_token(config, token):
+    """Use the refresh token in token to fetch a new token, and save it.  Must be
+    called with the lock on the token file held."""
     auth_config = config["authentication"]
 
-    # load the OAuth token and get the refresh token
-    token = load_token(config)
-
     try:
         refresh_token = token["refresh_token"]
     except KeyError:
@@ -203,19 +246,54 @@ def fetch_oauth2_token_from_refresh(config):
     }
     # contact the oauth_token_url to get a token, we expect a 200 status code to
     # be returned
-    response = requests.post(
+    start = time.perf_counter()
+    response = get_session(config).post(
         auth_config["oauth_token_url"], data=token_data, headers=token_headers
     )
+    if hooks.active("token_refresh"):
+        hooks.emit(
+            "token_refresh",
+            url=auth_config["oauth_token_url"],
+            grant_type=token_data["grant_type"],
+            status_code=response.status_code,
+            elapsed=time.perf_counter() - start,
+        )
     # determine if any errors occurred
     process_fetch_oauth2_token_response(config, response)
     # save the token details after converting to JSON
     token = json.loads(response.text)
-    save_token(config, token)
+    _set_token_expiry(token)
+    _write_token(config, token)
+    count("token_refreshes")
     return token
 
 
+def _set_token_expiry(token):
+    """Add the time that the token expires at, as seconds since the epoch, to a
+    newly fetched token.  The token server only returns the number of seconds the
+    token is valid for ("expires_in") and this is relative to when it was fetched,
+    so the absolute time has to be saved with the token."""
+    if "expires_in" in token:
+        token["expires_at"] = time.time() + float(token["expires_in"])
+
+
+def _token_file(config):
+    """Get the full path of the token file from the config"""
+    return os.path.expanduser(config["authentication"]["oauth_token_file_location"])
+
+
+def _token_file_key(token_file):
+    """Get the key that changes whenever the token file is rewritten.  The token
+    file is replaced, rather than written in place, so it has a new inode each
+    time, even if the filesystem only records the mtime to the nearest second."""
+    st = os.stat(token_file)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@timed("token_io")
 def load_token(config):
-    """Load the OAuth2 token from a file
+    """Load the OAuth2 token from a file.  The token is cached in memory, and the
+    file is only read again if it has been changed since it was last read.
 
     :param config: the configuration loaded by config.load_config
     :type config: Dict
@@ -228,14 +306,20 @@ def load_token(config):
     """
     # subset the config to the authentication section
     auth_config = config["authentication"]
+    token_file = _token_file(config)
     try:
+        key = _token_file_key(token_file)
+        cached = _TOKEN_CACHE.get(token_file)
+        if cached is not None and cached[0] == key:
+            return cached[1]
         # Open the token file and load it in
-        token_file = os.path.expanduser(auth_config["oauth_token_file_location"])
         fh = open(token_file)
         token = json.load(fh)
         fh.close()
+        _TOKEN_CACHE[token_file] = (key, token)
         return token
     except FileNotFoundError:
+        _TOKEN_CACHE.pop(token_file, None)
         raise FileNotFoundError(
             "The OAuth2 token file cannot be read from: "
             f"{auth_config['oauth_token_file_location']}"
@@ -243,7 +327,10 @@ def load_token(config):
 
 
 def save_token(config, token):
-    """Save the OAuth2 token to a file
+    """Save the OAuth2 token to a file.  The file is replaced atomically, while
+    holding the lock on the token file, so that other processes sharing the file
+    never read a partly written token.
+
     :param : the configuration loaded by config.load_config
     :type config: Dict
 
@@ -252,13 +339,20 @@ def save_token(config, token):
     :return: None
 
     """
+    with file_lock(_token_file(config)):
+        _write_token(config, token)
+
+
+@timed("token_io")
+def _write_token(config, token):
+    """Write the token to the token file.  Must be called with the lock on the
+    token file held."""
     auth_config = config["authentication"]
 
     try:
-        token_file = os.path.expanduser(auth_config["oauth_token_file_location"])
-        fh = open(token_file, "w")
-        json.dump(token, fh)
-        fh.close()
+        token_file = _token_file(config)
+        atomic_write(token_file, json.dumps(token))
+        _TOKEN_CACHE[token_file] = (_token_file_key(token_file), token)
     except FileNotFoundError:
         raise FileNotFoundError(
             "The OAuth2 token file cannot be written to: "
@@ -266,6 +360,77 @@ def save_token(config, token):
         )
 
 
+def remove_token(config, token):
+    """Remove the token file, so that a new token will be fetched with the
+    password flow.  The file is only removed if it still contains token: if
+    another process has already replaced it with a new token then that one is
+    kept.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict
+
+    :param token: the token that was rejected, or None to remove the file whatever
+        it contains
+    :type token: Dict
+
+    :return: None
+    """
+    token_file = _token_file(config)
+    with file_lock(token_file):
+        try:
+            current = load_token(config)
+        except FileNotFoundError:
+            return
+        if token is None or current.get("access_token") == token.get("access_token"):
+            os.remove(token_file)
+            _TOKEN_CACHE.pop(token_file, None)
+
+
+def token_expiring(config, token):
+    """Determine whether the token has expired, or will expire within the
+    ['options']['token_refresh_margin'] number of seconds.  Tokens saved by older
+    versions of the client do not have an expiry time, and are never considered to
+    be expiring.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict
+
+    :param token: the token loaded by load_token
+    :type token: Dict
+
+    :return: whether the token should be refreshed
+    :rtype: bool
+    """
+    if "expires_at" not in token:
+        return False
+    margin = get_option(config, "token_refresh_margin")
+    return time.time() + margin >= token["expires_at"]
+
+
+def get_token(config):
+    """Get the OAuth2 token, refreshing it first if it is about to expire.  This
+    saves making a request that the server will reject, and then refreshing the
+    token and making the request again.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict
+
+    :raises FileNotFoundError: if the token file could not be found or read
+
+    :return: the token Dictionary
+    :rtype: Dict
+    """
+    token = load_token(config)
+    if token_expiring(config, token):
+        try:
+            token = fetch_oauth2_token_from_refresh(config, token)
+        except (AuthenticationError, RequestError):
+            # use the existing token - if the server rejects it then the caller
+            # will deal with it in the same way as for any rejected token
+            pass
+    return token
+
+
 def process_fetch_s3_access_keys_response(tenancy, response):
     """Process the return from fetching a new pair of access keys from the S3 server
 
@@ -319,7 +484,7 @@ def process_fetch_s3_access_keys_response(tenancy, response):
         )
 
 
-def fetch_s3_access_keys(tenancy, username, password):
+def fetch_s3_access_keys(tenancy, username, password, config=None):
     """Contact the S3 tenancy using the URL in:
         tenancy,
     using the user details from:
@@ -336,6 +501,10 @@ def fetch_s3_access_keys(tenancy, username, password):
     :param password: password for HTTP basic authentication
     :type password: string
 
+    :param config: the configuration loaded by config.load_config, used to set up
+        the HTTP session if it has not been created yet
+    :type config: Dict, optional
+
     :return: A Dictionary containing the access key details
     :rtype: Dict
 
@@ -352,7 +521,7 @@ def fetch_s3_access_keys(tenancy, username, password):
         "X-Custom-Meta-Source": description,
         "X-User-Token-Expires-Meta": expires.strftime("%Y-%m-%d"),
     }
-    response = requests.post(
+    response = get_session(config).post(
         url,
         headers=headers,
         auth=HTTPBasicAuth(username, password),
@@ -0,0 +1,197 @@
+"""An optional SQLite cache of the responses to catalog list and find queries."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, Iterator
+
+from nlds_client.clientlib.config import get_option
+
+# The responses to catalog/find and catalog/list queries are cached in a SQLite
+# database, keyed on the URL and the query parameters.  The responses are stored
+# as the text of the (inner) JSON document returned by the server.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS queries_accessed ON queries (accessed);
+"""
+
+
+def cache_enabled(config: Dict, cache: bool = None) -> bool:
+    """Determine whether the query cache is used, from the argument or, if that is
+    None, from the ['options']['query_cache'] setting in the config."""
+    if cache is None:
+        cache = get_option(config, "query_cache")
+    return bool(cache)
+
+
+def query_key(url: str, input_params: Dict) -> str:
+    """Build the key for a query from the URL and the query parameters.  The
+    parameters are sorted so that the same query always has the same key."""
+    return json.dumps([url, input_params], sort_keys=True, default=str)
+
+
+def _connect(config: Dict):
+    """Open the cache database, creating it if it does not exist."""
+    cache_file = os.path.expanduser(get_option(config, "query_cache_file"))
+    conn = sqlite3.connect(cache_file, timeout=10)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def lookup_query(
+    config: Dict, url: str, input_params: Dict, max_age: float = None
+) -> str:
+    """Get the cached response to a query.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict
+
+    :param url: the URL of the query
+    :type url: string
+
+    :param input_params: the parameters of the query
+    :type input_params: Dict
+
+    :param max_age: the maximum age of the response in seconds, or None to return
+        the response however old it is
+    :type max_age: float, optional
+
+    :return: the text of the cached response, or None if there is no response in
+        the cache, or it is older than max_age
+    :rtype: string
+    """
+    key = query_key(url, input_params)
+    now = time.time()
+    try:
+        conn = _connect(config)
+    except sqlite3.Error:
+        return None
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT created, response FROM queries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (max_age is not None and now - row[0] > max_age):
+                return None
+            conn.execute("UPDATE queries SET accessed = ? WHERE key = ?", (now, key))
+        return row[1]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def store_query(config: Dict, url: str, input_params: Dict, response: str):
+    """Store the response to a query in the cache, then evict the least recently
+    used responses until the cache is smaller than
+    ['options']['query_cache_max_bytes'].  A response larger than this is not
+    stored.  Errors writing to the cache are ignored, as the cache is only an
+    optimisation.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict
+
+    :param url: the URL of the query
+    :type url: string
+
+    :param input_params: the parameters of the query
+    :type input_params: Dict
+
+    :param response: the text of the response
+    :type response: string
+    """
+    max_bytes = get_option(config, "query_cache_max_bytes")
+    size = len(response.encode("utf-8"))
+    if max_bytes is not None and size > max_bytes:
+        return
+    key = query_key(url, input_params)
+    now = time.time()
+    try:
+        conn = _connect(config)
+    except sqlite3.Error:
+        return
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, size, response),
+            )
+            if max_bytes is not None:
+                _evict(conn, max_bytes)
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+
+
+def _evict(conn, max_bytes: int):
+    """Delete the least recently used responses until the total size of the
+    responses is at most max_bytes."""
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM queries").fetchone()[0]
+    if total <= max_bytes:
+        return
+    rows = conn.execute("SELECT key, size FROM queries ORDER BY accessed")
+    evict = []
+    for key, size in rows:
+        if total <= max_bytes:
+            break
+        evict.append((key,))
+        total -= size
+    conn.executemany("DELETE FROM queries WHERE key = ?", evict)
+
+
+def clear_cache(config: Dict):
+    """Delete all of the responses in the cache."""
+    conn = _connect(config)
+    try:
+        with conn:
+            conn.execute("DELETE FROM queries")
+    finally:
+        conn.close()
+
+
+class TextRecorder:
+    """Record the text chunks of a response as they are passed to the parser, so
+    that the response can be stored in the cache once it has been parsed.  If the
+    response is longer than max_chars then recording stops, and text is None.
+
+    :param max_chars: the maximum number of characters to record, or None for no
+        limit
+    :type max_chars: int, optional
+    """
+
+    def __init__(self, max_chars: int = None):
+        self._max_chars = max_chars
+        self._chunks = []
+        self._length = 0
+
+    def record(self, text_chunks: Iterable[str]) -> Iterator[str]:
+        """Pass the text chunks through, recording each one."""
+        for chunk in text_chunks:
+            if self._chunks is not None:
+                self._length += len(chunk)
+                if self._max_chars is not None and self._length > self._max_chars:
+                    self._chunks = None
+                else:
+                    self._chunks.append(chunk)
+            yield chunk
+
+    @property
+    def text(self) -> str:
+        """The recorded text, or None if it was too long to record."""
+        if self._chunks is None:
+            return None
+        return "".join(self._chunks)
@@ -0,0 +1,213 @@
+"""Checkpoint files recording the progress of chunked submissions, to resume them."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List
+
+from nlds_client.clientlib.config import get_option
+from nlds_client.clientlib.exceptions import UsageError
+
+# A chunked submission records its progress in a checkpoint file, one JSON
+# document per line, so that it can be resumed if it is interrupted.  The first
+# line is a header describing the submission.  Each chunk then has a "submitting"
+# line, written before it is sent, and an "accepted" or "rejected" line, written
+# once the server has responded.  The file is only ever appended to, so an
+# interruption loses at most the line being written.
+
+
+def chunk_hash(chunk: List[str]) -> str:
+    """The SHA-256 hash of the filepaths in a chunk, each followed by a newline."""
+    h = hashlib.sha256()
+    for fp in chunk:
+        h.update(fp.encode("utf-8", "surrogateescape"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def checkpoint_path(config: Dict, action: str, job_label: str) -> str:
+    """Get the path of the checkpoint file of a job.  The job label is made safe
+    to use in a file name, with a hash of it added so that different labels never
+    share a file."""
+    directory = os.path.expanduser(get_option(config, "checkpoint_dir"))
+    safe_label = re.sub(r"[^A-Za-z0-9._-]", "_", job_label)[:64]
+    label_hash = hashlib.sha256(job_label.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(directory, f"{action}-{safe_label}-{label_hash}.jsonl")
+
+
+def read_header(config: Dict, action: str, job_label: str) -> Dict:
+    """Get the header of the checkpoint of a job, which describes the submission,
+    or None if the job has no checkpoint."""
+    path = checkpoint_path(config, action, job_label)
+    try:
+        with open(path) as fh:
+            return json.loads(fh.readline())
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        return {}
+
+
+class Checkpoint:
+    """The checkpoint of a chunked submission.  Use open_checkpoint to create one.
+    The record methods can be called from several threads at the same time.
+
+    :param path: the path of the checkpoint file
+    :type path: string
+
+    :param header: the description of the submission
+    :type header: Dict
+    """
+
+    def __init__(self, path: str, header: Dict):
+        self.path = path
+        self.header = header
+        # chunk index: entry, for the chunks that have been accepted
+        self.accepted = {}
+        # chunk index: entry, for the chunks that were sent but not acknowledged
+        self.submitting = {}
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def _load(self):
+        """Read the chunks from an existing checkpoint file."""
+        with open(self.path) as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line may have been cut short by the interruption
+                    continue
+                status = entry.get("status")
+                if status == "accepted":
+                    self.accepted[entry["chunk"]] = entry
+                    self.submitting.pop(entry["chunk"], None)
+                elif status == "submitting":
+                    self.submitting[entry["chunk"]] = entry
+                elif status == "rejected":
+                    self.submitting.pop(entry["chunk"], None)
+
+    def _append(self, entry: Dict):
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, "a")
+            self._fh.write(json.dumps(entry) + "\n")
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def check_chunk(self, idx: int, digest: str) -> Dict:
+        """Get the entry of a chunk that was accepted, or sent but not
+        acknowledged, by a previous run, checking that the chunk has the same
+        filepaths as it did then.
+
+        :raises UsageError: if the filepaths in the chunk have changed
+
+        :return: the entry, or None if the chunk was not sent by a previous run
+        :rtype: Dict
+        """
+        entry = self.accepted.get(idx) or self.submitting.get(idx)
+        if entry is not None and entry["filelist_hash"] != digest:
+            raise UsageError(
+                f"The filelist has changed since job {self.header['job_label']} "
+                f"was interrupted, at chunk {idx}, so it cannot be resumed.  The "
+                f"checkpoint is in {self.path}"
+            )
+        return entry
+
+    def record(
+        self, status: str, idx: int, transaction_id: str, digest: str, n_files: int
+    ):
+        """Record that a chunk is about to be sent ("submitting"), or that the
+        server has "accepted" or "rejected" it."""
+        entry = {
+            "status": status,
+            "chunk": idx,
+            "transaction_id": str(transaction_id),
+            "filelist_hash": digest,
+            "n_files": n_files,
+        }
+        self._append(entry)
+        if status == "accepted":
+            with self._lock:
+                self.accepted[idx] = entry
+
+    def close(self):
+        """Close the checkpoint file, keeping it so that the job can be resumed."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def remove(self):
+        """Close and delete the checkpoint file, once the job has been
+        submitted in full."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def open_checkpoint(
+    config: Dict, action: str, job_label: str, header: Dict, resume: bool = False
+) -> Checkpoint:
+    """Start the checkpoint of a chunked submission, or load it to resume the
+    submission.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict
+
+    :param action: the action of the submission, "put" or "get"
+    :type action: string
+
+    :param job_label: the job label of the submission
+    :type job_label: string
+
+    :param header: the parameters of the submission that must be the same when it
+        is resumed, e.g. the holding and the chunk sizes
+    :type header: Dict
+
+    :param resume: load the existing checkpoint of the job.  If this is False then
+        any existing checkpoint is replaced.
+    :type resume: bool, optional
+
+    :raises UsageError: if resuming a job that has no checkpoint, e.g. because it
+        was submitted in full or the job label is wrong, or that was submitted
+        with different parameters
+
+    :return: the checkpoint
+    :rtype: Checkpoint
+    """
+    path = checkpoint_path(config, action, job_label)
+    header = dict(header, action=action, job_label=job_label)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    if resume:
+        # starting again would submit every chunk a second time
+        previous = read_header(config, action, job_label)
+        if previous is None:
+            raise UsageError(f"No checkpoint for job {job_label} to resume ({path})")
+        if previous != header:
+            different = sorted(
+                k
+                for k in set(previous) | set(header)
+                if previous.get(k) != header.get(k)
+            )
+            raise UsageError(
+                f"Job {job_label} cannot be resumed, as it was submitted with a "
+                f"different {', '.join(different)}.  The checkpoint is in {path}"
+            )
+        checkpoint = Checkpoint(path, header)
+        checkpoint._load()
+        return checkpoint
+
+    with open(path, "w") as fh:
+        fh.write(json.dumps(header) + "\n")
+    return Checkpoint(path, header)
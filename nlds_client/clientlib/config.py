@@ -6,18 +6,25 @@ __copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
 __license__ = "BSD - see LICENSE file in top-level package directory"
 __contact__ = "neil.massey@stfc.ac.uk"
 
+import copy
 import json
 import os.path
 import pwd, grp, getpass
 
 from nlds_client.clientlib.nlds_client_setup import get_config_file_location
 from nlds_client.clientlib.exceptions import ConfigError
+from nlds_client.clientlib.timings import timed
 
 TEMPLATE_FILE_LOCATION = os.path.join(
     os.path.dirname(__file__), "../templates/nlds-config.j2"
 )
 CONFIG_FILE_LOCATION = get_config_file_location()
 
+# The last config loaded by load_config, after it has been validated, as
+# ((st_ino, st_mtime_ns, st_size), config).  The config file is only read again
+# when it has changed on disk.
+_CONFIG_CACHE = None
+
 
 def validate_config_file(json_config):
     """Validate the JSON config file to match the schema in load_config_file."""
@@ -104,6 +111,7 @@ def validate_config_file(json_config):
             )
 
 
+@timed("config")
 def load_config():
     """Config file for the client contains:
     server : {
@@ -127,19 +135,31 @@ def load_config():
         secret_key : <os_secret_key>
 
     }
+    The validated config is cached, and the file is only read again if it has
+    changed since it was last read.  Each call returns a copy of the config, so
+    callers can modify it.
     """
+    global _CONFIG_CACHE
     # Location of config file is {CONFIG_FILE_LOCATION}.  Open it, checking
     # that it exists as well.
+    config_file = os.path.expanduser(f"{CONFIG_FILE_LOCATION}")
     try:
-        fh = open(os.path.expanduser(f"{CONFIG_FILE_LOCATION}"))
+        st = os.stat(config_file)
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached = _CONFIG_CACHE
+        if cached is not None and cached[0] == key:
+            return copy.deepcopy(cached[1])
+        fh = open(config_file)
     except FileNotFoundError:
+        _CONFIG_CACHE = None
         raise FileNotFoundError(
             f"The config file cannot be found {CONFIG_FILE_LOCATION}"
         )
 
     # Load the JSON file, ensuring it is correctly formatted
     try:
-        json_config = json.load(fh)
+        with fh:
+            json_config = json.load(fh)
     except json.JSONDecodeError as je:
         raise ConfigError(
             f"The config file at {CONFIG_FILE_LOCATION} has an error at "
@@ -150,7 +170,16 @@ def load_config():
     # format
     validate_config_file(json_config)
 
-    return json_config
+    _CONFIG_CACHE = (key, json_config)
+    return copy.deepcopy(json_config)
+
+
+def invalidate_config_cache():
+    """Discard the cached config, so that the next call to load_config reads the
+    config file again.  Called whenever the client writes to the config file."""
+    global _CONFIG_CACHE
+    _CONFIG_CACHE = None
+
 
 def get_user_config(user: str = None):
     # if the user is None then get the user
@@ -210,6 +239,7 @@ def create_config(
     # fail if it already exists
     with open(os.path.expanduser(f"{CONFIG_FILE_LOCATION}"), "x") as f:
         json.dump(template_contents, f, indent=4)
+    invalidate_config_cache()
 
     # Lastly, validate the config file to make sure we're not missing anyhting
     validate_config_file(template_contents)
@@ -226,6 +256,7 @@ def write_auth_section(config, auth_config):
     config["authentication"] |= auth_config
     with open(os.path.expanduser(f"{CONFIG_FILE_LOCATION}"), "w") as f:
         json.dump(config, f, indent=4)
+    invalidate_config_cache()
 
 
 def write_os_section(config, os_config):
@@ -235,6 +266,7 @@ def write_os_section(config, os_config):
     config["object_storage"] |= os_config
     with open(os.path.expanduser(f"{CONFIG_FILE_LOCATION}"), "w") as f:
         json.dump(config, f, indent=4)
+    invalidate_config_cache()
 
 
 def get_user(config, user):
@@ -255,6 +287,52 @@ def get_group(config, group):
 
 _DEFAULT_OPTIONS = {
     "verify_certificates": True,
+    # HTTP connection pooling, see clientlib/session.py
+    "http_pool_connections": 4,
+    "http_pool_maxsize": 10,
+    "http_keep_alive": True,
+    # chunked submission of filelists, see clientlib/submission.py
+    "submit_chunk_files": None,
+    "submit_chunk_bytes": None,
+    "submit_workers": 4,
+    # where the checkpoints of chunked submissions are kept, see
+    # clientlib/checkpoint.py
+    "checkpoint_dir": "~/.nlds-checkpoints",
+    # send filelists in request bodies as they are generated, see
+    # clientlib/streaming.py
+    "stream_request_bodies": True,
+    # number of directories listed at the same time, see clientlib/scan.py
+    "scan_workers": 8,
+    # number of threads resolving filepaths for getlist, see clientlib/resolve.py
+    "resolve_workers": 8,
+    # interval between polls in seconds for `nlds stat --watch`, see
+    # clientlib/monitor.py
+    "watch_min_interval": 2,
+    "watch_max_interval": 60,
+    # refresh the OAuth token this many seconds before it expires
+    "token_refresh_margin": 60,
+    # request holdings and files a page at a time in `nlds list` and `nlds find`
+    "catalog_page_size": None,
+    # cache the responses to `nlds list` and `nlds find`, see clientlib/cache.py
+    "query_cache": False,
+    "query_cache_file": "~/.nlds-query-cache.sqlite",
+    "query_cache_ttl": 300,
+    "query_cache_max_bytes": 64 * 1024 * 1024,
+    # local journal of the submitted transactions, see clientlib/journal.py
+    "journal": True,
+    "journal_file": "~/.nlds-journal.jsonl",
+    "journal_max_bytes": 4 * 1024 * 1024,
+    # resubmission of failed files by `nlds retry`, see clientlib/retry.py.  Files
+    # whose failure reason matches one of the regular expressions are not retried
+    "retry_chunk_files": 1000,
+    "retry_permanent_reasons": [
+        "does not exist",
+        "not found",
+        "no such file",
+        "already exists",
+    ],
+    # local mirror of the catalog, see clientlib/mirror.py
+    "catalog_mirror_file": "~/.nlds-catalog.sqlite",
 }
 
 
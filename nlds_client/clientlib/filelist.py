@@ -0,0 +1,53 @@
+"""Lazy reading of putlist and getlist filelists, from a file or stdin."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import sys
+from typing import IO, Iterator
+
+
+def open_filelist(filelist: str) -> Iterator[str]:
+    """Open a file containing a list of filepaths, one per line, and return an
+    iterator over the filepaths.  The file is read lazily, a line at a time, so
+    the memory used does not depend on the length of the list.  Leading and
+    trailing whitespace is stripped from each line, and empty lines are skipped.
+
+    :param filelist: the path of the file, or "-" to read the list from stdin
+    :type filelist: string
+
+    :raises FileNotFoundError: if the file does not exist.  This is raised by
+        open_filelist, rather than when the iterator is first used.
+
+    :return: an iterator over the filepaths
+    :rtype: Iterator[string]
+    """
+    if filelist == "-":
+        return iter_filelist(sys.stdin, close=False)
+    return iter_filelist(open(filelist), close=True)
+
+
+def iter_filelist(fh: IO[str], close: bool = False) -> Iterator[str]:
+    """Iterate over the filepaths in an open file, one per line, skipping empty
+    lines.
+
+    :param fh: the open file
+    :type fh: IO[str]
+
+    :param close: close the file when the iterator finishes
+    :type close: bool, optional
+
+    :return: an iterator over the filepaths
+    :rtype: Iterator[string]
+    """
+    try:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if close:
+            fh.close()
@@ -0,0 +1,74 @@
+"""An exclusive lock file shared between processes, e.g. to refresh the token."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not a POSIX system
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on the lock file `path` + ".lock" for the duration of
+    the with block.  The lock is shared between all processes on all hosts that
+    can see the file, as long as the filesystem supports flock (local filesystems
+    and NFS both do).  On systems without fcntl no lock is taken.
+
+    :param path: the path of the file to lock
+    :type path: string
+    """
+    if fcntl is None:
+        yield
+        return
+    lock_path = path + ".lock"
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # closing the file releases the lock
+        os.close(fd)
+
+
+def atomic_write(path: str, data: str, mode: int = 0o600):
+    """Write data to the file at path, so that any process reading the file sees
+    either the old contents or the new contents, never a partly written file.  The
+    data is written to a temporary file in the same directory, which is then
+    renamed over the original.
+
+    :param path: the path of the file to write
+    :type path: string
+
+    :param data: the text to write to the file
+    :type data: string
+
+    :param mode: the permissions of the file
+    :type mode: int
+
+    :raises FileNotFoundError: if the directory of the file does not exist
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", dir=directory or ".")
+    try:
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, mode)
+        with os.fdopen(fd, "w") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,96 @@
+"""A registry of callbacks for the lifecycle of the client's requests."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import threading
+from typing import Callable, Dict
+
+from nlds_client.clientlib.exceptions import UsageError
+
+# Callbacks for the lifecycle of the requests made by the client, so that programs
+# embedding the client can measure them.  Each callback is called with one
+# Dictionary describing the event, which always contains "event", the name of the
+# event.  The events, and the other keys they contain, are:
+#
+#   request_start:  method, url, attempt
+#   request_end:    method, url, attempt, status_code, elapsed, bytes_sent,
+#                   bytes_received, error
+#   retry:          method, url, attempt, status_code, reason
+#   token_refresh:  url, grant_type, status_code, elapsed
+#   decode:         url, elapsed, bytes_received, streamed
+#
+# elapsed is in seconds.  status_code and error are None if the server could not
+# be reached, or responded, respectively.  bytes_received is None in request_end
+# for a response that is decoded as it arrives, and is given in its decode event,
+# whose elapsed then includes the time taken by the caller to consume the
+# stream.  Callbacks are called in the thread that made the request, and any
+# exception they raise is passed on to the caller of the client function.
+#
+# When no callback is registered for an event, the client does not build the
+# event at all.
+
+EVENTS = ("request_start", "request_end", "retry", "token_refresh", "decode")
+
+# event name: tuple of callbacks, only for events with a callback registered.  The
+# tuples are replaced, never changed, so emit does not need to hold the lock
+_HOOKS = {}
+_LOCK = threading.Lock()
+
+
+def register(event: str, callback: Callable[[Dict], None]) -> Callable:
+    """Register a callback for an event.
+
+    :param event: the name of the event, one of EVENTS
+    :type event: string
+
+    :param callback: the function to call with the Dictionary of each event
+    :type callback: Callable[[Dict], None]
+
+    :raises UsageError: if the event is not one of EVENTS
+
+    :return: the callback
+    :rtype: Callable
+    """
+    if event not in EVENTS:
+        raise UsageError(
+            f"Unknown hook event {event}, it must be one of {', '.join(EVENTS)}"
+        )
+    with _LOCK:
+        _HOOKS[event] = _HOOKS.get(event, ()) + (callback,)
+    return callback
+
+
+def unregister(event: str, callback: Callable[[Dict], None]):
+    """Remove a callback registered for an event.  Does nothing if it is not
+    registered."""
+    with _LOCK:
+        callbacks = tuple(cb for cb in _HOOKS.get(event, ()) if cb != callback)
+        if callbacks:
+            _HOOKS[event] = callbacks
+        else:
+            _HOOKS.pop(event, None)
+
+
+def clear():
+    """Remove all of the registered callbacks."""
+    with _LOCK:
+        _HOOKS.clear()
+
+
+def active(event: str) -> bool:
+    """Determine whether any callback is registered for an event."""
+    return event in _HOOKS
+
+
+def emit(event: str, **info):
+    """Call the callbacks registered for an event with the details of the event."""
+    callbacks = _HOOKS.get(event)
+    if not callbacks:
+        return
+    info["event"] = event
+    for callback in callbacks:
+        callback(info)
@@ -0,0 +1,163 @@
+"""A local journal of the transactions submitted by the client."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+
+from nlds_client.clientlib.config import get_option
+from nlds_client.clientlib.filelock import file_lock, atomic_write
+
+# The transactions submitted by the client are appended to a local journal, one
+# JSON document per line, so that they can be found again with a lookup of their
+# transaction ids, rather than a search of all the user's transactions.
+
+
+def journal_enabled(config: Dict) -> bool:
+    """Determine whether transactions are recorded in the journal, from the
+    ['options']['journal'] setting in the config."""
+    return bool(get_option(config, "journal"))
+
+
+def _journal_file(config: Dict) -> str:
+    return os.path.expanduser(get_option(config, "journal_file"))
+
+
+class FilelistDigest:
+    """Count and hash the filepaths of a filelist as they are sent, so that they
+    can be recorded in the journal without keeping the filelist."""
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.n_files = 0
+
+    def wrap(self, filelist: Iterable[str]) -> Iterator[str]:
+        """Pass the filepaths through, adding each one to the digest."""
+        for fp in filelist:
+            self._hash.update(fp.encode("utf-8", "surrogateescape"))
+            self._hash.update(b"\n")
+            self.n_files += 1
+            yield fp
+
+    @property
+    def hexdigest(self) -> str:
+        """The SHA-256 hash of the filepaths, each followed by a newline."""
+        return self._hash.hexdigest()
+
+
+def record_transaction(
+    config: Dict,
+    transaction_id: str,
+    job_label: str,
+    action: str,
+    user: str,
+    group: str,
+    digest: FilelistDigest,
+):
+    """Append a submitted transaction to the journal.  If the journal has grown
+    larger than ['options']['journal_max_bytes'] then the oldest half of the
+    entries are removed.  Errors writing the journal are ignored, as the
+    transaction has already been submitted.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict
+
+    :param transaction_id: the UUID of the transaction
+    :type transaction_id: string
+
+    :param job_label: the job label of the transaction
+    :type job_label: string
+
+    :param action: the api action of the transaction, e.g. "putlist"
+    :type action: string
+
+    :param user: the user the transaction was submitted for
+    :type user: string
+
+    :param group: the group the transaction was submitted for
+    :type group: string
+
+    :param digest: the digest of the filelist of the transaction
+    :type digest: FilelistDigest
+    """
+    entry = {
+        "transaction_id": str(transaction_id),
+        "job_label": job_label,
+        "action": action,
+        "user": user,
+        "group": group,
+        "filelist_hash": digest.hexdigest,
+        "n_files": digest.n_files,
+        "submit_time": datetime.now().isoformat(timespec="seconds"),
+    }
+    path = _journal_file(config)
+    max_bytes = get_option(config, "journal_max_bytes")
+    try:
+        with file_lock(path):
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            with os.fdopen(fd, "a") as fh:
+                fh.write(json.dumps(entry) + "\n")
+                size = fh.tell()
+            if max_bytes is not None and size > max_bytes:
+                entries = _read_entries(path)
+                atomic_write(
+                    path,
+                    "".join(json.dumps(e) + "\n" for e in entries[len(entries) // 2 :]),
+                )
+    except OSError:
+        pass
+
+
+def _read_entries(path: str) -> List[Dict]:
+    """Read the entries in the journal, oldest first, skipping any line that is
+    not valid JSON."""
+    entries = []
+    try:
+        with open(path) as fh:
+            for line in fh:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def read_journal(
+    config: Dict, limit: int = None, user: str = None, group: str = None
+) -> List[Dict]:
+    """Get the most recently submitted transactions from the journal.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict
+
+    :param limit: the number of transactions to get, or None for all of them
+    :type limit: int, optional
+
+    :param user: only get the transactions submitted for this user
+    :type user: string, optional
+
+    :param group: only get the transactions submitted for this group
+    :type group: string, optional
+
+    :return: the journal entries, newest first
+    :rtype: List[Dict]
+    """
+    entries = []
+    for entry in reversed(_read_entries(_journal_file(config))):
+        if user is not None and entry.get("user") != user:
+            continue
+        if group is not None and entry.get("group") != group:
+            continue
+        entries.append(entry)
+        if limit is not None and len(entries) >= limit:
+            break
+    return entries
@@ -0,0 +1,401 @@
+"""A local SQLite mirror of the catalog, for nlds sync-catalog and find --offline."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import json
+import os
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterator
+
+from nlds_client.clientlib.config import load_config, get_user, get_group, get_option
+from nlds_client.clientlib.transactions import (
+    construct_server_url,
+    stream_list_holding,
+    stream_find_file,
+    iter_holdings,
+)
+from nlds_client.clientlib.exceptions import RequestError
+
+# The local mirror of the catalog is a SQLite database holding the holdings,
+# transactions and files visible to a user or group.  The details of each record
+# are stored as JSON, in the same form as they are returned by the server, along
+# with the columns that are searched on.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS holdings (
+    id INTEGER PRIMARY KEY,
+    label TEXT,
+    user TEXT,
+    grp TEXT,
+    transaction_ids TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS holdings_label ON holdings (label);
+CREATE INDEX IF NOT EXISTS holdings_user_grp ON holdings (user, grp);
+CREATE TABLE IF NOT EXISTS tags (
+    holding_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS tags_holding_id ON tags (holding_id);
+CREATE INDEX IF NOT EXISTS tags_key_value ON tags (key, value);
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    holding_id INTEGER NOT NULL,
+    ingest_time TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_holding_id ON transactions (holding_id);
+CREATE TABLE IF NOT EXISTS files (
+    holding_id INTEGER NOT NULL,
+    transaction_id TEXT NOT NULL,
+    original_path TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_original_path ON files (original_path);
+CREATE INDEX IF NOT EXISTS files_holding_id ON files (holding_id);
+CREATE INDEX IF NOT EXISTS files_transaction_id ON files (transaction_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT PRIMARY KEY,
+    complete INTEGER NOT NULL,
+    synced REAL
+);
+"""
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+@lru_cache(maxsize=64)
+def _compile(pattern: str):
+    return re.compile(pattern)
+
+
+def _regexp(pattern, value):
+    """The REGEXP function for SQLite, which has no built in implementation."""
+    return value is not None and _compile(pattern).search(value) is not None
+
+
+def _connect(config: Dict):
+    """Open the mirror database, creating it if it does not exist."""
+    mirror_file = os.path.expanduser(get_option(config, "catalog_mirror_file"))
+    conn = sqlite3.connect(mirror_file, timeout=30)
+    conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _scope_filter(groupall: bool):
+    """The SQL condition on a holding (h) that selects the holdings visible to the
+    user or group, as on the server."""
+    if groupall:
+        return "h.grp = :group"
+    return "h.user = :user AND h.grp = :group"
+
+
+def _iter_holdings_desc(user, group, groupall, page_size):
+    """Iterate over the holdings, newest first, raising RequestError if they could
+    not be listed."""
+    if page_size:
+        yield from iter_holdings(
+            user,
+            group,
+            groupall,
+            descending=True,
+            page_size=page_size,
+            cache=False,
+        )
+        return
+    stream = stream_list_holding(user, group, groupall, descending=True, cache=False)
+    yield from stream
+    _raise_on_failure(stream.root)
+
+
+def _raise_on_failure(root: Dict):
+    if not root["success"]:
+        msg = root.get("msg", "Request failed")
+        if "details" in root and "failure" in root["details"]:
+            msg += "\nReason: " + root["details"]["failure"]
+        raise RequestError(msg, None)
+
+
+def _mirror_holding(conn, user, group, groupall, holding: Dict, transaction_ids):
+    """Fetch the files of a holding and replace the holding in the mirror.  This is
+    done in one SQL transaction, so the mirror is never left with a partly
+    mirrored holding."""
+    holding_id = holding["id"]
+    holding = dict(holding)
+    holding["holding_id"] = holding_id
+    stream = stream_find_file(
+        user, group, groupall, holding_id=holding_id, cache=False
+    )
+    transactions = {}
+
+    def _file_rows():
+        for h, t, f in stream:
+            # the transaction id is added by _find_file_transform if the server
+            # only gives it as the key of the transaction
+            transaction_id = t["transaction_id"]
+            if transaction_id not in transactions:
+                transactions[transaction_id] = t
+            yield (
+                holding_id,
+                transaction_id,
+                f.get("original_path"),
+                json.dumps(f),
+            )
+
+    with conn:
+        for table in ("holdings", "tags", "transactions", "files"):
+            column = "id" if table == "holdings" else "holding_id"
+            conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (holding_id,))
+        n_files = conn.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?)", _file_rows()
+        ).rowcount
+        _raise_on_failure(stream.root)
+        conn.executemany(
+            "INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?)",
+            (
+                (tid, holding_id, t.get("ingest_time"), json.dumps(t))
+                for tid, t in transactions.items()
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO tags VALUES (?, ?, ?)",
+            (
+                (holding_id, k, None if v is None else str(v))
+                for k, v in (holding.get("tags") or {}).items()
+            ),
+        )
+        conn.execute(
+            "INSERT INTO holdings VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                holding_id,
+                holding.get("label"),
+                holding.get("user"),
+                holding.get("group"),
+                json.dumps(transaction_ids),
+                json.dumps(holding),
+            ),
+        )
+    return max(n_files, 0)
+
+
+def sync_catalog(
+    user: str = None,
+    group: str = None,
+    groupall: bool = False,
+    full: bool = False,
+    page_size: int = None,
+    progress: Callable[[Dict, int], None] = None,
+) -> Dict:
+    """Update the local mirror of the catalog with the holdings, transactions and
+    files visible to the user or group.
+
+    The holdings are listed newest first.  Each holding that is not in the
+    mirror, or that has had transactions added to it, has its files fetched and
+    is (re)written to the mirror.  After the first complete sync, the walk stops
+    at the first holding that is already mirrored and unchanged, so only the
+    holdings created since the last sync are fetched.  A full sync walks all of
+    the holdings, and removes holdings from the mirror that no longer exist on
+    the server.  If a sync is interrupted then the next sync is a full sync,
+    which skips the holdings that were mirrored before the interruption.
+
+    :param user: the username to mirror the catalog for
+    :type user: string, optional
+
+    :param group: the group to mirror the catalog for
+    :type group: string, optional
+
+    :param groupall: mirror the holdings of the whole group, not just the user
+    :type groupall: bool, optional
+
+    :param full: walk all of the holdings, rather than stopping at the newest
+        holding that is already mirrored
+    :type full: bool, optional
+
+    :param page_size: list the holdings this many at a time
+    :type page_size: int, optional
+
+    :param progress: function called as progress(holding, n_files) after each
+        holding is mirrored
+    :type progress: Callable, optional
+
+    :raises RequestError: if the holdings or files could not be listed
+
+    :return: A Dictionary summarising the sync
+    :rtype: Dict
+    """
+    config = load_config()
+    user = get_user(config, user)
+    group = get_group(config, group)
+    scope = json.dumps(
+        [construct_server_url(config, "catalog"), user, group, bool(groupall)]
+    )
+    params = {"user": user, "group": group}
+    conn = _connect(config)
+    try:
+        row = conn.execute(
+            "SELECT complete FROM sync_state WHERE scope = ?", (scope,)
+        ).fetchone()
+        walk_all = full or row is None or not row[0]
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, 0, ?)",
+                (scope, time.time()),
+            )
+
+        n_added = n_updated = n_files = 0
+        seen = set()
+        for holding in _iter_holdings_desc(user, group, groupall, page_size):
+            holding_id = holding["id"]
+            seen.add(holding_id)
+            transaction_ids = sorted(holding.get("transactions") or [])
+            row = conn.execute(
+                "SELECT transaction_ids FROM holdings WHERE id = ?", (holding_id,)
+            ).fetchone()
+            if row is not None and json.loads(row[0]) == transaction_ids:
+                if walk_all:
+                    continue
+                break
+            n = _mirror_holding(conn, user, group, groupall, holding, transaction_ids)
+            n_files += n
+            if row is None:
+                n_added += 1
+            else:
+                n_updated += 1
+            if progress is not None:
+                progress(holding, n)
+
+        n_removed = 0
+        if walk_all:
+            # all the holdings have been seen, so remove those deleted on the server
+            stale = [
+                r[0]
+                for r in conn.execute(
+                    f"SELECT h.id FROM holdings h WHERE {_scope_filter(groupall)}",
+                    params,
+                )
+                if r[0] not in seen
+            ]
+            with conn:
+                for holding_id in stale:
+                    for table in ("holdings", "tags", "transactions", "files"):
+                        column = "id" if table == "holdings" else "holding_id"
+                        conn.execute(
+                            f"DELETE FROM {table} WHERE {column} = ?", (holding_id,)
+                        )
+            n_removed = len(stale)
+
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, 1, ?)",
+                (scope, time.time()),
+            )
+    finally:
+        conn.close()
+
+    return {
+        "msg": (
+            f"Synced catalog for user {user} and group {group}: {n_added} holdings "
+            f"added, {n_updated} updated, {n_removed} removed, {n_files} files "
+            "fetched"
+        ),
+        "holdings_added": n_added,
+        "holdings_updated": n_updated,
+        "holdings_removed": n_removed,
+        "files": n_files,
+        "success": True,
+    }
+
+
+def find_offline(
+    user: str = None,
+    group: str = None,
+    groupall: bool = False,
+    label: str = None,
+    holding_id: int = None,
+    transaction_id: str = None,
+    path: str = None,
+    tag: Dict = None,
+    regex: bool = False,
+    limit: int = None,
+    descending: bool = False,
+) -> Iterator:
+    """Find files in the local mirror of the catalog, without contacting the
+    server.  The parameters are the same as for transactions.find_file.  A path
+    is matched as a regular expression if regex is True, as a wildcard if it
+    contains any of *?[ and as a substring otherwise.
+
+    :return: an iterator over (holding, transaction, file) tuples, as for
+        transactions.stream_find_file
+    :rtype: Iterator[Tuple[Dict, Dict, Dict]]
+    """
+    config = load_config()
+    params = {"user": get_user(config, user), "group": get_group(config, group)}
+    conditions = [_scope_filter(groupall)]
+    if label is not None:
+        conditions.append(
+            "h.label REGEXP :label" if regex else "h.label = :label"
+        )
+        params["label"] = label
+    if holding_id is not None:
+        conditions.append("h.id = :holding_id")
+        params["holding_id"] = holding_id
+    if transaction_id is not None:
+        conditions.append("f.transaction_id = :transaction_id")
+        params["transaction_id"] = transaction_id
+    if path is not None:
+        if regex:
+            conditions.append("f.original_path REGEXP :path")
+        elif _GLOB_CHARS.search(path):
+            conditions.append("f.original_path GLOB :path")
+        else:
+            conditions.append("instr(f.original_path, :path) > 0")
+        params["path"] = path
+    for i, (key, value) in enumerate((tag or {}).items()):
+        conditions.append(
+            "EXISTS (SELECT 1 FROM tags g WHERE g.holding_id = h.id "
+            f"AND g.key = :tag_key{i} AND g.value = :tag_value{i})"
+        )
+        params[f"tag_key{i}"] = key
+        params[f"tag_value{i}"] = str(value)
+    order = "DESC" if descending else "ASC"
+    sql = (
+        "SELECT h.id, h.data, t.data, f.data FROM files f "
+        "JOIN transactions t ON f.transaction_id = t.transaction_id "
+        "JOIN holdings h ON f.holding_id = h.id "
+        f"WHERE {' AND '.join(conditions)} "
+        f"ORDER BY t.ingest_time {order}, f.rowid {order}"
+    )
+    if limit:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+
+    conn = _connect(config)
+    try:
+        holdings = {}
+        for h_id, h_data, t_data, f_data in conn.execute(sql, params):
+            if h_id not in holdings:
+                holdings[h_id] = json.loads(h_data)
+            yield holdings[h_id], json.loads(t_data), json.loads(f_data)
+    finally:
+        conn.close()
+
+
+def files_to_response(files) -> Dict:
+    """Assemble (holding, transaction, file) tuples into a response in the same
+    form as the response to transactions.find_file."""
+    holdings = {}
+    for h, t, f in files:
+        holding = holdings.setdefault(h["label"], dict(h, transactions={}))
+        transaction = holding["transactions"].setdefault(
+            t["transaction_id"], dict(t, filelist=[])
+        )
+        transaction["filelist"].append(f)
+    return {"data": {"holdings": holdings}, "details": {}, "success": True}
@@ -0,0 +1,409 @@
+"""Watching and waiting for transactions, polling the server adaptively."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import os
+import subprocess
+import time
+from typing import Callable, Container, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from nlds_client.clientlib.config import load_config, get_option
+from nlds_client.clientlib.transactions import (
+    get_transaction_state,
+    stream_monitor_transactions,
+)
+from nlds_client.clientlib.exceptions import UsageError
+
+# the number of polls that wait_for_transactions makes before giving up on
+# transactions that have not been found, e.g. because of a mistyped id.  A newly
+# submitted transaction may take a moment to appear, so the first poll is not
+# enough
+MISSING_POLLS = 3
+
+# the overall states, from get_transaction_state, that a transaction does not
+# leave once it has reached them
+TERMINAL_STATES = frozenset(
+    ("COMPLETE", "FAILED", "COMPLETE_WITH_ERRORS", "COMPLETE_WITH_WARNINGS")
+)
+
+
+def _record_signature(tr: Dict) -> Tuple:
+    """Summarise the parts of a transaction record that get_transaction_state
+    depends on, so that a change to the record can be detected without keeping the
+    whole record."""
+    return (
+        tuple(
+            (sr.get("id"), sr["state"], sr["last_updated"]) for sr in tr["sub_records"]
+        ),
+        len(tr.get("warnings", ())),
+    )
+
+
+def _record_key(tr: Dict):
+    """The key a transaction record is watched under."""
+    return tr.get("id", tr.get("transaction_id"))
+
+
+def is_terminal(tr_state: Tuple) -> bool:
+    """Determine whether the state returned by get_transaction_state is one that
+    the transaction will not leave."""
+    return tr_state[0] in TERMINAL_STATES
+
+
+def _poll_changes(
+    fetch_records: Callable[[], Iterable[Dict]], known: Dict, key=_record_key
+) -> List[Tuple[Dict, Tuple]]:
+    """Fetch the transaction records and return the (record, state) of those that
+    are new or have changed, updating known, which maps the key of each
+    transaction to its (signature, state)."""
+    changed = []
+    for tr in fetch_records():
+        k = key(tr)
+        signature = _record_signature(tr)
+        previous = known.get(k)
+        if previous is not None and previous[0] == signature:
+            continue
+        tr_state = get_transaction_state(tr)
+        known[k] = (signature, tr_state)
+        changed.append((tr, tr_state))
+    return changed
+
+
+def watch_transactions(
+    fetch_records: Callable[[], Iterable[Dict]],
+    min_interval: float = 2.0,
+    max_interval: float = 60.0,
+    backoff: float = 1.5,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Iterator[List[Tuple[Dict, Tuple]]]:
+    """Poll the state of transactions until they have all finished, yielding the
+    transactions that have changed since the last poll.
+
+    The interval between polls adapts to the transactions: it is reset to
+    min_interval whenever a transaction changes, and multiplied by backoff, up to
+    max_interval, whenever nothing has changed.  Only a summary of each record is
+    kept between polls, and the state of a transaction is only recomputed when its
+    sub-records have changed.
+
+    :param fetch_records: a function that requests the transaction records and
+        returns an iterable of them, e.g. a stream from
+        transactions.stream_monitor_transactions.  It is called once per poll.
+    :type fetch_records: Callable[[], Iterable[Dict]]
+
+    :param min_interval: the shortest time to wait between polls, in seconds
+    :type min_interval: float, optional
+
+    :param max_interval: the longest time to wait between polls, in seconds
+    :type max_interval: float, optional
+
+    :param backoff: the factor the interval grows by when nothing has changed
+    :type backoff: float, optional
+
+    :param sleep: the function used to wait between polls
+    :type sleep: Callable[[float], None], optional
+
+    :return: an iterator over lists of the (record, state) of each transaction that
+        is new or has changed, where state is the tuple returned by
+        get_transaction_state.  The first list contains all of the transactions.
+        Iteration stops once every transaction is in one of the TERMINAL_STATES,
+        or if the first poll finds no transactions.
+    :rtype: Iterator[List[Tuple[Dict, Tuple]]]
+    """
+    # key: (signature, state) of each transaction seen so far
+    known = {}
+    interval = min_interval
+    while True:
+        changed = _poll_changes(fetch_records, known)
+        if changed:
+            yield changed
+            interval = min_interval
+        else:
+            interval = min(interval * backoff, max_interval)
+
+        if all(is_terminal(tr_state) for _, tr_state in known.values()):
+            return
+        sleep(interval)
+
+
+class TransactionPoller:
+    """Fetch the records of a set of transactions, with as few status queries as
+    possible, repeatedly if they are being polled.  A transaction that has been
+    found is requested by its job label, which the transactions of a chunked
+    submission share, so that each poll makes one query for each job label,
+    however many transactions there are.  A transaction that has not been found
+    yet is looked for amongst the most recent transactions, and then on its own,
+    but only for the first MISSING_POLLS polls.
+
+    :param transaction_ids: the UUIDs of the transactions
+    :type transaction_ids: Sequence[string]
+
+    :param job_label: request the transactions with this job label.  If
+        transaction_ids is also given then only those transactions are returned.
+    :type job_label: string, optional
+
+    The user, group and groupall are the same as for monitor_transactions.
+    """
+
+    def __init__(
+        self,
+        user: str,
+        group: str,
+        groupall: bool,
+        transaction_ids: Sequence[str],
+        job_label: str = None,
+    ):
+        self.user = user
+        self.group = group
+        self.groupall = groupall
+        self.transaction_ids = list(dict.fromkeys(transaction_ids or ()))
+        self.job_label = job_label
+        # transaction id: job label, of the transactions that have been found
+        self.job_labels = {}
+        self.n_polls = 0
+
+    def _query(self, **kwargs):
+        return stream_monitor_transactions(
+            self.user, self.group, self.groupall, **kwargs
+        )
+
+    def poll(self, finished: Container[str] = ()) -> Iterator[Dict]:
+        """Request the records of the transactions.
+
+        :param finished: the UUIDs of transactions that are not needed if they
+            would have to be requested on their own
+        :type finished: Container[string], optional
+
+        :return: an iterator over the transaction records
+        :rtype: Iterator[Dict]
+        """
+        self.n_polls += 1
+        wanted = set(self.transaction_ids)
+        if self.job_label is None and len(wanted) == 1:
+            yield from self._query(transaction_id=self.transaction_ids[0])
+            return
+        if self.job_label is not None:
+            for tr in self._query(job_label=self.job_label):
+                if not wanted or tr["transaction_id"] in wanted:
+                    yield tr
+            return
+
+        unknown = [tid for tid in self.transaction_ids if tid not in self.job_labels]
+        seen = set()
+
+        def _wanted(records):
+            for tr in records:
+                transaction_id = tr["transaction_id"]
+                if transaction_id in wanted and transaction_id not in seen:
+                    seen.add(transaction_id)
+                    self.job_labels[transaction_id] = tr.get("job_label") or None
+                    yield tr
+
+        known = dict(self.job_labels).items()
+        for job_label in sorted({jl for _, jl in known if jl is not None}):
+            yield from _wanted(self._query(job_label=job_label))
+        # transactions without a job label can only be requested on their own
+        for transaction_id in [tid for tid, jl in known if jl is None]:
+            if transaction_id not in seen and transaction_id not in finished:
+                yield from _wanted(self._query(transaction_id=transaction_id))
+
+        if not unknown or self.n_polls > MISSING_POLLS:
+            return
+        # transactions that were submitted together are amongst the most recent
+        # transactions, so only as many of those as are wanted are requested
+        yield from _wanted(
+            self._query(job_label=None, limit=len(unknown), descending=True)
+        )
+        for transaction_id in unknown:
+            if transaction_id not in seen and transaction_id not in finished:
+                yield from _wanted(self._query(transaction_id=transaction_id))
+
+
+def fetch_transaction_records(
+    user: str,
+    group: str,
+    groupall: bool,
+    transaction_ids: Sequence[str],
+    job_label: str = None,
+    finished: Container[str] = (),
+) -> Iterator[Dict]:
+    """Request the records of a set of transactions once, see TransactionPoller.
+
+    :return: an iterator over the transaction records
+    :rtype: Iterator[Dict]
+    """
+    poller = TransactionPoller(user, group, groupall, transaction_ids, job_label)
+    return poller.poll(finished)
+
+
+def run_hook(hook: str, tr: Dict, tr_state: Tuple):
+    """Run a shell command for a transaction that has finished.  The details of
+    the transaction are passed to the command in the environment variables
+    NLDS_TRANSACTION_ID, NLDS_ID, NLDS_JOB_LABEL, NLDS_ACTION and NLDS_STATE."""
+    env = dict(
+        os.environ,
+        NLDS_TRANSACTION_ID=str(tr.get("transaction_id", "")),
+        NLDS_ID=str(tr.get("id", "")),
+        NLDS_JOB_LABEL=str(tr.get("job_label") or ""),
+        NLDS_ACTION=str(tr.get("api_action", "")),
+        NLDS_STATE=tr_state[0],
+    )
+    subprocess.run(hook, shell=True, env=env, check=False)
+
+
+def wait_for_transactions(
+    transaction_ids: Sequence[str] = None,
+    job_label: str = None,
+    user: str = None,
+    group: str = None,
+    groupall: bool = False,
+    timeout: float = None,
+    callback: Callable[[Dict, Tuple], None] = None,
+    hook: str = None,
+    min_interval: float = None,
+    max_interval: float = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict:
+    """Block until transactions have finished, i.e. they are in one of the
+    TERMINAL_STATES, or until the timeout has passed.  The transactions are polled
+    by TransactionPoller, with one status query per job label per interval once
+    they have been found, and the interval adapting as for watch_transactions.
+
+    :param transaction_ids: the UUIDs of the transactions to wait for
+    :type transaction_ids: Sequence[string], optional
+
+    :param job_label: wait for all the transactions with this job label.  If
+        transaction_ids is also given then only those transactions are waited for.
+    :type job_label: string, optional
+
+    :param user: the username of the transactions
+    :type user: string, optional
+
+    :param group: the group of the transactions
+    :type group: string, optional
+
+    :param groupall: wait for transactions that belong to the group, rather than
+        the user
+    :type groupall: bool, optional
+
+    :param timeout: the longest time to wait, in seconds, or None to wait until
+        the transactions have finished
+    :type timeout: float, optional
+
+    :param callback: a function called with the (record, state) of each
+        transaction when it finishes, where state is the tuple returned by
+        get_transaction_state
+    :type callback: Callable[[Dict, Tuple], None], optional
+
+    :param hook: a shell command run when each transaction finishes, see run_hook
+    :type hook: string, optional
+
+    :param min_interval: the shortest time between polls in seconds.  Defaults to
+        ['options']['watch_min_interval'] in the config.
+    :type min_interval: float, optional
+
+    :param max_interval: the longest time between polls in seconds.  Defaults to
+        ['options']['watch_max_interval'] in the config.
+    :type max_interval: float, optional
+
+    :raises UsageError: if neither transaction_ids nor job_label is given
+
+    Transactions that are still not found after MISSING_POLLS polls (or a job
+    label with no transactions) are not waited for any longer, so that a
+    mistyped id does not wait forever.
+
+    :return: A Dictionary containing "transactions", which maps the UUID of each
+        transaction found to its "state", "last_update" and "complete", and
+        "success", which is True only if every transaction finished in time in the
+        COMPLETE or COMPLETE_WITH_WARNINGS state.  Transactions that were not found
+        are listed in "missing", and "timed_out" is True if the timeout passed.
+    :rtype: Dict
+    """
+    if not transaction_ids and job_label is None:
+        raise UsageError("A transaction id or job label is needed to wait for")
+    config = load_config()
+    if min_interval is None:
+        min_interval = get_option(config, "watch_min_interval")
+    if max_interval is None:
+        max_interval = get_option(config, "watch_max_interval")
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    known = {}
+    finished = {}
+    interval = min_interval
+    timed_out = False
+    poller = TransactionPoller(user, group, groupall, transaction_ids, job_label)
+    while True:
+        changed = _poll_changes(
+            lambda: poller.poll(finished),
+            known,
+            key=lambda tr: tr["transaction_id"],
+        )
+        for tr, tr_state in changed:
+            transaction_id = tr["transaction_id"]
+            if is_terminal(tr_state) and transaction_id not in finished:
+                finished[transaction_id] = tr_state
+                if callback is not None:
+                    callback(tr, tr_state)
+                if hook is not None:
+                    run_hook(hook, tr, tr_state)
+        interval = min_interval if changed else min(interval * 1.5, max_interval)
+
+        if transaction_ids:
+            waiting = [tid for tid in transaction_ids if tid not in finished]
+        else:
+            waiting = [tid for tid in known if tid not in finished]
+        # transactions that have not been found yet are waited for, in case they
+        # have not been created yet, but only for MISSING_POLLS polls
+        if poller.n_polls >= MISSING_POLLS:
+            waiting = [tid for tid in waiting if tid in known]
+            if not known:
+                break
+        if not waiting and known:
+            break
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            interval = min(interval, remaining)
+        sleep(interval)
+
+    transactions = {
+        transaction_id: {
+            "state": tr_state[0],
+            "last_update": tr_state[1].isoformat(),
+            "complete": tr_state[2],
+        }
+        for transaction_id, (_, tr_state) in known.items()
+    }
+    missing = [tid for tid in (transaction_ids or ()) if tid not in known]
+    success = (
+        not timed_out
+        and not missing
+        and len(transactions) > 0
+        and all(
+            t["state"] in ("COMPLETE", "COMPLETE_WITH_WARNINGS")
+            for t in transactions.values()
+        )
+    )
+    if missing:
+        msg = f"{len(missing)} transaction(s) not found: {', '.join(missing)}"
+    elif not transactions:
+        msg = f"No transactions found with job label {job_label}"
+    elif timed_out:
+        msg = (
+            f"Timed out waiting for {len(waiting) or 'the'} transaction(s) to " "finish"
+        )
+    else:
+        msg = f"{len(finished)} transaction(s) finished"
+    return {
+        "success": success,
+        "msg": msg,
+        "timed_out": timed_out,
+        "transactions": transactions,
+        "missing": missing,
+    }
@@ -0,0 +1,72 @@
+"""Profiling of a command with cProfile and tracemalloc, for nlds --profile."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import cProfile
+import tracemalloc
+
+# Profile a command with cProfile, and optionally trace its memory allocations
+# with tracemalloc, for `nlds --profile` or the NLDS_PROFILE environment variable.
+# Only the thread that runs the command is profiled.  This module is only
+# imported when profiling is asked for.
+
+
+class Profiler:
+    """Profile the code run between start and stop.
+
+    :param path: the file to write the cProfile stats to, which can be read with
+        pstats or tools such as snakeviz
+    :type path: string
+
+    :param memory: also trace memory allocations with tracemalloc, writing a
+        snapshot to path with ".tracemalloc" added, which can be read with
+        tracemalloc.Snapshot.load
+    :type memory: bool, optional
+
+    :param nframes: the number of frames of each allocation's traceback to keep
+    :type nframes: int, optional
+    """
+
+    def __init__(self, path: str, memory: bool = False, nframes: int = 10):
+        self.path = path
+        self.memory = memory
+        self.nframes = nframes
+        self._profile = cProfile.Profile()
+
+    @property
+    def memory_path(self) -> str:
+        return f"{self.path}.tracemalloc"
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start(self.nframes)
+        self._profile.enable()
+
+    def stop(self, top: int = 10) -> str:
+        """Stop profiling and write the stats, and the memory snapshot.
+
+        :param top: the number of lines that allocated the most memory to list
+        :type top: int, optional
+
+        :return: a summary of what was written, to show to the user
+        :rtype: string
+        """
+        self._profile.disable()
+        self._profile.dump_stats(self.path)
+        lines = [f"Profile written to {self.path}"]
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(self.memory_path)
+            lines.append(
+                f"Memory snapshot written to {self.memory_path}, peak traced "
+                f"memory {peak / 1024**2:.1f}MiB"
+            )
+            for stat in snapshot.statistics("lineno")[:top]:
+                lines.append(f"    {stat}")
+        return "\n".join(lines)
@@ -0,0 +1,120 @@
+"""Parallel resolution of filepaths, caching the directories already resolved."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List
+
+# number of paths resolved by a worker thread in one go
+RESOLVE_BATCH_SIZE = 256
+
+
+class PathResolver:
+    """Resolve paths to absolute paths with all symlinks resolved, in the same way
+    as pathlib.Path.resolve, caching the resolved directories.  Path.resolve makes
+    an lstat (and a readlink for each symlink) call for every component of every
+    path, whereas PathResolver only makes one lstat call for each path whose
+    directory has already been resolved.  For a list of files that share a few
+    directories this is far fewer calls, which matters on parallel filesystems
+    where each call is slow.
+
+    The cache is not invalidated, so a PathResolver should only be used for one
+    list of paths.  It can be used from several threads at the same time.
+    """
+
+    def __init__(self):
+        self._dirs = {}
+
+    def resolve(self, path: str) -> str:
+        """Resolve a path.
+
+        :param path: the path to resolve, relative to the current directory if it
+            is not absolute
+        :type path: string
+
+        :return: the resolved path
+        :rtype: string
+        """
+        if ".." in path.split(os.sep):
+            # ".." has to be resolved after the symlinks before it, which
+            # os.path.abspath does not do
+            return os.path.realpath(path)
+        head, name = os.path.split(os.path.abspath(path))
+        if not name:
+            # the root directory
+            return head
+        return self._resolve_link(os.path.join(self._resolve_dir(head), name))
+
+    def resolve_many(self, paths: List[str]) -> List[str]:
+        """Resolve a list of paths."""
+        return [self.resolve(path) for path in paths]
+
+    def _resolve_dir(self, directory: str) -> str:
+        """Resolve an absolute, normalised directory, resolving and caching its
+        parent directories first."""
+        resolved = self._dirs.get(directory)
+        if resolved is None:
+            parent, name = os.path.split(directory)
+            if not name:
+                resolved = parent
+            else:
+                resolved = self._resolve_link(
+                    os.path.join(self._resolve_dir(parent), name)
+                )
+            self._dirs[directory] = resolved
+        return resolved
+
+    @staticmethod
+    def _resolve_link(path: str) -> str:
+        """Resolve a path whose directory has already been resolved."""
+        if os.path.islink(path):
+            return os.path.realpath(path)
+        return path
+
+
+def resolve_paths(paths: Iterable[str], workers: int = 8) -> Iterator[str]:
+    """Resolve paths, as PathResolver.resolve, in parallel with a pool of worker
+    threads, sharing the cache of resolved directories.  The resolved paths are
+    yielded in the same order as the paths, as they are resolved, so the paths can
+    be a generator and are never all held in memory.
+
+    :param paths: the paths to resolve
+    :type paths: Iterable[string]
+
+    :param workers: the number of threads resolving paths at the same time.  If
+        this is 1 or less then the paths are resolved in this thread.
+    :type workers: int, optional
+
+    :return: an iterator over the resolved paths
+    :rtype: Iterator[string]
+    """
+    resolver = PathResolver()
+    paths = iter(paths)
+    if workers <= 1:
+        for path in paths:
+            yield resolver.resolve(path)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        while True:
+            # keep the workers busy, without reading every path at once
+            while len(pending) < 2 * workers:
+                batch = [path for path in islice(paths, RESOLVE_BATCH_SIZE)]
+                if not batch:
+                    break
+                pending.append(executor.submit(resolver.resolve_many, batch))
+            if not pending:
+                break
+            yield from pending.popleft().result()
+    finally:
+        # if the caller stops iterating early then do not resolve the rest
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,220 @@
+"""Resubmission of the files that failed in previous transactions."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import os
+import re
+from typing import Dict, Iterable, Sequence, Tuple
+
+from nlds_client.clientlib.config import load_config, get_option
+from nlds_client.clientlib.monitor import fetch_transaction_records
+from nlds_client.clientlib.submission import (
+    put_filelist_chunked,
+    get_filelist_chunked,
+)
+from nlds_client.clientlib.exceptions import UsageError
+
+_UUID_RE = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE
+)
+
+
+def is_transaction_id(value: str) -> bool:
+    """Determine whether a value is a transaction id (a UUID), rather than a job
+    label."""
+    return _UUID_RE.match(value) is not None
+
+
+def _action_kind(api_action: str) -> str:
+    """The kind of submission to retry a transaction with, "put" or "get"."""
+    if api_action in ("put", "putlist"):
+        return "put"
+    if api_action in ("get", "getlist"):
+        return "get"
+    return None
+
+
+def collect_failed_files(records: Iterable[Dict]) -> Dict[Tuple, Dict]:
+    """Collect the failed files from transaction records, removing duplicates.
+    Transactions that are not a put or a get are ignored.
+
+    :param records: the transaction records, as returned by monitor_transactions
+    :type records: Iterable[Dict]
+
+    :return: a Dictionary keyed by (kind, label), where kind is "put" or "get" and
+        label is the holding label of the transactions (or None).  Each value
+        contains "job_labels", the job labels of the transactions, and "files", a
+        Dictionary of filepath: reason.
+    :rtype: Dict[Tuple, Dict]
+    """
+    groups = {}
+    for tr in records:
+        kind = _action_kind(tr.get("api_action"))
+        if kind is None:
+            continue
+        group = groups.setdefault(
+            (kind, tr.get("label") or None), {"job_labels": [], "files": {}}
+        )
+        job_label = tr.get("job_label") or tr["transaction_id"][0:8]
+        if job_label not in group["job_labels"]:
+            group["job_labels"].append(job_label)
+        for sr in tr["sub_records"]:
+            for ff in sr.get("failed_files", ()):
+                group["files"].setdefault(ff["filepath"], ff.get("reason", ""))
+    return groups
+
+
+def is_permanent_failure(
+    kind: str, filepath: str, reason: str, patterns: Sequence[str]
+) -> bool:
+    """Determine whether a file failed for a reason that retrying will not fix:
+    its reason matches one of the patterns, or it is a put of a file that no
+    longer exists."""
+    for pattern in patterns:
+        if re.search(pattern, reason or "", re.IGNORECASE):
+            return True
+    return kind == "put" and not os.path.lexists(filepath)
+
+
+def retry_failed_files(
+    transaction_ids: Sequence[str] = None,
+    job_labels: Sequence[str] = None,
+    user: str = None,
+    group: str = None,
+    groupall: bool = False,
+    job_label: str = None,
+    target: str = None,
+    chunk_files: int = None,
+    workers: int = None,
+    dry_run: bool = False,
+) -> Dict:
+    """Resubmit the files that failed in previous transactions.  The failed files
+    are collected from the transactions, with duplicates removed, and files that
+    failed for a permanent reason (see is_permanent_failure and the
+    ['options']['retry_permanent_reasons'] setting) are dropped.  The rest are
+    resubmitted, in chunks, to the same holding, as a put or a get as the original
+    transactions were.
+
+    :param transaction_ids: the UUIDs of the transactions to retry
+    :type transaction_ids: Sequence[string], optional
+
+    :param job_labels: retry all the transactions with these job labels
+    :type job_labels: Sequence[string], optional
+
+    :param user: the username of the transactions
+    :type user: string, optional
+
+    :param group: the group of the transactions
+    :type group: string, optional
+
+    :param groupall: retry transactions that belong to the group, rather than the
+        user
+    :type groupall: bool, optional
+
+    :param job_label: the job label of the new transactions.  If None then
+        "-retry" is added to the job label of the first original transaction.
+    :type job_label: string, optional
+
+    :param target: the location to write retrieved files to, for a get
+    :type target: string, optional
+
+    :param chunk_files: the maximum number of files in each new transaction.
+        Defaults to ['options']['retry_chunk_files'] in the config.
+    :type chunk_files: int, optional
+
+    :param workers: the number of transactions to submit at the same time
+    :type workers: int, optional
+
+    :param dry_run: work out which files would be resubmitted, but do not
+        resubmit them
+    :type dry_run: bool, optional
+
+    :raises UsageError: if no transactions or job labels are given
+
+    :return: A Dictionary containing "retry", a list of the kind, holding label,
+        job label and files of each resubmission, "dropped", a Dictionary of the
+        filepath: reason of the files that were not resubmitted, and
+        "responses", the responses of the resubmissions (empty if dry_run)
+    :rtype: Dict
+    """
+    if not transaction_ids and not job_labels:
+        raise UsageError("A transaction id or job label is needed to retry")
+    config = load_config()
+    if chunk_files is None:
+        chunk_files = get_option(config, "retry_chunk_files")
+    patterns = get_option(config, "retry_permanent_reasons") or ()
+
+    records = []
+    if transaction_ids:
+        records.extend(
+            fetch_transaction_records(user, group, groupall, transaction_ids)
+        )
+    for label in job_labels or ():
+        records.extend(fetch_transaction_records(user, group, groupall, (), label))
+    groups = collect_failed_files(records)
+
+    retry = []
+    dropped = {}
+    for (kind, label), g in groups.items():
+        files = []
+        for filepath, reason in g["files"].items():
+            if is_permanent_failure(kind, filepath, reason, patterns):
+                dropped[filepath] = reason
+            else:
+                files.append(filepath)
+        if files:
+            retry.append(
+                {
+                    "action": kind,
+                    "label": label,
+                    "job_label": job_label or f"{g['job_labels'][0]}-retry",
+                    "filelist": files,
+                }
+            )
+
+    responses = []
+    if not dry_run:
+        for r in retry:
+            if r["action"] == "put":
+                response = put_filelist_chunked(
+                    r["filelist"],
+                    user,
+                    group,
+                    r["job_label"],
+                    r["label"],
+                    chunk_files=chunk_files,
+                    workers=workers,
+                )
+            else:
+                response = get_filelist_chunked(
+                    r["filelist"],
+                    user,
+                    group,
+                    groupall,
+                    target,
+                    r["job_label"],
+                    r["label"],
+                    chunk_files=chunk_files,
+                    workers=workers,
+                    # the filepaths came from the server, so are already resolved
+                    resolve=False,
+                )
+            responses.append(response)
+
+    n_retry = sum(len(r["filelist"]) for r in retry)
+    msg = (
+        f"RETRY {len(records)} transaction(s): {n_retry} failed file(s) "
+        f"{'to resubmit' if dry_run else 'resubmitted'}, {len(dropped)} dropped "
+        "as they failed permanently"
+    )
+    return {
+        "msg": msg,
+        "retry": retry,
+        "dropped": dropped,
+        "responses": responses,
+        "success": len(records) > 0 and all(r["success"] for r in responses),
+    }
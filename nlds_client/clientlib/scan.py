@@ -0,0 +1,105 @@
+"""Parallel walking of directory trees, with include and exclude patterns."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from fnmatch import fnmatchcase
+from typing import Iterator, List, Sequence, Tuple
+
+
+def _matches(path: str, name: str, patterns: Sequence[str]) -> bool:
+    """Match a path against glob patterns.  Patterns containing a "/" are matched
+    against the whole path, other patterns against the name only."""
+    for pattern in patterns:
+        if fnmatchcase(path if "/" in pattern else name, pattern):
+            return True
+    return False
+
+
+def _scan_directory(
+    directory: str, include: Sequence[str], exclude: Sequence[str]
+) -> Tuple[List[str], List[Tuple[str, int]]]:
+    """List one directory, returning its sub-directories and the (path, size) of
+    each file and link in it that is included and not excluded.  Directories that
+    cannot be read are treated as empty."""
+    subdirs = []
+    files = []
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return subdirs, files
+    with it:
+        for entry in it:
+            try:
+                if exclude and _matches(entry.path, entry.name, exclude):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif not include or _matches(entry.path, entry.name, include):
+                    files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+            except OSError:
+                continue
+    return subdirs, files
+
+
+def scan_tree(
+    directory: str,
+    include: Sequence[str] = None,
+    exclude: Sequence[str] = None,
+    workers: int = 8,
+) -> Iterator[Tuple[str, int]]:
+    """Walk a directory tree, listing directories in parallel with a pool of
+    worker threads, and yield the absolute path and size of each file and link in
+    it.  Links are not followed.  The files are yielded as each directory is
+    listed, in no particular order, so the caller can start processing them
+    before the walk has finished.
+
+    Listing a directory is dominated by waiting for the filesystem, especially on
+    parallel filesystems such as Lustre, so several threads listing different
+    directories at the same time walk the tree many times faster than one.
+
+    :param directory: the directory to walk
+    :type directory: string
+
+    :param include: glob patterns of the files to include.  If None then all files
+        are included.  Patterns containing a "/" are matched against the whole
+        path, other patterns against the file name.
+    :type include: Sequence[string], optional
+
+    :param exclude: glob patterns of the files and directories to exclude, matched
+        in the same way as include.  Excluded directories are not walked.
+    :type exclude: Sequence[string], optional
+
+    :param workers: the number of directories to list at the same time
+    :type workers: int, optional
+
+    :return: an iterator over (path, size) tuples
+    :rtype: Iterator[Tuple[string, int]]
+    """
+    include = tuple(include or ())
+    exclude = tuple(exclude or ())
+    workers = max(1, workers)
+    to_scan = deque([os.path.abspath(os.path.expanduser(directory))])
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        while to_scan or pending:
+            # keep the workers busy, without queueing every directory at once
+            while to_scan and len(pending) < 2 * workers:
+                pending.add(
+                    executor.submit(_scan_directory, to_scan.pop(), include, exclude)
+                )
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirs, files = future.result()
+                to_scan.extend(subdirs)
+                yield from files
+    finally:
+        # if the caller stops iterating early then do not scan the rest of the tree
+        executor.shutdown(wait=False, cancel_futures=True)
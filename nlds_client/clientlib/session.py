@@ -0,0 +1,87 @@
+"""The shared, pooled HTTP session used for all of the client's requests."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import atexit
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from nlds_client.clientlib.config import get_option
+
+# The one HTTP session shared by every request made by the client in this process.
+# Reusing it keeps the TCP+TLS connections to the NLDS server, the token server
+# and the object store tenancy alive between requests, so only the first request
+# to each host pays for the handshake.
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _create_session(config=None):
+    """Create a new requests.Session with a connection pool sized from the
+    ['options'] section of the config.
+
+    :param config: the configuration loaded by config.load_config, or None to use
+        the default options
+    :type config: Dict
+
+    :return: the configured session
+    :rtype: requests.Session
+    """
+    if config is None:
+        config = {}
+    pool_connections = get_option(config, "http_pool_connections")
+    pool_maxsize = get_option(config, "http_pool_maxsize")
+    keep_alive = get_option(config, "http_keep_alive")
+
+    session = requests.Session()
+    # one adapter per scheme, each holding a pool of connections per host
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=False,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        # close the connection after each request, i.e. the pre-session behaviour
+        session.headers["Connection"] = "close"
+    return session
+
+
+def get_session(config=None):
+    """Get the HTTP session shared by all requests in this process, creating it
+    on first use.  The pool size and keep-alive settings are taken from the
+    config that is passed in on the first call.
+
+    :param config: the configuration loaded by config.load_config
+    :type config: Dict, optional
+
+    :return: the shared session
+    :rtype: requests.Session
+    """
+    global _SESSION
+    # the lock stops two threads that make their first request at the same time
+    # from creating a session each
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = _create_session(config)
+        return _SESSION
+
+
+def close_session():
+    """Close the shared HTTP session and its pooled connections.  The next call
+    to get_session will create a new one."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+
+
+atexit.register(close_session)
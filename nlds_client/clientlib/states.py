@@ -0,0 +1,159 @@
+"""The states of transactions and their sub-records, and their aggregation."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+
+# the states of the sub-records of a transaction, in the order they occur.  The
+# overall state of a transaction is the minimum of the states of its sub-records
+STATE_MAPPING = {
+    "INITIALISING": -1,
+    "ROUTING": 0,
+    "SPLITTING": 1,
+    "INDEXING": 2,
+    "CATALOG_PUTTING": 3,
+    "TRANSFER_PUTTING": 4,
+    "CATALOG_GETTING": 10,
+    "ARCHIVE_GETTING": 11,
+    "TRANSFER_GETTING": 12,
+    "TRANSFER_INIT": 13,
+    "ARCHIVE_INIT": 20,
+    "ARCHIVE_PUTTING": 21,
+    "ARCHIVE_PREPARING": 22,
+    "CATALOG_DELETING": 30,
+    "CATALOG_UPDATING": 31,
+    "CATALOG_ARCHIVE_UPDATING": 32,
+    "CATALOG_REMOVING": 33,
+    "COMPLETE": 100,
+    "FAILED": 101,
+    "COMPLETE_WITH_ERRORS": 102,
+    "COMPLETE_WITH_WARNINGS": 103,
+    "SPLIT": 110,
+    "SEARCHING": 1000,
+}
+
+COMPLETE = STATE_MAPPING["COMPLETE"]
+FAILED = STATE_MAPPING["FAILED"]
+COMPLETE_WITH_ERRORS = STATE_MAPPING["COMPLETE_WITH_ERRORS"]
+COMPLETE_WITH_WARNINGS = STATE_MAPPING["COMPLETE_WITH_WARNINGS"]
+SPLIT = STATE_MAPPING["SPLIT"]
+SEARCHING = STATE_MAPPING["SEARCHING"]
+
+# the name of each overall state.  A transaction whose sub-records are all
+# SEARCHING is shown with the more user friendly "QUEUED"
+STATE_NAMES = {v: k for k, v in STATE_MAPPING.items()}
+STATE_NAMES[SEARCHING] = "QUEUED"
+
+
+def transaction_state_code(transaction: Dict) -> Tuple[int, str, int]:
+    """Compute the overall state of a transaction from its sub-records in one
+    pass, without parsing any times.
+
+    :param transaction: a transaction record, as returned by monitor_transactions
+    :type transaction: Dict
+
+    :return: the overall state code (from STATE_MAPPING), the time of the last
+        update as an ISO format string, and the percentage complete
+    :rtype: Tuple[int, string, int]
+    """
+    min_state = SEARCHING
+    last_update = None
+    error_count = 0
+    complete_count = 0
+    n_subrecords = 0
+    for sr in transaction["sub_records"]:
+        code = STATE_MAPPING[sr["state"]]
+        if code < min_state:
+            min_state = code
+        # the times are all in the same ISO format, so the latest is the largest
+        # string, and only that one needs to be parsed
+        updated = sr["last_updated"]
+        if last_update is None or updated > last_update:
+            last_update = updated
+        if code == FAILED:
+            error_count += 1
+        elif code == COMPLETE:
+            complete_count += 1
+        if code != SPLIT:
+            n_subrecords += 1
+
+    if min_state == SEARCHING:
+        return SEARCHING, transaction["creation_time"], 0
+
+    if min_state == COMPLETE:
+        if error_count > 0:
+            min_state = COMPLETE_WITH_ERRORS
+        elif len(transaction.get("warnings", ())) > 0:
+            min_state = COMPLETE_WITH_WARNINGS
+
+    # percentage complete, rounded up
+    if n_subrecords != 0:
+        p_complete = -(-100 * complete_count // n_subrecords)
+    else:
+        p_complete = 100
+    return min_state, last_update, p_complete
+
+
+class TransactionStates:
+    """The overall states of a set of transactions, stored in columns backed by
+    arrays rather than as a dictionary per transaction.  Built by
+    aggregate_transaction_states.
+
+    The last update times are kept as the ISO format strings from the records, and
+    only parsed when they are asked for.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.states = array("h")
+        self.complete = array("b")
+        self.last_updates = []
+
+    def append(self, transaction: Dict):
+        """Add the state of a transaction record."""
+        code, last_update, p_complete = transaction_state_code(transaction)
+        self.ids.append(transaction.get("id"))
+        self.states.append(code)
+        self.complete.append(p_complete)
+        self.last_updates.append(last_update)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def state(self, index: int) -> Tuple[str, datetime, int]:
+        """Get the state of one transaction, in the form returned by
+        get_transaction_state."""
+        return (
+            STATE_NAMES[self.states[index]],
+            datetime.fromisoformat(self.last_updates[index]),
+            self.complete[index],
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """Count the transactions in each state, in the order of the states."""
+        counts = Counter(self.states)
+        return {STATE_NAMES[code]: counts[code] for code in sorted(counts)}
+
+
+def aggregate_transaction_states(records: Iterable[Dict]) -> TransactionStates:
+    """Compute the overall state, last update time and percentage complete of each
+    transaction in a monitor_transactions response, in one pass over the
+    records.  The records can be a stream, and are not kept.
+
+    :param records: the transaction records, e.g. response["data"]["records"]
+    :type records: Iterable[Dict]
+
+    :return: the states of the transactions, in the same order as the records
+    :rtype: TransactionStates
+    """
+    states = TransactionStates()
+    for tr in records:
+        states.append(tr)
+    return states
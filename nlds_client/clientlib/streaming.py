@@ -0,0 +1,404 @@
+"""Incremental decoding of the JSON responses from the server as they stream in."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import codecs
+import json
+import re
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator
+
+from nlds_client.clientlib.exceptions import ServerError
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRING_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+def iter_text(byte_chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Decode an iterable of byte chunks into an iterator of text chunks.  Multi-byte
+    characters that are split across two chunks are decoded correctly."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def unwrap_json_string(text_chunks: Iterable[str]) -> Iterator[str]:
+    """The NLDS server encodes its responses twice, so the body is a JSON string
+    that contains the JSON document.  If the document in text_chunks is a string
+    then yield its decoded contents, chunk by chunk, without holding the whole
+    string in memory.  Otherwise the chunks are passed through unchanged.
+
+    :param text_chunks: the text of a JSON document, in chunks
+    :type text_chunks: Iterable[str]
+
+    :raises ServerError: if the string is badly formed or does not end
+
+    :return: an iterator over the text of the inner JSON document
+    :rtype: Iterator[str]
+    """
+    chunks = iter(text_chunks)
+    buf = ""
+    for chunk in chunks:
+        buf = (buf + chunk).lstrip()
+        if buf:
+            break
+    if not buf:
+        return
+    if buf[0] != '"':
+        yield buf
+        yield from chunks
+        return
+
+    buf = buf[1:]
+    while True:
+        out = []
+        pos = 0
+        end = len(buf)
+        closed = False
+        while pos < end:
+            match = _STRING_SPECIAL.search(buf, pos)
+            if match is None:
+                out.append(buf[pos:])
+                pos = end
+                break
+            i = match.start()
+            out.append(buf[pos:i])
+            pos = i
+            if buf[i] == '"':
+                closed = True
+                break
+            # an escape sequence, which may be split across two chunks, in which
+            # case stop here and wait for the next chunk
+            if i + 1 >= end:
+                break
+            esc = buf[i + 1]
+            if esc != "u":
+                try:
+                    out.append(_STRING_ESCAPES[esc])
+                except KeyError:
+                    raise ServerError(
+                        f"Invalid escape sequence \\{esc} in the response from the "
+                        "server"
+                    )
+                pos = i + 2
+                continue
+            if i + 6 > end:
+                break
+            try:
+                code = int(buf[i + 2 : i + 6], 16)
+                # a UTF-16 surrogate pair is written as two escape sequences
+                if 0xD800 <= code <= 0xDBFF:
+                    if i + 12 > end:
+                        break
+                    if buf[i + 6 : i + 8] == "\\u":
+                        low = int(buf[i + 8 : i + 12], 16)
+                        if 0xDC00 <= low <= 0xDFFF:
+                            code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                            out.append(chr(code))
+                            pos = i + 12
+                            continue
+            except ValueError:
+                raise ServerError(
+                    f"Invalid unicode escape {buf[i:i + 6]} in the response from the "
+                    "server"
+                )
+            out.append(chr(code))
+            pos = i + 6
+
+        if out:
+            yield "".join(out)
+        if closed:
+            return
+        buf = buf[pos:]
+        try:
+            buf += next(chunks)
+        except StopIteration:
+            raise ServerError("The response from the server ended unexpectedly")
+
+
+class JSONItemStream:
+    """Parse a JSON document that arrives in chunks of text and yield the values at
+    `path` as soon as each one has been parsed.  Only one value is held in memory
+    at a time, rather than the whole document.
+
+    `path` is a sequence of object keys and array indices leading to the values,
+    where "*" matches any key or index.  For example, ("data", "holdings", "*")
+    yields each value in the "holdings" object inside the "data" object.
+
+    Along with each value, the parser keeps a "context" dictionary for each object
+    on the path, containing the members of that object that are not on the path
+    (e.g. the "label" and "user" of a holding while its files are being yielded).
+    A context only contains the members that appear before the value in the
+    document.  The context of the top-level object is available as `root`, and is
+    complete once iteration has finished, when `complete` is set to True.
+
+    :param text_chunks: the text of the JSON document, or None for an empty stream
+    :type text_chunks: Iterable[str]
+
+    :param path: the path to the values to yield
+    :type path: Sequence[str]
+
+    :param transform: function called as transform(contexts, value, keys), whose
+        return value is yielded instead of the value.  contexts is a tuple of the
+        context dictionaries, one for each container on the path, and keys is a
+        tuple of the object keys (or array indices, as strings) that the value was
+        found at, one for each element of the path.
+    :type transform: Callable, optional
+
+    :param close: function called when iteration finishes or the stream is closed
+    :type close: Callable, optional
+    """
+
+    def __init__(
+        self,
+        text_chunks: Iterable[str],
+        path,
+        transform: Callable = None,
+        close: Callable = None,
+    ):
+        self.root = {}
+        self.complete = False
+        self._chunks = None if text_chunks is None else iter(text_chunks)
+        self._path = tuple(path)
+        self._transform = transform
+        self._close = close
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        if self._chunks is None:
+            self.close()
+            return
+        try:
+            for contexts, keys, value in self._walk(0, [], []):
+                if self._transform is None:
+                    yield value
+                else:
+                    yield self._transform(contexts, value, keys)
+            self.complete = True
+        finally:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Call the close function, if it has not been called already."""
+        if self._close is not None:
+            close = self._close
+            self._close = None
+            close()
+
+    def _read(self) -> bool:
+        """Append the next chunk of text to the buffer, discarding the text that
+        has already been parsed.  Return False at the end of the document."""
+        if self._eof:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                self._buf = self._buf[self._pos :] + chunk
+                self._pos = 0
+                return True
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        """Skip any whitespace and return the next character, without consuming
+        it."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read():
+                raise ServerError("The response from the server ended unexpectedly")
+
+    def _value(self):
+        """Parse and return the complete value at the current position."""
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as je:
+                # the value may be incomplete, in which case read more and retry
+                if self._read():
+                    continue
+                raise ServerError(
+                    f"The response from the server could not be decoded: {je.msg}"
+                )
+            # a number at the end of the buffer may continue in the next chunk
+            if (
+                isinstance(value, (int, float))
+                and _NUMBER_TAIL.match(self._buf, end).end() == len(self._buf)
+                and self._read()
+            ):
+                continue
+            self._pos = end
+            return value
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ServerError(
+                f"The response from the server could not be decoded: expected "
+                f"'{char}' at '{self._buf[self._pos:self._pos + 20]}'"
+            )
+        self._pos += 1
+
+    def _walk(self, depth: int, contexts: list, keys: list):
+        """Walk the value at the current position, yielding (contexts, keys, value)
+        for each value that matches the path from this depth onwards."""
+        if depth == len(self._path):
+            yield tuple(contexts), tuple(keys), self._value()
+            return
+
+        key = self._path[depth]
+        char = self._peek()
+        if char == "{":
+            self._pos += 1
+            context = self.root if depth == 0 else {}
+            contexts.append(context)
+            while True:
+                char = self._peek()
+                if char == "}":
+                    self._pos += 1
+                    break
+                if char == ",":
+                    self._pos += 1
+                    continue
+                name = self._value()
+                self._expect(":")
+                if key == "*" or key == name:
+                    keys.append(name)
+                    yield from self._walk(depth + 1, contexts, keys)
+                    keys.pop()
+                else:
+                    context[name] = self._value()
+            contexts.pop()
+        elif char == "[":
+            self._pos += 1
+            contexts.append({})
+            index = 0
+            while True:
+                char = self._peek()
+                if char == "]":
+                    self._pos += 1
+                    break
+                if char == ",":
+                    self._pos += 1
+                    continue
+                if key == "*" or key == str(index):
+                    keys.append(str(index))
+                    yield from self._walk(depth + 1, contexts, keys)
+                    keys.pop()
+                else:
+                    self._value()
+                index += 1
+            contexts.pop()
+        else:
+            # not a container, so nothing below it can match the path
+            self._value()
+
+
+class JSONBodyStream:
+    """A JSON object to send as the body of a request, with one member that is a
+    (long) list of strings.  Iterating over it yields the encoded JSON in chunks of
+    bytes, with the list generated from an iterable as it is sent, so the whole
+    body is never held in memory.  When passed to requests as `data`, the body is
+    sent with chunked transfer encoding.
+
+    The body can be iterated over more than once, e.g. to retry a request.  If
+    `items` is an iterator, which can only be iterated over once, then the items
+    are also written to a temporary file as they are sent, and replayed from the
+    file on the next iteration.
+
+    :param params: the other members of the object
+    :type params: Dict
+
+    :param list_key: the name of the list member
+    :type list_key: str
+
+    :param items: the strings in the list
+    :type items: Iterable[str]
+
+    :param chunk_size: the approximate size of each chunk of bytes
+    :type chunk_size: int, optional
+    """
+
+    def __init__(
+        self,
+        params: Dict,
+        list_key: str,
+        items: Iterable[str],
+        chunk_size: int = 64 * 1024,
+    ):
+        self.params = params
+        self.list_key = list_key
+        self._items = items
+        self._chunk_size = chunk_size
+        self._spool = None
+        if iter(items) is items:
+            self._spool = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+
+    def _iter_items(self) -> Iterator[str]:
+        """Iterate over the items, recording them in the spool file if there is
+        one, and replaying the items that have already been recorded first."""
+        if self._spool is None:
+            yield from self._items
+            return
+        self._spool.seek(0)
+        for line in self._spool:
+            yield json.loads(line)
+        # the spool file is now positioned at the end, ready for new items
+        for item in self._items:
+            self._spool.write(json.dumps(item) + "\n")
+            yield item
+
+    def __iter__(self) -> Iterator[bytes]:
+        head = json.dumps(self.params)[:-1]
+        if self.params:
+            head += ", "
+        parts = [head, json.dumps(self.list_key), ": ["]
+        size = 0
+        sep = ""
+        for item in self._iter_items():
+            encoded = json.dumps(item)
+            parts.append(sep)
+            parts.append(encoded)
+            sep = ", "
+            size += len(encoded) + 2
+            if size >= self._chunk_size:
+                yield "".join(parts).encode("utf-8")
+                parts = []
+                size = 0
+        parts.append("]}")
+        yield "".join(parts).encode("utf-8")
+
+    def close(self):
+        """Delete the spool file, if there is one."""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
@@ -0,0 +1,632 @@
+"""Chunked, concurrent and resumable submission of putlist and getlist filelists."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+from nlds_client.clientlib.config import load_config, get_option, get_user, get_group
+from nlds_client.clientlib.transactions import (
+    put_filelist,
+    get_filelist,
+    monitor_transactions,
+)
+from nlds_client.clientlib.scan import scan_tree
+from nlds_client.clientlib.resolve import resolve_paths
+from nlds_client.clientlib.checkpoint import open_checkpoint, read_header, chunk_hash
+from nlds_client.clientlib.exceptions import UsageError
+
+
+def _filepath(item: Union[str, Tuple[str, int]]) -> str:
+    """Get the filepath of an item of a filelist, which is either a filepath or a
+    (filepath, size) pair."""
+    return item if isinstance(item, str) else item[0]
+
+
+def chunk_filelist(
+    filelist: Iterable[Union[str, Tuple[str, int]]],
+    max_files: int = None,
+    max_bytes: int = None,
+) -> Iterator[List[str]]:
+    """Split a filelist into chunks containing at most max_files files and at most
+    max_bytes bytes.  The filelist is consumed lazily, so it can be a generator.
+
+    :param filelist: the list of filepaths to split, or of (filepath, size) pairs,
+        e.g. from scan.scan_tree, if the sizes of the files are already known
+    :type filelist: Iterable[string | Tuple[string, int]]
+
+    :param max_files: the maximum number of files in a chunk, or None for no limit
+    :type max_files: int, optional
+
+    :param max_bytes: the maximum total size of the files in a chunk, or None for no
+        limit.  The size of each file that is not given in the filelist is read
+        from the local filesystem, files that cannot be read count as zero bytes.
+        A file larger than max_bytes will be put in a chunk on its own.
+    :type max_bytes: int, optional
+
+    :return: an iterator over the chunks
+    :rtype: Iterator[List[string]]
+    """
+    chunk = []
+    chunk_bytes = 0
+    for item in filelist:
+        if isinstance(item, str):
+            fp, size = item, None
+        else:
+            fp, size = item
+        if not max_bytes:
+            size = 0
+        elif size is None:
+            try:
+                size = os.lstat(os.path.expanduser(fp)).st_size
+            except OSError:
+                size = 0
+        if chunk and (
+            (max_files and len(chunk) >= max_files)
+            or (max_bytes and chunk_bytes + size > max_bytes)
+        ):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(fp)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+def submit_chunks(
+    submit: Callable[[List[str]], Dict],
+    chunks: Iterable[List[str]],
+    workers: int = 1,
+) -> List[Dict]:
+    """Submit each chunk by calling submit(chunk) from a pool of worker threads.
+    At most `workers` chunks are in flight at once, and no more chunks are taken
+    from the chunks iterator than are needed to keep the workers busy.
+
+    If any submission raises an exception then no more chunks are submitted, the
+    chunks already in flight are allowed to finish, and the exception is re-raised.
+
+    :param submit: function that submits one chunk and returns the response
+    :type submit: Callable
+
+    :param chunks: the chunks to submit
+    :type chunks: Iterable[List[string]]
+
+    :param workers: the number of chunks to submit at the same time
+    :type workers: int
+
+    :return: the responses, in the same order as the chunks
+    :rtype: List[Dict]
+    """
+    responses = {}
+    chunks = enumerate(chunks)
+    workers = max(1, workers)
+    error = None
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def _collect(done):
+            nonlocal error
+            for future in done:
+                idx = pending.pop(future)
+                try:
+                    responses[idx] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+        for idx, chunk in chunks:
+            if len(pending) >= workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done)
+            if error is not None:
+                break
+            pending[executor.submit(submit, chunk)] = idx
+        _collect(wait(pending).done)
+
+    if error is not None:
+        raise error
+    return [responses[idx] for idx in sorted(responses)]
+
+
+def aggregate_responses(action: str, job_label: str, responses: List[Dict]) -> Dict:
+    """Combine the responses from the transactions of a chunked submission into a
+    single response.
+
+    :param action: the action of the job, for the message, i.e. "PUT" or "GET"
+    :type action: string
+
+    :param job_label: the job label shared by all the transactions
+    :type job_label: string
+
+    :param responses: the response of each transaction, in chunk order
+    :type responses: List[Dict]
+
+    :return: A Dictionary of the aggregated response
+    :rtype: Dict
+    """
+    transaction_ids = [str(r["transaction_id"]) for r in responses]
+    n_failed = sum(1 for r in responses if not r["success"])
+    msg = (
+        f"{action} job with job label {job_label} submitted as {len(responses)} "
+        "transaction"
+    )
+    if len(responses) != 1:
+        msg += "s"
+    if n_failed > 0:
+        msg += f", {n_failed} of which failed"
+    return {
+        "msg": msg,
+        "job_label": job_label,
+        "transaction_ids": transaction_ids,
+        "responses": responses,
+        "success": n_failed == 0,
+    }
+
+
+def _transaction_exists(user: str, group: str, groupall: bool, transaction_id: str):
+    """Determine whether the server has a record of a transaction."""
+    response = monitor_transactions(
+        user, group, groupall=groupall, transaction_id=transaction_id
+    )
+    return bool(response.get("success") and response.get("data", {}).get("records"))
+
+
+def submit_resumable(
+    config: Dict,
+    action: str,
+    job_label: str,
+    header: Dict,
+    submit: Callable[[List[str], str], Dict],
+    chunks: Iterable[List[str]],
+    workers: int = 1,
+    resume: bool = False,
+    user: str = None,
+    group: str = None,
+    groupall: bool = False,
+    on_start: Callable[[str, str], None] = None,
+) -> Dict:
+    """Submit chunks, as submit_chunks, recording each chunk that the server
+    accepts, and its transaction id, in a checkpoint file (see
+    checkpoint.open_checkpoint).  If the submission is interrupted then it can be
+    resumed, skipping the chunks that were accepted.  A chunk that was sent but
+    not answered is looked up on the server, and only sent again if the server
+    does not have it.  The checkpoint is deleted once every chunk is accepted.
+
+    :param action: the action of the job, "put" or "get"
+    :type action: string
+
+    :param header: the parameters of the job that must be the same to resume it
+    :type header: Dict
+
+    :param submit: function that submits one chunk, with the given transaction id,
+        and returns the response
+    :type submit: Callable[[List[string], string], Dict]
+
+    :param resume: resume the job from its checkpoint
+    :type resume: bool, optional
+
+    :param on_start: function called with the job label and the path of the
+        checkpoint file before the first chunk is sent, so that they can be shown
+        to the user in case the submission is interrupted
+    :type on_start: Callable[[string, string], None], optional
+
+    The chunks and workers are as for submit_chunks, and user, group
+    and groupall are used to look up unacknowledged chunks.
+
+    :raises UsageError: if the job cannot be resumed
+
+    :return: A Dictionary of the aggregated response.  If any chunk failed then
+        "checkpoint" contains the path of the checkpoint file.
+    :rtype: Dict
+    """
+    checkpoint = open_checkpoint(config, action, job_label, header, resume)
+    if on_start is not None:
+        on_start(job_label, checkpoint.path)
+    previous = []
+
+    def _to_submit():
+        for idx, chunk in enumerate(chunks):
+            digest = chunk_hash(chunk)
+            entry = checkpoint.check_chunk(idx, digest)
+            if entry is not None and entry["status"] == "submitting":
+                if _transaction_exists(user, group, groupall, entry["transaction_id"]):
+                    checkpoint.record(
+                        "accepted", idx, entry["transaction_id"], digest, len(chunk)
+                    )
+                else:
+                    entry = None
+            if entry is None:
+                yield idx, chunk, digest
+            else:
+                previous.append(
+                    (
+                        idx,
+                        {
+                            "transaction_id": entry["transaction_id"],
+                            "msg": f"Chunk {idx} was accepted by a previous run",
+                            "resumed": True,
+                            "success": True,
+                        },
+                    )
+                )
+
+    def _submit(item):
+        idx, chunk, digest = item
+        transaction_id = str(uuid.uuid4())
+        checkpoint.record("submitting", idx, transaction_id, digest, len(chunk))
+        response = submit(chunk, transaction_id)
+        response.setdefault("transaction_id", transaction_id)
+        status = "accepted" if response["success"] else "rejected"
+        checkpoint.record(status, idx, transaction_id, digest, len(chunk))
+        return idx, response
+
+    try:
+        submitted = submit_chunks(_submit, _to_submit(), workers=workers)
+    finally:
+        checkpoint.close()
+    responses = [r for _, r in sorted(previous + submitted, key=lambda ir: ir[0])]
+    aggregated = aggregate_responses(action.upper(), job_label, responses)
+    if aggregated["success"]:
+        checkpoint.remove()
+    else:
+        aggregated["checkpoint"] = checkpoint.path
+    return aggregated
+
+
+def _chunk_settings(config, chunk_files, chunk_bytes, workers):
+    """Get the chunk settings from the arguments, falling back to the ['options']
+    section of the config."""
+    if chunk_files is None:
+        chunk_files = get_option(config, "submit_chunk_files")
+    if chunk_bytes is None:
+        chunk_bytes = get_option(config, "submit_chunk_bytes")
+    if workers is None:
+        workers = get_option(config, "submit_workers")
+    return chunk_files, chunk_bytes, workers
+
+
+def _check_resume(resume: bool, job_label: str, chunked):
+    """Check that a submission can be resumed."""
+    if not resume:
+        return
+    if not chunked:
+        raise UsageError(
+            "Only a filelist that is split into chunks can be resumed.  Use "
+            "--chunk_files or --chunk_bytes, or the submit_chunk_files or "
+            "submit_chunk_bytes options."
+        )
+    if job_label is None:
+        raise UsageError("The job label of the submission is needed to resume it")
+
+
+def put_filelist_chunked(
+    filelist: Iterable[Union[str, Tuple[str, int]]] = [],
+    user: str = None,
+    group: str = None,
+    job_label: str = None,
+    label: str = None,
+    holding_id: int = None,
+    tag: Dict = None,
+    chunk_files: int = None,
+    chunk_bytes: int = None,
+    workers: int = None,
+    resume: bool = False,
+    on_start: Callable[[str, str], None] = None,
+) -> Dict:
+    """Put a list of files into the NLDS, splitting it into chunks that are each
+    submitted as a separate transaction, under the same job label.
+    If no chunk size is given here or in the config then the filelist is submitted
+    as a single transaction and the response from put_filelist is returned.
+    Otherwise the progress of the submission is recorded in a checkpoint, so that
+    it can be resumed if it is interrupted, see submit_resumable.
+
+    :param filelist: the list of filepaths to put into storage, or of (filepath,
+        size) pairs if the sizes are already known, see chunk_filelist
+    :type filelist: Iterable[string | Tuple[string, int]]
+
+    :param user: the username to put the files
+    :type user: string
+
+    :param group: the group to put the files
+    :type group: string
+
+    :param job_label: the label shared by all the transactions.  If None then one is
+        created from a random UUID.
+    :type job_label: string, optional
+
+    :param label: the label of the holding that files are to be added to.  If none
+        of label, holding_id and tag is given then a new holding is created with a
+        random label, the same for every transaction of the submission.
+    :type label: str, optional
+
+    :param holding_id: the integer id of an existing holding that files are to be added to
+    :type holding_id: int, optional
+
+    :param tag: a dictionary of key:value pairs to add as tags to the holding upon creation
+    :type tag: dict, optional
+
+    :param chunk_files: the maximum number of files in each transaction
+    :type chunk_files: int, optional
+
+    :param chunk_bytes: the maximum total size of the files in each transaction
+    :type chunk_bytes: int, optional
+
+    :param workers: the number of transactions to submit at the same time
+    :type workers: int, optional
+
+    :param resume: resume an interrupted submission with the same job label,
+        skipping the chunks that were accepted
+    :type resume: bool, optional
+
+    :param on_start: called with the job label and checkpoint path before the
+        first chunk is sent, see submit_resumable
+    :type on_start: Callable[[string, string], None], optional
+
+    :raises UsageError: if resume is True and the filelist is not chunked, no
+        job_label is given, or the submission cannot be resumed
+
+    :return: A Dictionary of the aggregated response
+    :rtype: Dict
+    """
+    config = load_config()
+    chunk_files, chunk_bytes, workers = _chunk_settings(
+        config, chunk_files, chunk_bytes, workers
+    )
+    _check_resume(resume, job_label, chunk_files or chunk_bytes)
+    if not chunk_files and not chunk_bytes:
+        filelist = (_filepath(item) for item in filelist)
+        return put_filelist(filelist, user, group, job_label, label, holding_id, tag)
+
+    if job_label is None:
+        job_label = str(uuid.uuid4())[0:8]
+    # the transactions are processed asynchronously, so a holding that does not
+    # exist yet would be created by each transaction that does not name it.  Naming
+    # the holding in every transaction adds them all to the one holding.  The label
+    # is new for each submission, so that it never adds to an existing holding, and
+    # is kept in the checkpoint for when the submission is resumed.
+    if label is None and holding_id is None and tag is None:
+        previous = read_header(config, "put", job_label) if resume else None
+        if previous and previous.get("label"):
+            label = previous["label"]
+        else:
+            label = str(uuid.uuid4())
+
+    def _submit(chunk, transaction_id):
+        return put_filelist(
+            chunk, user, group, job_label, label, holding_id, tag, transaction_id
+        )
+
+    header = {
+        "user": get_user(config, user),
+        "group": get_group(config, group),
+        "label": label,
+        "holding_id": holding_id,
+        "tag": tag,
+        "chunk_files": chunk_files,
+        "chunk_bytes": chunk_bytes,
+    }
+    return submit_resumable(
+        config,
+        "put",
+        job_label,
+        header,
+        _submit,
+        chunk_filelist(filelist, chunk_files, chunk_bytes),
+        workers=workers,
+        resume=resume,
+        user=user,
+        group=group,
+        on_start=on_start,
+    )
+
+
+def put_directory(
+    directory: str,
+    user: str = None,
+    group: str = None,
+    job_label: str = None,
+    label: str = None,
+    holding_id: int = None,
+    tag: Dict = None,
+    include: Sequence[str] = None,
+    exclude: Sequence[str] = None,
+    scan_workers: int = None,
+    chunk_files: int = None,
+    chunk_bytes: int = None,
+    workers: int = None,
+) -> Dict:
+    """Put all of the files in a directory tree into the NLDS.  The tree is walked
+    in parallel by scan.scan_tree, and the files are passed to
+    put_filelist_chunked as they are found, so that the transactions can be
+    submitted before the walk has finished.
+
+    :param directory: the directory to put
+    :type directory: string
+
+    :param include: glob patterns of the files to include, see scan.scan_tree
+    :type include: Sequence[string], optional
+
+    :param exclude: glob patterns of the files and directories to exclude
+    :type exclude: Sequence[string], optional
+
+    :param scan_workers: the number of directories to list at the same time.
+        Defaults to ['options']['scan_workers'] in the config.
+    :type scan_workers: int, optional
+
+    The other parameters are the same as for put_filelist_chunked.
+
+    :return: A Dictionary of the response
+    :rtype: Dict
+    """
+    if scan_workers is None:
+        scan_workers = get_option(load_config(), "scan_workers")
+    # the sizes found by the scan are passed on, so that they are not read again
+    # to split the files into chunks
+    return put_filelist_chunked(
+        scan_tree(directory, include, exclude, scan_workers),
+        user,
+        group,
+        job_label,
+        label,
+        holding_id,
+        tag,
+        chunk_files=chunk_files,
+        chunk_bytes=chunk_bytes,
+        workers=workers,
+    )
+
+
+def get_filelist_chunked(
+    filelist: Iterable[str] = [],
+    user: str = None,
+    group: str = None,
+    groupall: bool = False,
+    target: str = None,
+    job_label: str = None,
+    label: str = None,
+    holding_id: int = None,
+    tag: Dict = None,
+    regex: bool = False,
+    chunk_files: int = None,
+    workers: int = None,
+    resolve: bool = True,
+    resume: bool = False,
+    on_start: Callable[[str, str], None] = None,
+) -> Dict:
+    """Get a list of files from the NLDS, splitting it into chunks that are each
+    submitted as a separate transaction, under the same job label.
+    If no chunk size is given here or in the config then the filelist is submitted
+    as a single transaction and the response from get_filelist is returned.
+    Files being retrieved are not on the local filesystem, so only the number of
+    files in a chunk can be limited, not their size.
+
+    :param filelist: the list of filepaths to get from the storage
+    :type filelist: Iterable[string]
+
+    :param user: the username to get the files
+    :type user: string, optional
+
+    :param group: the group to get the files
+    :type group: string, optional
+
+    :param groupall: get files that belong to the group, rather than the user
+    :type groupall: bool, optional
+
+    :param target: the location to write the retrieved files to
+    :type target: string, optional
+
+    :param job_label: the label shared by all the transactions.  If None then either
+        the holding label or a random one is used.
+    :type job_label: string, optional
+
+    :param label: the label of an existing holding that files are to be
+    retrieved from
+    :type label: str, optional
+
+    :param holding_id: the integer id of a holding that files are to be
+    retrieved from
+    :type holding_id: int, optional
+
+    :param tag: a dictionary of key:value pairs to search for in a holding that
+    files are to be retrieved from
+    :type tag: dict, optional
+
+    :param regex: whether the label and the path are regular expressions
+    :type regex: bool, optional
+
+    :param chunk_files: the maximum number of files in each transaction
+    :type chunk_files: int, optional
+
+    :param workers: the number of transactions to submit at the same time
+    :type workers: int, optional
+
+    :param resolve: resolve the filepaths, as for get_filelist
+    :type resolve: bool, optional
+
+    :param resume: resume an interrupted submission, as for put_filelist_chunked
+    :type resume: bool, optional
+
+    :param on_start: called with the job label and checkpoint path before the
+        first chunk is sent, see submit_resumable
+    :type on_start: Callable[[string, string], None], optional
+
+    :return: A Dictionary of the aggregated response
+    :rtype: Dict
+    """
+    config = load_config()
+    chunk_files, _, workers = _chunk_settings(config, chunk_files, None, workers)
+    _check_resume(resume, job_label or label, chunk_files)
+    if not chunk_files:
+        return get_filelist(
+            filelist,
+            user,
+            group,
+            groupall,
+            target,
+            job_label,
+            label,
+            holding_id,
+            tag,
+            regex,
+            resolve=resolve,
+        )
+
+    if resolve and not target:
+        # resolve the whole filelist before it is chunked, so that the cache of
+        # resolved directories is shared between the chunks
+        filelist = resolve_paths(
+            (fp for fp in (fp.strip() for fp in filelist) if fp),
+            get_option(config, "resolve_workers"),
+        )
+
+    if job_label is None:
+        job_label = label if label is not None else str(uuid.uuid4())[0:8]
+
+    def _submit(chunk, transaction_id):
+        return get_filelist(
+            chunk,
+            user,
+            group,
+            groupall,
+            target,
+            job_label,
+            label,
+            holding_id,
+            tag,
+            regex,
+            transaction_id,
+            resolve=False,
+        )
+
+    header = {
+        "user": get_user(config, user),
+        "group": get_group(config, group),
+        "groupall": groupall,
+        "target": target,
+        "label": label,
+        "holding_id": holding_id,
+        "tag": tag,
+        "regex": regex,
+        "chunk_files": chunk_files,
+    }
+    return submit_resumable(
+        config,
+        "get",
+        job_label,
+        header,
+        _submit,
+        chunk_filelist(filelist, chunk_files),
+        workers=workers,
+        resume=resume,
+        user=user,
+        group=group,
+        groupall=groupall,
+        on_start=on_start,
+    )
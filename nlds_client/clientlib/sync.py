@@ -0,0 +1,187 @@
+"""Put only the new or changed files in a directory tree into a holding."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import os
+import re
+from itertools import chain, islice
+from typing import Dict, Sequence
+
+from nlds_client.clientlib.config import load_config, get_option
+from nlds_client.clientlib.transactions import stream_find_file
+from nlds_client.clientlib.submission import put_filelist_chunked
+from nlds_client.clientlib.scan import scan_tree
+from nlds_client.clientlib.exceptions import ServerError
+
+# the failure reported by catalog/find when the holding does not exist, or has no
+# files under the directory, e.g. "Holding with label:x not found"
+_NOT_FOUND = re.compile(r"\b(holding|file)\b.*\bnot found\b", re.IGNORECASE)
+
+
+def archived_files(
+    label: str,
+    directory: str,
+    user: str = None,
+    group: str = None,
+    holding_id: int = None,
+) -> Dict[str, int]:
+    """Get the path and size of each file under directory that is already in the
+    holding.
+
+    :param label: the label of the holding
+    :type label: string
+
+    :param directory: the directory the files are in
+    :type directory: string
+
+    :param user: the username to find the files for
+    :type user: string, optional
+
+    :param group: the group to find the files for
+    :type group: string, optional
+
+    :param holding_id: the integer id of the holding, used instead of the label
+    :type holding_id: int, optional
+
+    :raises ServerError: if the files could not be found for any reason other than
+        the holding, or files in it, not existing
+
+    :return: a Dictionary of path: size.  This is empty if the holding does not
+        exist.
+    :rtype: Dict[string, int]
+    """
+    directory = os.path.abspath(os.path.expanduser(directory))
+    prefix = os.path.join(directory, "")
+    stream = stream_find_file(
+        user, group, label=label, holding_id=holding_id, path=directory, cache=False
+    )
+    files = {}
+    for _, _, f in stream:
+        path = f.get("original_path")
+        if path is not None and path.startswith(prefix):
+            files[path] = f.get("size")
+    # a holding that does not exist has no files in it.  Any other failure, e.g.
+    # of permissions, must not be taken as an empty holding, as the whole
+    # directory would then be submitted again.  Errors contacting the server have
+    # already been raised.
+    if not stream.root["success"]:
+        failure = stream.root.get("details", {}).get("failure") or ""
+        if not _NOT_FOUND.search(failure):
+            msg = stream.root.get("msg") or f"FIND files in holding {label} failed"
+            if failure:
+                msg += "\nReason: " + failure
+            raise ServerError(msg)
+    return files
+
+
+def sync_directory(
+    directory: str,
+    label: str,
+    user: str = None,
+    group: str = None,
+    job_label: str = None,
+    holding_id: int = None,
+    tag: Dict = None,
+    include: Sequence[str] = None,
+    exclude: Sequence[str] = None,
+    scan_workers: int = None,
+    dry_run: bool = False,
+    chunk_files: int = None,
+    chunk_bytes: int = None,
+    workers: int = None,
+) -> Dict:
+    """Put the files in a directory tree into a holding, skipping the files that
+    are already in the holding with the same size.  The difference between the
+    directory and the holding is worked out locally, and only the new and changed
+    files are submitted.
+
+    :param directory: the directory to sync
+    :type directory: string
+
+    :param label: the label of the holding to sync the directory to.  The holding
+        is created if it does not exist.
+    :type label: string
+
+    :param include: glob patterns of the files to include, see scan.scan_tree
+    :type include: Sequence[string], optional
+
+    :param exclude: glob patterns of the files and directories to exclude
+    :type exclude: Sequence[string], optional
+
+    :param scan_workers: the number of directories to list at the same time.
+        Defaults to ['options']['scan_workers'] in the config.
+    :type scan_workers: int, optional
+
+    :param dry_run: work out which files would be submitted, but do not submit
+        them
+    :type dry_run: bool, optional
+
+    The other parameters are the same as for submission.put_filelist_chunked.
+
+    :return: A Dictionary containing the number of "new", "changed" and
+        "unchanged" files, the list of files to submit ("filelist") if dry_run is
+        True, and the response from the submission ("response") otherwise.
+    :rtype: Dict
+    """
+    if scan_workers is None:
+        scan_workers = get_option(load_config(), "scan_workers")
+    archived = archived_files(label, directory, user, group, holding_id)
+    counts = {"new": 0, "changed": 0, "unchanged": 0}
+
+    def _to_submit():
+        for path, size in scan_tree(directory, include, exclude, scan_workers):
+            archived_size = archived.get(path)
+            if archived_size is None:
+                counts["new"] += 1
+            elif archived_size != size:
+                counts["changed"] += 1
+            else:
+                counts["unchanged"] += 1
+                continue
+            # the size is passed on so that it is not read again to chunk the files
+            yield path, size
+
+    if dry_run:
+        filelist = [fp for fp, _ in _to_submit()]
+        response = None
+    else:
+        filelist = None
+        # put_filelist_chunked submits the filelist as it is generated, so the
+        # counts are not complete until it has returned
+        filelist_iter = _to_submit()
+        first = [fp for fp in islice(filelist_iter, 1)]
+        if first:
+            response = put_filelist_chunked(
+                chain(first, filelist_iter),
+                user,
+                group,
+                job_label,
+                label,
+                holding_id,
+                tag,
+                chunk_files=chunk_files,
+                chunk_bytes=chunk_bytes,
+                workers=workers,
+            )
+        else:
+            response = None
+
+    msg = (
+        f"SYNC {directory} to holding with label {label}: {counts['new']} new, "
+        f"{counts['changed']} changed and {counts['unchanged']} unchanged files"
+    )
+    result = dict(counts, msg=msg, label=label)
+    if dry_run:
+        result["filelist"] = filelist
+        result["success"] = True
+    elif response is None:
+        result["msg"] += ", nothing to submit"
+        result["success"] = True
+    else:
+        result["response"] = response
+        result["success"] = response["success"]
+    return result
@@ -0,0 +1,153 @@
+"""Timings of the phases of a command, for nlds --timings."""
+
+__author__ = "Neil Massey and Jack Leland"
+__date__ = "18 Oct 2026"
+__copyright__ = "Copyright 2026 United Kingdom Research and Innovation"
+__license__ = "BSD - see LICENSE file in top-level package directory"
+__contact__ = "neil.massey@stfc.ac.uk"
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator
+
+# Timings of the phases of a command, for `nlds --timings`.  Each phase records
+# its exclusive time: the time spent in a phase that is nested inside another is
+# not counted in the outer one, so the phases add up to the time of the command
+# (for the main thread).  Nothing is recorded until enable is called, and phase
+# costs a single check when it is not.
+
+_ENABLED = False
+_START = None
+_LOCK = threading.Lock()
+# phase name: [calls, seconds]
+_PHASES = {}
+# counter name: value, e.g. bytes_sent
+_COUNTERS = {}
+# the stack of [name, start, child seconds] of the open phases, per thread
+_LOCAL = threading.local()
+
+# the order the phases are reported in, phases not in this list come after
+PHASE_ORDER = ["config", "token_io", "oauth", "http", "decode", "render"]
+
+
+def enable():
+    """Start recording timings, discarding any that were recorded before."""
+    global _ENABLED, _START
+    with _LOCK:
+        _PHASES.clear()
+        _COUNTERS.clear()
+        _START = time.perf_counter()
+        _ENABLED = True
+
+
+def disable():
+    """Stop recording timings."""
+    global _ENABLED
+    _ENABLED = False
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+@contextmanager
+def phase(name: str):
+    """Record the time spent in the body of the with statement against a phase."""
+    if not _ENABLED:
+        yield
+        return
+    stack = getattr(_LOCAL, "stack", None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    frame = [name, time.perf_counter(), 0.0]
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - frame[1]
+        if stack:
+            stack[-1][2] += elapsed
+        with _LOCK:
+            entry = _PHASES.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed - frame[2]
+
+
+def timed(name: str) -> Callable:
+    """Decorate a function so that each call is recorded against a phase."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+            with phase(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_iter(name: str, iterable: Iterable) -> Iterator:
+    """Pass the items of an iterable through, recording the time taken to get
+    each one against a phase, e.g. reading the chunks of a streamed response."""
+    if not _ENABLED:
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def count(name: str, value: int = 1):
+    """Add to a counter, e.g. bytes_sent, bytes_received or retries."""
+    if not _ENABLED:
+        return
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+
+def results() -> Dict:
+    """Get the timings recorded so far.
+
+    :return: A Dictionary containing "total", the seconds since enable was called,
+        "phases", mapping each phase to its "calls" and "seconds", and "counters"
+    :rtype: Dict
+    """
+    with _LOCK:
+        phases = {
+            name: {"calls": calls, "seconds": seconds}
+            for name, (calls, seconds) in _PHASES.items()
+        }
+        counters = dict(_COUNTERS)
+    total = time.perf_counter() - _START if _START is not None else 0.0
+    return {"total": total, "phases": phases, "counters": counters}
+
+
+def report() -> str:
+    """Format the timings recorded so far as a table, one line per phase, with the
+    time not spent in any phase shown as "other"."""
+    r = results()
+    names = [n for n in PHASE_ORDER if n in r["phases"]]
+    names += sorted(n for n in r["phases"] if n not in PHASE_ORDER)
+    lines = [f"{'phase':<12}{'calls':>8}{'time (ms)':>12}"]
+    in_phases = 0.0
+    for name in names:
+        p = r["phases"][name]
+        in_phases += p["seconds"]
+        lines.append(f"{name:<12}{p['calls']:>8}{p['seconds'] * 1e3:>12.1f}")
+    other = max(r["total"] - in_phases, 0.0)
+    lines.append(f"{'other':<12}{'':>8}{other * 1e3:>12.1f}")
+    lines.append(f"{'total':<12}{'':>8}{r['total'] * 1e3:>12.1f}")
+    for name in sorted(r["counters"]):
+        lines.append(f"{name:<20}{r['counters'][name]:>12}")
+    return "\n".join(lines)
@@ -7,14 +7,15 @@ __license__ = "BSD - see LICENSE file in top-level package directory"
 __contact__ = "neil.massey@stfc.ac.uk"
 
 import json
+import time
 import uuid
 import urllib.parse
 import os
 from pathlib import Path
 from datetime import datetime
 from base64 import b64decode
-from typing import List, Dict, Any
-import math
+from itertools import chain, islice
+from typing import List, Dict, Any, Iterable
 from nlds_client import __version__
 
 import requests
@@ -35,11 +36,33 @@ from nlds_client.clientlib.config import (
     get_group_config,
 )
 from nlds_client.clientlib.authentication import (
-    load_token,
+    get_token,
     get_password,
     fetch_oauth2_token,
     fetch_oauth2_token_from_refresh,
     fetch_s3_access_keys,
+    remove_token,
+)
+from nlds_client.clientlib.session import get_session
+from nlds_client.clientlib import timings, hooks
+from nlds_client.clientlib.resolve import resolve_paths
+from nlds_client.clientlib.states import STATE_NAMES, transaction_state_code
+from nlds_client.clientlib.journal import (
+    journal_enabled,
+    record_transaction,
+    FilelistDigest,
+)
+from nlds_client.clientlib.cache import (
+    cache_enabled,
+    lookup_query,
+    store_query,
+    TextRecorder,
+)
+from nlds_client.clientlib.streaming import (
+    JSONItemStream,
+    JSONBodyStream,
+    iter_text,
+    unwrap_json_string,
 )
 from nlds_client.clientlib.exceptions import *
 
@@ -48,6 +71,11 @@ from nlds_client.clientlib.nlds_client_setup import (
     DEFAULT_SERVER_URL,
 )
 
+# size of the chunks the response is read in when it is decoded incrementally
+STREAM_CHUNK_SIZE = 64 * 1024
+# number of records requested at a time by iter_holdings and iter_find_files
+DEFAULT_PAGE_SIZE = 1000
+
 
 def construct_server_url(config: Dict, method=""):
     """Construct the url from the details in the config file.
@@ -160,7 +188,15 @@ def tag_to_string(tag: dict):
     return tag_str[:-1]
 
 
-def main_loop(
+def _method_name(method):
+    """Get the HTTP method name from either a string or one of the request
+    functions in the requests module (requests.get, requests.put, etc.)"""
+    if callable(method):
+        return method.__name__.upper()
+    return method.upper()
+
+
+def send_request(
     url: str,
     input_params: Dict = None,
     body_params: Dict = None,
@@ -168,21 +204,28 @@ def main_loop(
     authenticate_fl: bool = True,
     **kwargs,
 ):
-    """Generalised main loop to make requests to the NLDS server
+    """Make a request to the NLDS server, authenticating and refreshing the OAuth
+    token as necessary, and return the response without decoding it.
     :param url: the API URL to contact
     :type user: string
 
     :param input_params: the input parameters for the API request (or None)
     :type input_params: dict
 
-    :param body_params: the body parameters for the API request (or None)
-    :type body_params: dict
+    :param body_params: the body parameters for the API request (or None).  If
+        this is a JSONBodyStream then the body is generated as it is sent, with
+        chunked transfer encoding.
+    :type body_params: dict | JSONBodyStream
+
+    :param method: the HTTP method to use, either as a string ("GET", "PUT", etc.)
+        or one of the requests module functions (requests.get, requests.put, etc.)
+    :type method: str | Callable
 
     :raises requests.exceptions.ConnectionError: if the server cannot be
     reached
 
-    :return: A Dictionary of the response or None
-    :rtype: Dict
+    :return: the response or None
+    :rtype: requests.models.Response
     """
     # Convert input parameters to empty dictionaries if None
     if input_params is None:
@@ -193,6 +236,10 @@ def main_loop(
     config = load_config()
     c_try = 0
     MAX_LOOPS = 2
+    # all requests go through the shared session, so that the connection to the
+    # server is reused between calls
+    session = get_session(config)
+    method = _method_name(method)
 
     # Prioritise kwarg over config file value
     if "verify" in kwargs:
@@ -207,6 +254,7 @@ def main_loop(
 
         warnings.filterwarnings("ignore", category=InsecureRequestWarning)
 
+    auth_token = None
     while c_try < MAX_LOOPS:
         c_try += 1
         token_headers = {
@@ -217,7 +265,7 @@ def main_loop(
         # Attempt to do authentication if flag set
         if authenticate_fl:
             try:
-                auth_token = load_token(config)
+                auth_token = get_token(config)
             except FileNotFoundError:
                 # we need the username and password to get the OAuth2 token in
                 # the password flow
@@ -228,31 +276,61 @@ def main_loop(
                 # we don't want to do the rest of the loop!
                 continue
             token_headers["Authorization"] = f"Bearer {auth_token['access_token']}"
+        sent = None
+        if isinstance(body_params, JSONBodyStream):
+            # a new iterator on each loop, so the body is sent again in full
+            body = iter(body_params)
+            if timings.enabled() or hooks.active("request_end"):
+                body = sent = _ByteCounter(body)
+            body_kwargs = {"data": body}
+        else:
+            body_kwargs = {"json": body_params}
+        if hooks.active("request_start"):
+            hooks.emit("request_start", method=method, url=url, attempt=c_try)
+        start = time.perf_counter()
         try:
-            response = method(
-                url,
-                headers=token_headers,
-                params=input_params,
-                json=body_params,
-                verify=verify,
-                **kwargs,
-            )
+            with timings.phase("http"):
+                response = session.request(
+                    method,
+                    url,
+                    headers=token_headers,
+                    params=input_params,
+                    verify=verify,
+                    **body_kwargs,
+                    **kwargs,
+                )
         except requests.exceptions.ConnectionError as e:
+            if hooks.active("request_end"):
+                hooks.emit(
+                    "request_end",
+                    method=method,
+                    url=url,
+                    attempt=c_try,
+                    status_code=None,
+                    elapsed=time.perf_counter() - start,
+                    bytes_sent=sent.n_bytes if sent is not None else None,
+                    bytes_received=0,
+                    error=str(e),
+                )
             raise ConnectionError(
                 f"Could not connect to the URL: {url}\n"
                 f"Reason {e}\n"
                 "Check the ['server']['url'] and ['server']['api'] setting in "
                 f"the {CONFIG_FILE_LOCATION} file."
             )
+        _request_end(method, url, c_try, response, sent, start, kwargs)
         # process the returned response
         try:
             process_transaction_response(response, url, config)
         except AuthenticationError as ae:
+            # release the connection back to the pool, the body is not needed
+            response.close()
             # try to get a new token via the refresh method
             try:
                 # first loop fetch a new oauth token
                 if c_try < MAX_LOOPS:
-                    auth_token = fetch_oauth2_token_from_refresh(config)
+                    _retry(method, url, c_try, response.status_code, "token rejected")
+                    auth_token = fetch_oauth2_token_from_refresh(config, auth_token)
                     continue
                 else:
                     raise ae
@@ -262,35 +340,397 @@ def main_loop(
                     ae.status_code == requests.codes.unauthorized
                     or ae.status_code == requests.codes.bad_request
                 ):
-                    os.remove(
-                        os.path.expanduser(
-                            config["authentication"]["oauth_token_file_location"]
-                        )
-                    )
+                    remove_token(config, auth_token)
+                    _retry(method, url, c_try, ae.status_code, "token refresh failed")
                     continue
                 else:
                     raise ae
 
-        response_dict = json.loads(response.json())
-        response_dict["success"] = True
-        return response_dict
+        return response
 
     # If we get to this point then the transaction could not be processed
     return None
 
 
+class _ByteCounter:
+    """Pass the chunks of a request or response body through, counting their
+    bytes, for the timings and hooks."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self.n_bytes = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        chunk = next(self._chunks)
+        self.n_bytes += len(chunk)
+        return chunk
+
+
+def _request_end(method, url, attempt, response, sent, start, kwargs):
+    """Record a request that the server has responded to in the timings, and
+    emit its request_end hook."""
+    if not (timings.enabled() or hooks.active("request_end")):
+        return
+    elapsed = time.perf_counter() - start
+    if sent is not None:
+        bytes_sent = sent.n_bytes
+    elif isinstance(response.request.body, (bytes, str)):
+        bytes_sent = len(response.request.body)
+    else:
+        bytes_sent = 0
+    # a streamed response has not been read yet, so is counted as it is decoded
+    bytes_received = None if kwargs.get("stream") else len(response.content)
+    timings.count("requests")
+    timings.count("bytes_sent", bytes_sent)
+    if bytes_received is not None:
+        timings.count("bytes_received", bytes_received)
+    hooks.emit(
+        "request_end",
+        method=method,
+        url=url,
+        attempt=attempt,
+        status_code=response.status_code,
+        elapsed=elapsed,
+        bytes_sent=bytes_sent,
+        bytes_received=bytes_received,
+        error=None,
+    )
+
+
+def _retry(method, url, attempt, status_code, reason):
+    """Record that a request is being made again, in the timings and the retry
+    hook."""
+    timings.count("retries")
+    if hooks.active("retry"):
+        hooks.emit(
+            "retry",
+            method=method,
+            url=url,
+            attempt=attempt,
+            status_code=status_code,
+            reason=reason,
+        )
+
+
+def main_loop(
+    url: str,
+    input_params: Dict = None,
+    body_params: Dict = None,
+    method=requests.get,
+    authenticate_fl: bool = True,
+    **kwargs,
+):
+    """Generalised main loop to make requests to the NLDS server
+    :param url: the API URL to contact
+    :type user: string
+
+    :param input_params: the input parameters for the API request (or None)
+    :type input_params: dict
+
+    :param body_params: the body parameters for the API request (or None)
+    :type body_params: dict | JSONBodyStream
+
+    :param method: the HTTP method to use, either as a string ("GET", "PUT", etc.)
+        or one of the requests module functions (requests.get, requests.put, etc.)
+    :type method: str | Callable
+
+    :raises requests.exceptions.ConnectionError: if the server cannot be
+    reached
+
+    :return: A Dictionary of the response or None
+    :rtype: Dict
+    """
+    response = send_request(
+        url, input_params, body_params, method, authenticate_fl, **kwargs
+    )
+    if response is None:
+        return None
+    start = time.perf_counter()
+    with timings.phase("decode"):
+        response_dict = json.loads(response.json())
+    if hooks.active("decode"):
+        hooks.emit(
+            "decode",
+            url=url,
+            elapsed=time.perf_counter() - start,
+            bytes_received=len(response.content),
+            streamed=False,
+        )
+    response_dict["success"] = True
+    return response_dict
+
+
+def _mark_failure(response_dict: Dict):
+    """Mark the response as failed if the server reported a failure."""
+    if "details" in response_dict and "failure" in response_dict["details"]:
+        response_dict["success"] = False
+
+
+def main_loop_stream(
+    url: str,
+    path,
+    input_params: Dict = None,
+    body_params: Dict = None,
+    method=requests.get,
+    transform=None,
+    text_filter=None,
+    on_close=None,
+    **kwargs,
+):
+    """Make a request to the NLDS server and decode the response incrementally as
+    it arrives, yielding the values at `path` in the response one at a time.  See
+    streaming.JSONItemStream for the format of `path` and `transform`.
+    :param url: the API URL to contact
+    :type user: string
+
+    :param path: the path to the values in the response to yield
+    :type path: Sequence[str]
+
+    :param input_params: the input parameters for the API request (or None)
+    :type input_params: dict
+
+    :param body_params: the body parameters for the API request (or None)
+    :type body_params: dict | JSONBodyStream
+
+    :param transform: function called with the contexts, each value and its keys,
+        whose return value is yielded instead
+    :type transform: Callable, optional
+
+    :param text_filter: function called with the iterator over the text of the
+        (inner) JSON document, which returns the iterator to parse instead
+    :type text_filter: Callable, optional
+
+    :param on_close: function called with the stream once it has been closed
+    :type on_close: Callable, optional
+
+    :raises requests.exceptions.ConnectionError: if the server cannot be
+    reached
+
+    :return: the stream of values, or None.  The rest of the response is in the
+        stream's root dictionary once iteration has finished.
+    :rtype: JSONItemStream
+    """
+    response = send_request(
+        url, input_params, body_params, method, stream=True, **kwargs
+    )
+    if response is None:
+        return None
+
+    start = time.perf_counter()
+    received = None
+
+    def _close():
+        response.close()
+        _mark_failure(stream.root)
+        if received is not None:
+            timings.count("bytes_received", received.n_bytes)
+            hooks.emit(
+                "decode",
+                url=url,
+                elapsed=time.perf_counter() - start,
+                bytes_received=received.n_bytes,
+                streamed=True,
+            )
+        if on_close is not None:
+            on_close(stream)
+
+    chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+    if timings.enabled():
+        # the response is read as it is decoded, so the time waiting for each
+        # chunk is the http phase
+        chunks = timings.timed_iter("http", chunks)
+    if timings.enabled() or hooks.active("decode"):
+        chunks = received = _ByteCounter(chunks)
+    text_chunks = unwrap_json_string(iter_text(chunks, response.encoding or "utf-8"))
+    if text_filter is not None:
+        text_chunks = text_filter(text_chunks)
+    stream = JSONItemStream(text_chunks, path, transform, _close)
+    stream.root["success"] = True
+    return stream
+
+
+def _failed_stream(path, msg: str):
+    """Return an empty stream for a request that could not be processed."""
+    stream = JSONItemStream(None, path)
+    stream.root.update({"msg": msg, "success": False})
+    return stream
+
+
+def _cached_response(text: str) -> Dict:
+    """Decode a response from the query cache."""
+    response_dict = json.loads(text)
+    response_dict["success"] = True
+    return response_dict
+
+
+def _cached_stream(text: str, path, transform=None) -> JSONItemStream:
+    """Decode a response from the query cache as a stream."""
+    stream = JSONItemStream([text], path, transform)
+    stream.root["success"] = True
+    return stream
+
+
+def cached_main_loop(
+    url: str, input_params: Dict = None, cache: bool = None, refresh: bool = False
+):
+    """Make a GET request to the NLDS server, as main_loop, using the query cache
+    if it is enabled.  A response in the cache that is younger than
+    ['options']['query_cache_ttl'] is returned without contacting the server.  If
+    the server cannot be reached then a response in the cache is returned, however
+    old it is.  Only successful responses are stored in the cache.
+
+    :param url: the API URL to contact
+    :type user: string
+
+    :param input_params: the input parameters for the API request (or None)
+    :type input_params: dict
+
+    :param cache: whether to use the query cache.  None uses the
+        ['options']['query_cache'] setting in the config.
+    :type cache: bool, optional
+
+    :param refresh: always make the request, and store the response in the cache
+    :type refresh: bool, optional
+
+    :return: A Dictionary of the response, or None
+    :rtype: Dict
+    """
+    config = load_config()
+    if not cache_enabled(config, cache):
+        return main_loop(url=url, input_params=input_params, method=requests.get)
+    if not refresh:
+        ttl = get_option(config, "query_cache_ttl")
+        text = lookup_query(config, url, input_params, ttl)
+        if text is not None:
+            return _cached_response(text)
+    try:
+        response_dict = main_loop(
+            url=url, input_params=input_params, method=requests.get
+        )
+    except ConnectionError:
+        text = lookup_query(config, url, input_params)
+        if text is None:
+            raise
+        return _cached_response(text)
+    if response_dict and not (
+        "details" in response_dict and "failure" in response_dict["details"]
+    ):
+        text = json.dumps({k: v for k, v in response_dict.items() if k != "success"})
+        store_query(config, url, input_params, text)
+    return response_dict
+
+
+def cached_main_loop_stream(
+    url: str,
+    path,
+    input_params: Dict = None,
+    transform=None,
+    cache: bool = None,
+    refresh: bool = False,
+):
+    """Make a GET request to the NLDS server and decode the response incrementally,
+    as main_loop_stream, using the query cache in the same way as
+    cached_main_loop.  The response is only stored in the cache if the whole
+    stream is read.
+
+    :return: the stream of values, or None.
+    :rtype: JSONItemStream
+    """
+    config = load_config()
+    if not cache_enabled(config, cache):
+        return main_loop_stream(
+            url=url, path=path, input_params=input_params, transform=transform
+        )
+    if not refresh:
+        ttl = get_option(config, "query_cache_ttl")
+        text = lookup_query(config, url, input_params, ttl)
+        if text is not None:
+            return _cached_stream(text, path, transform)
+
+    recorder = TextRecorder(get_option(config, "query_cache_max_bytes"))
+
+    def _store(stream):
+        text = recorder.text
+        if stream.complete and stream.root["success"] and text is not None:
+            store_query(config, url, input_params, text)
+
+    try:
+        return main_loop_stream(
+            url=url,
+            path=path,
+            input_params=input_params,
+            transform=transform,
+            text_filter=recorder.record,
+            on_close=_store,
+        )
+    except ConnectionError:
+        text = lookup_query(config, url, input_params)
+        if text is None:
+            raise
+        return _cached_stream(text, path, transform)
+
+
+def _filelist_body(config: Dict, body_params: Dict, filelist: Iterable[str]):
+    """Build the body of a request containing a filelist.  If
+    ['options']['stream_request_bodies'] is True then the body is a JSONBodyStream,
+    which generates the JSON as it is sent, so the filelist is never held in memory
+    in full.  Otherwise the filelist is made into a list and sent as normal."""
+    if get_option(config, "stream_request_bodies"):
+        return JSONBodyStream(body_params, "filelist", filelist)
+    return dict(body_params, filelist=[fp for fp in filelist])
+
+
+def _send_filelist(
+    config: Dict,
+    url: str,
+    input_params: Dict,
+    body,
+    method,
+    action: str,
+    digest: FilelistDigest = None,
+) -> Dict:
+    """Send a request built by _filelist_body, deleting any file the body was
+    spooled to once the request has finished.  If the transaction is accepted, and
+    there is a digest of the filelist, then the transaction is recorded in the
+    journal, as the action, or the action + "list" for more than one file."""
+    try:
+        response_dict = main_loop(
+            url=url, input_params=input_params, body_params=body, method=method
+        )
+    finally:
+        if isinstance(body, JSONBodyStream):
+            body.close()
+    if response_dict and digest is not None:
+        record_transaction(
+            config,
+            input_params["transaction_id"],
+            input_params["job_label"],
+            action if digest.n_files == 1 else action + "list",
+            input_params["user"],
+            input_params["group"],
+            digest,
+        )
+    return response_dict
+
+
 def put_filelist(
-    filelist: List[str] = [],
+    filelist: Iterable[str] = [],
     user: str = None,
     group: str = None,
     job_label: str = None,
     label: str = None,
     holding_id: int = None,
     tag: Dict = None,
+    transaction_id: str = None,
 ) -> Dict:
     """Make a request to put a list of files into the NLDS.
-    :param filelist: the list of filepaths to put into storage
-    :type filelist: List[string]
+    :param filelist: the list of filepaths to put into storage.  This can be any
+        iterable, including a generator, and is only iterated over once.  The
+        filepaths are sent as they are read from it.
+    :type filelist: Iterable[string]
 
     :param user: the username to put the files
     :type user: string
@@ -310,6 +750,10 @@ def put_filelist(
     :param tag: a dictionary of key:value pairs to add as tags to the holding upon creation
     :type tag: dict, optional
 
+    :param transaction_id: the UUID to use for the transaction.  A new one will be
+        created if this is None.
+    :type transaction_id: str, optional
+
     :raises requests.exceptions.ConnectionError: if the server cannot be
     reached
 
@@ -328,10 +772,17 @@ def put_filelist(
     tenancy = get_tenancy(config)
     access_key = get_access_key(config)
     secret_key = get_secret_key(config)
-    transaction_id = uuid.uuid4()
-
-    # Resolve the path to the file (i.e. make absolute)
-    filelist = [os.path.abspath(os.path.expanduser(fp)) for fp in filelist]
+    if transaction_id is None:
+        transaction_id = uuid.uuid4()
+
+    # Resolve the path to the file (i.e. make absolute).  This is done as the
+    # request body is sent, rather than making a new list here
+    filelist = (os.path.abspath(os.path.expanduser(fp)) for fp in filelist)
+    # record the transaction in the journal once it has been sent
+    digest = None
+    if journal_enabled(config):
+        digest = FilelistDigest()
+        filelist = digest.wrap(filelist)
     # build the parameters.  files/put requires (for a filelist):
     #    transaction_id: UUID
     #    user: str
@@ -350,7 +801,7 @@ def put_filelist(
         "tenancy": tenancy,
     }
 
-    body_params = {"filelist": filelist}
+    body_params = {}
     # add optional job_label.  If None then use first 8 characters of UUID
     if job_label is None:
         input_params["job_label"] = str(transaction_id)[0:8]
@@ -364,9 +815,10 @@ def put_filelist(
         body_params["tag"] = tag
     if holding_id is not None:
         body_params["holding_id"] = holding_id
-    # make the request
-    response_dict = main_loop(
-        url=url, input_params=input_params, body_params=body_params, method=requests.put
+    # make the request, with the filelist generated as the body is sent
+    body = _filelist_body(config, body_params, filelist)
+    response_dict = _send_filelist(
+        config, url, input_params, body, requests.put, "put", digest
     )
 
     if not response_dict:
@@ -384,7 +836,7 @@ def put_filelist(
 
 
 def get_filelist(
-    filelist: List[str] = [],
+    filelist: Iterable[str] = [],
     user: str = None,
     group: str = None,
     groupall: bool = False,
@@ -394,10 +846,14 @@ def get_filelist(
     holding_id: int = None,
     tag: Dict = None,
     regex: bool = False,
+    transaction_id: str = None,
+    resolve: bool = True,
 ) -> Dict:
     """Make a request to get a list of files from the NLDS.
-    :param filelist: the list of filepaths to get from the storage
-    :type filelist: List[string]
+    :param filelist: the list of filepaths to get from the storage.  This can be
+        any iterable, including a generator, and is only iterated over once.  The
+        filepaths are sent as they are read from it.
+    :type filelist: Iterable[string]
 
     :param user: the username to get the files
     :type user: string, optional
@@ -423,6 +879,18 @@ def get_filelist(
     files are to be retrieved from
     :type tag: dict, optional
 
+    :param regex: whether the label and the path are regular expressions
+    :type regex: bool, optional
+
+    :param transaction_id: the UUID to use for the transaction.  A new one will be
+        created if this is None.
+    :type transaction_id: str, optional
+
+    :param resolve: resolve the filepaths to absolute paths, with symlinks
+        resolved, if no target is given.  Set this to False if the filepaths are
+        already absolute and resolved.
+    :type resolve: bool, optional
+
     :raises requests.exceptions.ConnectionError: if the server cannot be reached
 
     :return: A Dictionary of the response
@@ -436,7 +904,8 @@ def get_filelist(
     tenancy = get_tenancy(config)
     access_key = get_access_key(config)
     secret_key = get_secret_key(config)
-    transaction_id = uuid.uuid4()
+    if transaction_id is None:
+        transaction_id = uuid.uuid4()
 
     # If target given then we're downloading the file to a new location
     if target:
@@ -446,21 +915,28 @@ def get_filelist(
         # Recursively create the target path if it doesn't exist
         # NOTE: what permissions should be on this? Should _we_ be creating it
         # here? or should we just error at this point?
+        # exist_ok as chunked submissions may be creating it at the same time
         if not target_p.exists():
-            os.makedirs(target)
+            os.makedirs(target, exist_ok=True)
+        filelist = iter(filelist)
     # If no target given then we're downloading files back to their original locations.
     else:
         # Need to strip any empty file names from the list, otherwise they will be
         # expanded to the current directory, which will create a FAILED file on the
-        # server as it will not be found in the database
-        clean_filelist = []
-        for fp in filelist:
-            fp = fp.strip()
-            if len(fp) > 0:
-                clean_filelist.append(fp)
-
-        # Convert to a pathlib.Path to resolve, and then back to a string
-        filelist = [str(Path(fp).resolve()) for fp in clean_filelist]
+        # server as it will not be found in the database.
+        filelist = (fp for fp in (fp.strip() for fp in filelist) if fp)
+        # Resolve the paths, in parallel and caching the resolved directories.
+        # This is done as the request body is sent, rather than making a new list
+        # here.
+        if resolve:
+            filelist = resolve_paths(filelist, get_option(config, "resolve_workers"))
+    # record the transaction in the journal once it has been sent
+    digest = None
+    if journal_enabled(config):
+        digest = FilelistDigest()
+        filelist = digest.wrap(filelist)
+    # look at the first two filepaths to tell whether there is only one
+    first = [fp for fp in islice(filelist, 2)]
 
     # build the parameters.  files/getlist/put requires:
     #    transaction_id     : UUID
@@ -484,11 +960,11 @@ def get_filelist(
     }
 
     # if there is only one file then call "get" HTTP API method
-    if len(filelist) == 1:
+    if len(first) == 1:
         # empty body params
         body_params = {}
         # have to remove the extra ["/"] from the end of construct_server_url for get
-        input_params["filepath"] = filelist[0]
+        input_params["filepath"] = first[0]
         # add optional components to header: label, tags, holding_id
         if label is not None:
             input_params["label"] = label
@@ -499,7 +975,7 @@ def get_filelist(
         url = construct_server_url(config, f"files")
         call_method = requests.get
     else:
-        body_params = {"filelist": filelist}
+        body_params = {}
         # add optional components to body: label, tags, holding_id
         if label is not None:
             body_params["label"] = label
@@ -507,6 +983,8 @@ def get_filelist(
             body_params["tag"] = tag
         if holding_id is not None:
             body_params["holding_id"] = holding_id
+        # the filelist is generated as the body is sent
+        body_params = _filelist_body(config, body_params, chain(first, filelist))
         url = construct_server_url(config, "files/getlist")
         call_method = requests.put
 
@@ -524,8 +1002,8 @@ def get_filelist(
         input_params["regex"] = regex
 
     # make the request
-    response_dict = main_loop(
-        url=url, input_params=input_params, body_params=body_params, method=call_method
+    response_dict = _send_filelist(
+        config, url, input_params, body_params, call_method, "get", digest
     )
     if not response_dict:
         # If we get to this point then the transaction could not be processed
@@ -541,6 +1019,51 @@ def get_filelist(
     return response_dict
 
 
+def _list_holding_request(
+    user: str,
+    group: str,
+    groupall: bool,
+    label: str,
+    holding_id: int,
+    transaction_id: str,
+    tag: Dict,
+    regex: bool,
+    limit: int,
+    descending: bool,
+    offset: int = None,
+):
+    """Build the url and input parameters for a catalog/list request."""
+    # get the config, user and group
+    config = load_config()
+    user = get_user(config, user)
+    group = get_group(config, group)
+    url = construct_server_url(config, "catalog/list")
+
+    # build the parameters.  holdings->get requires
+    #    user: str
+    #    group: str
+    input_params = {"user": user, "group": group, "groupall": groupall}
+
+    # add additional / optional components to input params
+    if label is not None:
+        input_params["label"] = label
+    if tag is not None:
+        input_params["tag"] = tag_to_string(tag)
+    if holding_id is not None:
+        input_params["holding_id"] = holding_id
+    if transaction_id is not None:
+        input_params["transaction_id"] = transaction_id
+    if regex:
+        input_params["regex"] = regex
+    if limit:
+        input_params["limit"] = limit
+    if descending:
+        input_params["descending"] = descending
+    if offset:
+        input_params["offset"] = offset
+    return url, input_params
+
+
 def list_holding(
     user: str,
     group: str,
@@ -552,6 +1075,9 @@ def list_holding(
     regex: bool = False,
     limit: int = None,
     descending: bool = False,
+    offset: int = None,
+    cache: bool = None,
+    refresh: bool = False,
 ):
     """Make a request to list the holdings in the NLDS for a user
     :param user: the username to get the holding(s) for
@@ -584,6 +1110,17 @@ def list_holding(
         ascending.
     :type descending: bool, optional
 
+    :param offset: skip this number of holdings before the first one returned,
+        used with limit to request the holdings a page at a time
+    :type offset: int, optional
+
+    :param cache: whether to use the query cache.  None uses the
+        ['options']['query_cache'] setting in the config.
+    :type cache: bool, optional
+
+    :param refresh: always make the request, and store the response in the cache
+    :type refresh: bool, optional
+
     :raises requests.exceptions.ConnectionError: if the server cannot be
     reached
 
@@ -591,11 +1128,107 @@ def list_holding(
     :rtype: Dict
     """
 
+    url, input_params = _list_holding_request(
+        user,
+        group,
+        groupall,
+        label,
+        holding_id,
+        transaction_id,
+        tag,
+        regex,
+        limit,
+        descending,
+        offset,
+    )
+    user = input_params["user"]
+    group = input_params["group"]
+    response_dict = cached_main_loop(url, input_params, cache, refresh)
+
+    if not response_dict:
+        response_dict = {
+            "msg": f"LIST holdings for user {user} and group {group} failed",
+            "success": False,
+        }
+    # mark as failed in RPC call
+    elif "details" in response_dict and "failure" in response_dict["details"]:
+        response_dict["success"] = False
+
+    return response_dict
+
+
+def stream_list_holding(
+    user: str,
+    group: str,
+    groupall: bool = False,
+    label: str = None,
+    holding_id: int = None,
+    transaction_id: str = None,
+    tag: Dict = None,
+    regex: bool = False,
+    limit: int = None,
+    descending: bool = False,
+    offset: int = None,
+    cache: bool = None,
+    refresh: bool = False,
+) -> JSONItemStream:
+    """Make a request to list the holdings in the NLDS for a user, and yield each
+    holding as it is decoded from the response, rather than decoding the whole
+    response at once.  The parameters are the same as for list_holding.
+
+    :raises requests.exceptions.ConnectionError: if the server cannot be
+    reached
+
+    :return: A stream of holding Dictionaries.  Once it has been iterated over,
+        stream.root contains the rest of the response, including "success".
+    :rtype: JSONItemStream
+    """
+    url, input_params = _list_holding_request(
+        user,
+        group,
+        groupall,
+        label,
+        holding_id,
+        transaction_id,
+        tag,
+        regex,
+        limit,
+        descending,
+        offset,
+    )
+    path = ("data", "holdings", "*")
+    stream = cached_main_loop_stream(
+        url, path, input_params, cache=cache, refresh=refresh
+    )
+    if stream is None:
+        stream = _failed_stream(
+            path,
+            f"LIST holdings for user {input_params['user']} and group "
+            f"{input_params['group']} failed",
+        )
+    return stream
+
+
+def _find_file_request(
+    user: str,
+    group: str,
+    groupall: bool,
+    label: str,
+    holding_id: int,
+    transaction_id: str,
+    path: str,
+    tag: Dict,
+    regex: bool,
+    limit: int,
+    descending: bool,
+    offset: int = None,
+):
+    """Build the url and input parameters for a catalog/find request."""
     # get the config, user and group
     config = load_config()
     user = get_user(config, user)
     group = get_group(config, group)
-    url = construct_server_url(config, "catalog/list")
+    url = construct_server_url(config, "catalog/find")
 
     # build the parameters.  holdings->get requires
     #    user: str
@@ -611,25 +1244,17 @@ def list_holding(
         input_params["holding_id"] = holding_id
     if transaction_id is not None:
         input_params["transaction_id"] = transaction_id
+    if path is not None:
+        input_params["path"] = path
     if regex:
         input_params["regex"] = regex
     if limit:
         input_params["limit"] = limit
     if descending:
         input_params["descending"] = descending
-
-    response_dict = main_loop(url=url, input_params=input_params, method=requests.get)
-
-    if not response_dict:
-        response_dict = {
-            "msg": f"LIST holdings for user {user} and group {group} failed",
-            "success": False,
-        }
-    # mark as failed in RPC call
-    elif "details" in response_dict and "failure" in response_dict["details"]:
-        response_dict["success"] = False
-
-    return response_dict
+    if offset:
+        input_params["offset"] = offset
+    return url, input_params
 
 
 def find_file(
@@ -644,6 +1269,9 @@ def find_file(
     regex: bool = False,
     limit: int = None,
     descending: bool = False,
+    offset: int = None,
+    cache: bool = None,
+    refresh: bool = False,
 ):
     """Make a request to find files in the NLDS for a user
     :param user: the username to get the holding(s) for
@@ -678,34 +1306,342 @@ def find_file(
     :param descending: sort the files in descending time order. Default is
         ascending.
     :type descending: bool, optional
+
+    :param offset: skip this number of files before the first one returned, used
+        with limit to request the files a page at a time
+    :type offset: int, optional
+
+    :param cache: whether to use the query cache.  None uses the
+        ['options']['query_cache'] setting in the config.
+    :type cache: bool, optional
+
+    :param refresh: always make the request, and store the response in the cache
+    :type refresh: bool, optional
+
     :raises requests.exceptions.ConnectionError: if the server cannot be
     reached
 
     :return: A Dictionary of the response
     :rtype: Dict
     """
+    url, input_params = _find_file_request(
+        user,
+        group,
+        groupall,
+        label,
+        holding_id,
+        transaction_id,
+        path,
+        tag,
+        regex,
+        limit,
+        descending,
+        offset,
+    )
+    user = input_params["user"]
+    group = input_params["group"]
+    response_dict = cached_main_loop(url, input_params, cache, refresh)
+
+    if not response_dict:
+        response_dict = {
+            "msg": f"FIND files for user {user} and group {group} failed",
+            "success": False,
+        }
+    # mark as failed in RPC call
+    elif "details" in response_dict and "failure" in response_dict["details"]:
+        response_dict["success"] = False
+
+    return response_dict
+
+
+def _find_file_transform(contexts, file, keys):
+    """Return the holding, transaction and file for each file in a find response.
+    The contexts are for the containers on the path:
+        root, data, holdings, holding, transactions, transaction, filelist
+    The transactions are keyed by their transaction id, which is added to the
+    transaction if it does not contain it."""
+    transaction = contexts[5]
+    transaction.setdefault("transaction_id", keys[4])
+    return contexts[3], transaction, file
+
+
+def stream_find_file(
+    user: str,
+    group: str,
+    groupall: bool = False,
+    label: str = None,
+    holding_id: int = None,
+    transaction_id: str = None,
+    path: str = None,
+    tag: Dict = None,
+    regex: bool = False,
+    limit: int = None,
+    descending: bool = False,
+    offset: int = None,
+    cache: bool = None,
+    refresh: bool = False,
+) -> JSONItemStream:
+    """Make a request to find files in the NLDS for a user, and yield each file as
+    it is decoded from the response, rather than decoding the whole response at
+    once.  The parameters are the same as for find_file.
+
+    Each item is a tuple of (holding, transaction, file) Dictionaries.  The holding
+    and transaction Dictionaries contain their details (e.g. "label", "user",
+    "ingest_time") but not their child transactions or files.
+
+    :raises requests.exceptions.ConnectionError: if the server cannot be
+    reached
+
+    :return: A stream of (holding, transaction, file) tuples.  Once it has been
+        iterated over, stream.root contains the rest of the response, including
+        "success".
+    :rtype: JSONItemStream
+    """
+    url, input_params = _find_file_request(
+        user,
+        group,
+        groupall,
+        label,
+        holding_id,
+        transaction_id,
+        path,
+        tag,
+        regex,
+        limit,
+        descending,
+        offset,
+    )
+    item_path = ("data", "holdings", "*", "transactions", "*", "filelist", "*")
+    stream = cached_main_loop_stream(
+        url,
+        item_path,
+        input_params,
+        transform=_find_file_transform,
+        cache=cache,
+        refresh=refresh,
+    )
+    if stream is None:
+        stream = _failed_stream(
+            item_path,
+            f"FIND files for user {input_params['user']} and group "
+            f"{input_params['group']} failed",
+        )
+    return stream
+
+
+def _iter_pages(fetch_page, page_size: int, key, limit: int = None):
+    """Yield the records from a paged request, fetching one page at a time.
+
+    fetch_page(offset, limit) must return a stream of the records starting at
+    offset.  A page with fewer than limit records is the last page.  Records that
+    were also on the previous page are skipped, as this happens if records are
+    added while the pages are being fetched.
+
+    :raises RequestError: if a page could not be fetched
+    :raises ServerError: if a full page only contains records from the previous
+        page, which means the server is ignoring the offset
+    """
+    offset = 0
+    previous_keys = set()
+    n_yielded = 0
+    while limit is None or n_yielded < limit:
+        stream = fetch_page(offset, page_size)
+        page_keys = set()
+        n_page = 0
+        for record in stream:
+            n_page += 1
+            k = key(record)
+            page_keys.add(k)
+            if k in previous_keys:
+                continue
+            yield record
+            n_yielded += 1
+            if limit is not None and n_yielded >= limit:
+                stream.close()
+                return
+        if not stream.root["success"]:
+            msg = stream.root.get("msg", "")
+            if "details" in stream.root and "failure" in stream.root["details"]:
+                msg += "\nReason: " + stream.root["details"]["failure"]
+            raise RequestError(msg, None)
+        if n_page < page_size:
+            return
+        if page_keys <= previous_keys:
+            raise ServerError(
+                "The server returned the same page of records twice.  It may not "
+                "support the 'offset' parameter, in which case use a limit instead "
+                "of a page size."
+            )
+        previous_keys = page_keys
+        offset += n_page
+
+
+def _page_size(page_size: int):
+    """Get the page size from the argument, or from the config."""
+    if page_size is None:
+        page_size = get_option(load_config(), "catalog_page_size")
+    if page_size is None:
+        page_size = DEFAULT_PAGE_SIZE
+    return page_size
+
+
+def _holding_key(holding: Dict):
+    return holding["id"]
+
+
+def iter_holdings(
+    user: str,
+    group: str,
+    groupall: bool = False,
+    label: str = None,
+    holding_id: int = None,
+    transaction_id: str = None,
+    tag: Dict = None,
+    regex: bool = False,
+    limit: int = None,
+    descending: bool = False,
+    page_size: int = None,
+    cache: bool = None,
+    refresh: bool = False,
+):
+    """Iterate over the holdings in the NLDS for a user, requesting them from the
+    server a page at a time, so that neither the client nor the server has to
+    hold all of the holdings in memory at once.  The other parameters are the same
+    as for list_holding.
+
+    :param limit: the total number of holdings to yield, across all the pages
+    :type limit: int, optional
+
+    :param page_size: the number of holdings to request at a time.  Defaults to
+        ['options']['catalog_page_size'] in the config, or DEFAULT_PAGE_SIZE.
+    :type page_size: int, optional
+
+    :raises RequestError: if a page could not be fetched
+    :raises ServerError: if the server does not support paging
+
+    :return: an iterator over the holding Dictionaries
+    :rtype: Iterator[Dict]
+    """
+
+    def _fetch_page(offset, page_limit):
+        return stream_list_holding(
+            user,
+            group,
+            groupall,
+            label,
+            holding_id,
+            transaction_id,
+            tag,
+            regex,
+            page_limit,
+            descending,
+            offset,
+            cache,
+            refresh,
+        )
+
+    return _iter_pages(_fetch_page, _page_size(page_size), _holding_key, limit)
+
+
+def _file_key(item):
+    # transaction ids are unique across holdings
+    holding, transaction, file = item
+    return transaction.get("transaction_id"), file.get("original_path")
+
+
+def iter_find_files(
+    user: str,
+    group: str,
+    groupall: bool = False,
+    label: str = None,
+    holding_id: int = None,
+    transaction_id: str = None,
+    path: str = None,
+    tag: Dict = None,
+    regex: bool = False,
+    limit: int = None,
+    descending: bool = False,
+    page_size: int = None,
+    cache: bool = None,
+    refresh: bool = False,
+):
+    """Iterate over the files found in the NLDS for a user, requesting them from
+    the server a page at a time, so that neither the client nor the server has to
+    hold all of the files in memory at once.  The other parameters are the same as
+    for find_file.
+
+    :param limit: the total number of files to yield, across all the pages
+    :type limit: int, optional
+
+    :param page_size: the number of files to request at a time.  Defaults to
+        ['options']['catalog_page_size'] in the config, or DEFAULT_PAGE_SIZE.
+    :type page_size: int, optional
+
+    :raises RequestError: if a page could not be fetched
+    :raises ServerError: if the server does not support paging
+
+    :return: an iterator over (holding, transaction, file) tuples, as for
+        stream_find_file
+    :rtype: Iterator[Tuple[Dict, Dict, Dict]]
+    """
+
+    def _fetch_page(offset, page_limit):
+        return stream_find_file(
+            user,
+            group,
+            groupall,
+            label,
+            holding_id,
+            transaction_id,
+            path,
+            tag,
+            regex,
+            page_limit,
+            descending,
+            offset,
+            cache,
+            refresh,
+        )
+
+    return _iter_pages(_fetch_page, _page_size(page_size), _file_key, limit)
+
+
+def _monitor_transactions_request(
+    user: str,
+    group: str,
+    groupall: bool,
+    idd: int,
+    transaction_id: str,
+    job_label: str,
+    api_action: list[str],
+    exclude_api_action: list[str],
+    state: list[str],
+    sub_id: str,
+    regex: bool,
+    limit: int,
+    descending: bool,
+):
+    """Build the url, input parameters and body parameters for a status request."""
     # get the config, user and group
     config = load_config()
     user = get_user(config, user)
     group = get_group(config, group)
-    url = construct_server_url(config, "catalog/find")
+    url = construct_server_url(config, "status")
 
-    # build the parameters.  holdings->get requires
+    # build the parameters.  monitoring->get requires
     #    user: str
     #    group: str
     input_params = {"user": user, "group": group, "groupall": groupall}
-
+    body_params = {}
     # add additional / optional components to input params
-    if label is not None:
-        input_params["label"] = label
-    if tag is not None:
-        input_params["tag"] = tag_to_string(tag)
-    if holding_id is not None:
-        input_params["holding_id"] = holding_id
-    if transaction_id is not None:
+    if idd:
+        input_params["id"] = idd
+    if transaction_id:
         input_params["transaction_id"] = transaction_id
-    if path is not None:
-        input_params["path"] = path
+    if job_label:
+        input_params["job_label"] = job_label
+    if sub_id:
+        input_params["sub_id"] = sub_id
     if regex:
         input_params["regex"] = regex
     if limit:
@@ -713,18 +1649,11 @@ def find_file(
     if descending:
         input_params["descending"] = descending
 
-    response_dict = main_loop(url=url, input_params=input_params, method=requests.get)
-
-    if not response_dict:
-        response_dict = {
-            "msg": f"FIND files for user {user} and group {group} failed",
-            "success": False,
-        }
-    # mark as failed in RPC call
-    elif "details" in response_dict and "failure" in response_dict["details"]:
-        response_dict["success"] = False
+    body_params["api_action"] = api_action or None
+    body_params["exclude_api_action"] = exclude_api_action or None
+    body_params["state"] = state or None
 
-    return response_dict
+    return url, input_params, body_params
 
 
 def monitor_transactions(
@@ -798,38 +1727,23 @@ def monitor_transactions(
     :rtype: Dict
     """
 
-    # get the config, user and group
-    config = load_config()
-    user = get_user(config, user)
-    group = get_group(config, group)
-    url = construct_server_url(config, "status")
-    MAX_LOOPS = 2
-
-    # build the parameters.  monitoring->get requires
-    #    user: str
-    #    group: str
-    input_params = {"user": user, "group": group, "groupall": groupall}
-    body_params = {}
-    # add additional / optional components to input params
-    if idd:
-        input_params["id"] = idd
-    if transaction_id:
-        input_params["transaction_id"] = transaction_id
-    if job_label:
-        input_params["job_label"] = job_label
-    if sub_id:
-        input_params["sub_id"] = sub_id
-    if regex:
-        input_params["regex"] = regex
-    if limit:
-        input_params["limit"] = limit
-    if descending:
-        input_params["descending"] = descending
-
-    body_params["api_action"] = api_action or None
-    body_params["exclude_api_action"] = exclude_api_action or None
-    body_params["state"] = state or None
-
+    url, input_params, body_params = _monitor_transactions_request(
+        user,
+        group,
+        groupall,
+        idd,
+        transaction_id,
+        job_label,
+        api_action,
+        exclude_api_action,
+        state,
+        sub_id,
+        regex,
+        limit,
+        descending,
+    )
+    user = input_params["user"]
+    group = input_params["group"]
     response_dict = main_loop(
         url=url, input_params=input_params, body_params=body_params, method=requests.get
     )
@@ -847,6 +1761,62 @@ def monitor_transactions(
     return response_dict
 
 
+def stream_monitor_transactions(
+    user: str,
+    group: str,
+    groupall: bool = False,
+    idd: int = None,
+    transaction_id: str = None,
+    job_label: str = None,
+    api_action: list[str] = None,
+    exclude_api_action: list[str] = None,
+    state: list[str] = None,
+    sub_id: str = None,
+    regex: bool = False,
+    limit: int = None,
+    descending: bool = False,
+) -> JSONItemStream:
+    """Make a request to the monitoring database for the status of transactions,
+    and yield each transaction record as it is decoded from the response, rather
+    than decoding the whole response at once.  The parameters are the same as for
+    monitor_transactions.
+
+    :raises requests.exceptions.ConnectionError: if the server cannot be
+    reached
+
+    :return: A stream of transaction record Dictionaries.  Once it has been
+        iterated over, stream.root contains the rest of the response, including
+        "success" and "details".
+    :rtype: JSONItemStream
+    """
+    url, input_params, body_params = _monitor_transactions_request(
+        user,
+        group,
+        groupall,
+        idd,
+        transaction_id,
+        job_label,
+        api_action,
+        exclude_api_action,
+        state,
+        sub_id,
+        regex,
+        limit,
+        descending,
+    )
+    path = ("data", "records", "*")
+    stream = main_loop_stream(
+        url=url, path=path, input_params=input_params, body_params=body_params
+    )
+    if stream is None:
+        stream = _failed_stream(
+            path,
+            f"STAT transaction for user {input_params['user']} and group "
+            f"{input_params['group']} failed",
+        )
+    return stream
+
+
 def get_transaction_state(transaction: dict):
     """Get the overall state of a transaction in a more convienent form by
     querying the sub-transactions and determining if the overall transaction
@@ -896,77 +1866,11 @@ def get_transaction_state(transaction: dict):
         COMPLETE_WITH_WARNINGS = 103
         SPLIT = 110
         SEARCHING = 1000
-    The overall state is the minimum of these
+    The overall state is the minimum of these, see states.STATE_MAPPING.  To get
+    the states of many transactions use states.aggregate_transaction_states.
     """
-    state_mapping = {
-        "INITIALISING": -1,
-        "ROUTING": 0,
-        "SPLITTING": 1,
-        "INDEXING": 2,
-        "CATALOG_PUTTING": 3,
-        "TRANSFER_PUTTING": 4,
-        "CATALOG_GETTING": 10,
-        "ARCHIVE_GETTING": 11,
-        "TRANSFER_GETTING": 12,
-        "TRANSFER_INIT": 13,
-        "ARCHIVE_INIT": 20,
-        "ARCHIVE_PUTTING": 21,
-        "ARCHIVE_PREPARING": 22,
-        "CATALOG_DELETING": 30,
-        "CATALOG_UPDATING": 31,
-        "CATALOG_ARCHIVE_UPDATING": 32,
-        "CATALOG_REMOVING": 33,
-        "COMPLETE": 100,
-        "FAILED": 101,
-        "COMPLETE_WITH_ERRORS": 102,
-        "COMPLETE_WITH_WARNINGS": 103,
-        "SPLIT": 110,
-        "SEARCHING": 1000,
-    }
-    state_mapping_reverse = {v: k for k, v in state_mapping.items()}
-
-    min_state = 1000
-    min_time = datetime(1970, 1, 1)
-    error_count = 0
-    complete_count = 0
-    n_subrecords = 0
-    for sr in transaction["sub_records"]:
-        sr_state = sr["state"]
-        d = datetime.fromisoformat(sr["last_updated"])
-        if d > min_time:
-            min_time = d
-        if state_mapping[sr_state] < min_state:
-            min_state = state_mapping[sr_state]
-        if sr_state == "FAILED":
-            error_count += 1
-        if sr_state == "COMPLETE":
-            complete_count += 1
-        if sr_state != "SPLIT":
-            n_subrecords += 1
-
-    if min_state == 1000:
-        # 1000 state is "SEARCHING", but we change this to a more user friendly
-        # "QUEUED"
-        d = datetime.fromisoformat(transaction["creation_time"])
-        return "QUEUED", d, 0
-
-    if min_state == state_mapping["COMPLETE"] and error_count > 0:
-        min_state = state_mapping["COMPLETE_WITH_ERRORS"]
-
-    # see if any warnings were given
-    warning_count = 0
-    if "warnings" in transaction:
-        warning_count = len(transaction["warnings"])
-    if min_state == state_mapping["COMPLETE"] and warning_count > 0:
-        min_state = state_mapping["COMPLETE_WITH_WARNINGS"]
-
-    # percentage complete
-    if n_subrecords != 0:
-        p_complete = math.ceil(100.0 * float(complete_count) / float(n_subrecords))
-    else:
-        p_complete = 100
-
-    return state_mapping_reverse[min_state], min_time, p_complete
+    code, last_update, p_complete = transaction_state_code(transaction)
+    return STATE_NAMES[code], datetime.fromisoformat(last_update), p_complete
 
 
 def change_metadata(
@@ -1168,7 +2072,7 @@ def init_client(
         )
 
     tenancy = remote_config["object_storage"]["tenancy"]
-    access_key, secret_key = fetch_s3_access_keys(tenancy, username, password)
+    access_key, secret_key = fetch_s3_access_keys(tenancy, username, password, config)
     # Write object storage to config file
     remote_config["object_storage"]["access_key"] = access_key
     remote_config["object_storage"]["secret_key"] = secret_key
@@ -1195,7 +2099,7 @@ def renew_keys():
 
     # Get the access_key and secret_key from the object store tenancy
     tenancy = config["object_storage"]["tenancy"]
-    access_key, secret_key = fetch_s3_access_keys(tenancy, username, password)
+    access_key, secret_key = fetch_s3_access_keys(tenancy, username, password, config)
     # Write object storage to config file
     config["object_storage"]["access_key"] = access_key
     config["object_storage"]["secret_key"] = secret_key
@@ -7,27 +7,29 @@ __license__ = "BSD - see LICENSE file in top-level package directory"
 __contact__ = "neil.massey@stfc.ac.uk"
 
 from json import dumps as json_dumps
+from itertools import chain, islice
 
 import click
 
-from nlds_client.clientlib.transactions import (
-    get_filelist,
-    put_filelist,
-    list_holding,
-    find_file,
-    monitor_transactions,
-    get_transaction_state,
-    change_metadata,
-    init_client,
-    renew_keys
-)
+# The clientlib.transactions and clientlib.submission modules, and the requests
+# library that they use, are imported inside the commands that need them.  This
+# keeps the start up time of commands that do not make requests short, e.g.
+# `nlds --version`, `nlds --help` and shell completion.
 from nlds_client.clientlib.exceptions import (
     ConnectionError,
     RequestError,
     AuthenticationError,
+    ServerError,
+    UsageError,
+)
+from nlds_client.clientlib.config import (
+    get_user,
+    get_group,
+    get_option,
+    load_config,
 )
-from nlds_client.clientlib.config import get_user, get_group, load_config
 from nlds_client.clientlib.nlds_client_setup import CONFIG_FILE_LOCATION
+from nlds_client.clientlib import timings
 from nlds_client import __version__
 
 json = False
@@ -42,7 +44,44 @@ json = False
     is_flag=True,
     help="Output NLDS client version and exit.",
 )
-def nlds_client(ctx, version):
+@click.option(
+    "--timings",
+    "show_timings",
+    default=False,
+    is_flag=True,
+    help="Print the time spent in each phase of the command (loading the config, "
+    "reading the token, refreshing it, HTTP requests, decoding the responses and "
+    "printing them), with the bytes sent and received and the number of retries, "
+    "to stderr when it exits.",
+)
+@click.option(
+    "--profile",
+    default=None,
+    envvar="NLDS_PROFILE",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Run the command under cProfile and write the stats to this file when it "
+    "exits.  Can also be set with the NLDS_PROFILE environment variable.",
+)
+@click.option(
+    "--profile_memory",
+    default=False,
+    is_flag=True,
+    envvar="NLDS_PROFILE_MEMORY",
+    help="With --profile, also trace memory allocations and write a tracemalloc "
+    "snapshot to the profile file name followed by .tracemalloc.  Can also be set "
+    "with the NLDS_PROFILE_MEMORY environment variable.",
+)
+def nlds_client(ctx, version, show_timings, profile, profile_memory):
+    if profile is not None:
+        # imported here, so that cProfile is only imported when it is used
+        from nlds_client.clientlib.profiling import Profiler
+
+        profiler = Profiler(profile, memory=profile_memory)
+        profiler.start()
+        ctx.call_on_close(lambda: click.echo(profiler.stop(), err=True))
+    if show_timings:
+        timings.enable()
+        ctx.call_on_close(lambda: click.echo(timings.report(), err=True))
     if ctx.invoked_subcommand is None:
         if version:
             click.echo(f"Near Line Data Store client {__version__}.")
@@ -80,6 +119,28 @@ class TagParamType(click.ParamType):
         return self.tag_dict
 
 
+"""Custom class for sizes in bytes, with an optional K, M, G or T suffix
+(i.e. 500M or 2T)."""
+
+
+class SizeParamType(click.ParamType):
+    name = "size"
+    suffixes = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, int):
+            return value
+        try:
+            value = value.strip().upper()
+            multiplier = 1
+            if value[-1:] in self.suffixes:
+                multiplier = self.suffixes[value[-1]]
+                value = value[:-1]
+            return int(float(value) * multiplier)
+        except ValueError:
+            self.fail(f"{value!r} is not a valid size", param, ctx)
+
+
 def integer_permissions_to_string(intperm):
     octal = oct(intperm)[2:]
     result = ""
@@ -167,48 +228,134 @@ def _tags_to_str(tags):
     return tags_str
 
 
+def _print_single_holding(h: dict):
+    """Print the full details of one holding"""
+    click.echo(f"{'':<4}{'user':<16}: {h['user']}")
+    click.echo(f"{'':<4}{'group':<16}: {h['group']}")
+    click.echo(f"{'':<4}{'id':<16}: {h['id']}")
+    click.echo(f"{'':<4}{'label':<16}: {h['label']}")
+    click.echo(f"{'':<4}{'ingest time':<16}: {h['date'].replace('T',' ')[0:19]}")
+    if "transactions" in h:
+        trans_str = ""
+        for t in h["transactions"]:
+            trans_str += t + f"\n{'':<22}"
+        click.echo(f"{'':<4}{'transaction id':<16}: {trans_str[:-23]}")
+    if "tags" in h and len(h["tags"]) > 0:
+        tags_str = _tags_to_str(h["tags"])
+        click.echo(f"{'':<4}{'tags':<16}: {tags_str[:-23]}")
+
+
+def _print_holding_row(h: dict):
+    """Print one holding as a row of the holdings table"""
+    click.echo(
+        f"{'':<4}{h['user']:<16}{h['id']:<6}{h['label']:<32}{h['date'].replace('T',' ')[0:19]:<32}"
+    )
+
+
+def _open_stream(stream):
+    """Read the first item from a streamed response.  If the request failed then
+    there are no items, and reading the first item reads the whole response, so
+    that the "success" of the response can be checked before anything is printed.
+    Returns a list containing the first item (if any), an iterator over the rest of
+    the items and the root of the response."""
+    items = iter(stream)
+    head = [i for i in islice(items, 1)]
+    return head, items, stream.root
+
+
+@timings.timed("render")
 def print_list(response: dict, req_details):
     """Print out the response from the list command"""
-    n_holdings = len(response["data"]["holdings"])
+    print_list_records(response["data"]["holdings"], req_details)
+
+
+@timings.timed("render")
+def print_list_records(holdings, req_details):
+    """Print out the holdings from the list command.  holdings can be any iterable,
+    including a stream, and is only iterated over once."""
+    holdings = iter(holdings)
+    # only the first two holdings are needed to decide how to print them
+    head = [h for h in islice(holdings, 2)]
     list_string = "Listing holding"
-    if n_holdings > 1:
+    if len(head) > 1:
         list_string += "s"
     list_string += " for "
     list_string += req_details
     click.echo(list_string)
-    if n_holdings == 1:
-        h = response["data"]["holdings"][0]
-        click.echo(f"{'':<4}{'user':<16}: {h['user']}")
-        click.echo(f"{'':<4}{'group':<16}: {h['group']}")
-        click.echo(f"{'':<4}{'id':<16}: {h['id']}")
-        click.echo(f"{'':<4}{'label':<16}: {h['label']}")
-        click.echo(f"{'':<4}{'ingest time':<16}: {h['date'].replace('T',' ')[0:19]}")
-        if "transactions" in h:
-            trans_str = ""
-            for t in h["transactions"]:
-                trans_str += t + f"\n{'':<22}"
-            click.echo(f"{'':<4}{'transaction id':<16}: {trans_str[:-23]}")
-        if "tags" in h and len(h["tags"]) > 0:
-            tags_str = _tags_to_str(h["tags"])
-            click.echo(f"{'':<4}{'tags':<16}: {tags_str[:-23]}")
+    if len(head) == 1:
+        _print_single_holding(head[0])
     else:
         click.echo(f"{'':<4}{'user':<16}{'id':<6}{'label':<32}{'ingest time':<32}")
-        for h in response["data"]["holdings"]:
-            click.echo(
-                f"{'':<4}{h['user']:<16}{h['id']:<6}{h['label']:<32}{h['date'].replace('T',' ')[0:19]:<32}"
-            )
+        for h in chain(head, holdings):
+            _print_holding_row(h)
+
 
+def _print_failed_files_record(tr: dict):
+    """Print the failed files of one transaction, one per line"""
+    for sr in tr["sub_records"]:
+        if len(sr["failed_files"]) > 0:
+            for ff in sr["failed_files"]:
+                click.echo(f"{ff['filepath']}")
 
+
+@timings.timed("render")
 def print_failed_files(response: dict, req_details):
     """Print the files that failed to upload / download.  One per line so that they
     can be appended to a list and retried."""
     for tr in response["data"]["records"]:
+        _print_failed_files_record(tr)
+
+
+def _print_single_stat_record(tr: dict, sub_records, errors):
+    """Print the full details of one transaction"""
+    from nlds_client.clientlib.transactions import get_transaction_state
+    state, last_time, p_complete = get_transaction_state(tr)
+    if state == None:
+        return
+    click.echo(f"{'':<4}{'id':<16}: {tr['id']}")
+    click.echo(f"{'':<4}{'user':<16}: {tr['user']}")
+    click.echo(f"{'':<4}{'group':<16}: {tr['group']}")
+    click.echo(f"{'':<4}{'action':<16}: {tr['api_action']}")
+    click.echo(f"{'':<4}{'transaction id':<16}: {tr['transaction_id']}")
+    if "label" in tr:
+        click.echo(f"{'':<4}{'label':<16}: {tr['label']}")
+    click.echo(
+        f"{'':<4}{'creation time':<16}: {(tr['creation_time']).replace('T',' ')[0:19]}"
+    )
+    click.echo(f"{'':<4}{'state':<16}: {state}")
+    if "warnings" in tr:
+        warn_str = ""
+        for w in tr["warnings"]:
+            warn_str += w + f"\n{'':<22}"
+        if len(warn_str) > 0:
+            click.echo(f"{'':<4}{'warnings':<16}: {warn_str[:-23]}")
+
+    last_time = last_time.isoformat().replace("T", " ")[0:19]
+    click.echo(f"{'':<4}{'last update':<16}: {last_time}")
+    click.echo(f"{'':<4}{'complete':<16}: {p_complete:>3}%")
+    if sub_records:
+        click.echo(f"{'':<4}{'sub records':<16}->")
+        for sr in tr["sub_records"]:
+            if sr["state"] != "SPLIT":
+                click.echo(f"{'':4}{'+':<4} {'id':<13}: {sr['id']}")
+                click.echo(f"{'':<9}{'sub_id':<13}: {sr['sub_id']}")
+                click.echo(f"{'':<9}{'state':<13}: {sr['state']}")
+                click.echo(
+                    f"{'':<9}{'last update':<13}: {(sr['last_updated']).replace('T',' ')[0:19]}"
+                )
+
+    if errors:
+        click.echo(f"{'':<4}{'errors in sub records':<20} ->")
         for sr in tr["sub_records"]:
             if len(sr["failed_files"]) > 0:
+                click.echo(f"{'':4}{'+':<4} {'id':<13}: {sr['id']}")
+                click.echo(f"{'':<9}{'failed files':<13}->")
                 for ff in sr["failed_files"]:
-                    click.echo(f"{ff['filepath']}")
+                    click.echo(f"{'':<9}{'+':<4} {'filepath':<8} : {ff['filepath']}")
+                    click.echo(f"{'':<9}{'':>4} {'reason':<8} : {ff['reason']}")
 
 
+@timings.timed("render")
 def print_single_stat(response: dict, req_details, sub_records, errors):
     """Print a single status in more detail, with a list of failed files if
     necessary"""
@@ -218,56 +365,10 @@ def print_single_stat(response: dict, req_details, sub_records, errors):
 
     # still looping over the keys, just in case more than one state returned
     for tr in response["data"]["records"]:
-        state, last_time, p_complete = get_transaction_state(tr)
-        if state == None:
-            continue
-        click.echo(f"{'':<4}{'id':<16}: {tr['id']}")
-        click.echo(f"{'':<4}{'user':<16}: {tr['user']}")
-        click.echo(f"{'':<4}{'group':<16}: {tr['group']}")
-        click.echo(f"{'':<4}{'action':<16}: {tr['api_action']}")
-        click.echo(f"{'':<4}{'transaction id':<16}: {tr['transaction_id']}")
-        if "label" in tr:
-            click.echo(f"{'':<4}{'label':<16}: {tr['label']}")
-        click.echo(
-            f"{'':<4}{'creation time':<16}: {(tr['creation_time']).replace('T',' ')[0:19]}"
-        )
-        click.echo(f"{'':<4}{'state':<16}: {state}")
-        if "warnings" in tr:
-            warn_str = ""
-            for w in tr["warnings"]:
-                warn_str += w + f"\n{'':<22}"
-            if len(warn_str) > 0:
-                click.echo(f"{'':<4}{'warnings':<16}: {warn_str[:-23]}")
-
-        last_time = last_time.isoformat().replace("T", " ")[0:19]
-        click.echo(f"{'':<4}{'last update':<16}: {last_time}")
-        click.echo(f"{'':<4}{'complete':<16}: {p_complete:>3}%")
-        if sub_records:
-            click.echo(f"{'':<4}{'sub records':<16}->")
-            for sr in tr["sub_records"]:
-                if sr["state"] != "SPLIT":
-                    click.echo(f"{'':4}{'+':<4} {'id':<13}: {sr['id']}")
-                    click.echo(f"{'':<9}{'sub_id':<13}: {sr['sub_id']}")
-                    click.echo(f"{'':<9}{'state':<13}: {sr['state']}")
-                    click.echo(
-                        f"{'':<9}{'last update':<13}: {(sr['last_updated']).replace('T',' ')[0:19]}"
-                    )
-
-        if errors:
-            click.echo(f"{'':<4}{'errors in sub records':<20} ->")
-            for sr in tr["sub_records"]:
-                if len(sr["failed_files"]) > 0:
-                    click.echo(f"{'':4}{'+':<4} {'id':<13}: {sr['id']}")
-                    click.echo(f"{'':<9}{'failed files':<13}->")
-                    for ff in sr["failed_files"]:
-                        click.echo(
-                            f"{'':<9}{'+':<4} {'filepath':<8} : {ff['filepath']}"
-                        )
-                        click.echo(f"{'':<9}{'':>4} {'reason':<8} : {ff['reason']}")
+        _print_single_stat_record(tr, sub_records, errors)
 
 
-def print_multi_stat(response: dict, req_details):
-    """Print a multi-line set of status"""
+def _print_multi_stat_header(req_details):
     stat_string = "State of transactions for "
     stat_string += req_details
     click.echo(stat_string)
@@ -275,36 +376,98 @@ def print_multi_stat(response: dict, req_details):
         f"{'':<4}{'user':<16}{'id':<12}{'action':<16}{'job label':<16}"
         f"{'label':<16}{'done':<6}{'state':<23}{'last update':<23}"
     )
+
+
+def _print_multi_stat_row(tr: dict, tr_state=None):
+    """Print one transaction as a row of the transactions table.  tr_state is the
+    state returned by get_transaction_state, if it has already been computed."""
+    if tr_state is None:
+        from nlds_client.clientlib.transactions import get_transaction_state
+
+        tr_state = get_transaction_state(tr)
+    state, last_time, p_complete = tr_state
+    if state == None:
+        return
+    last_time = last_time.isoformat().replace("T", " ")[0:19]
+    if "label" in tr:
+        label = tr["label"]
+    else:
+        label = ""
+    if "job_label" in tr and tr["job_label"]:
+        job_label = tr["job_label"]
+    else:
+        job_label = ""  # tr['transaction_id'][0:8]
+    click.echo(
+        f"{'':<4}{tr['user']:<16}{tr['id']:<12}{tr['api_action']:<16}"
+        f"{job_label:16}{label:16}{p_complete:>3}%  "
+        f"{state:<23}{last_time:<23}"
+    )
+
+
+@timings.timed("render")
+def print_multi_stat(response: dict, req_details):
+    """Print a multi-line set of status"""
+    _print_multi_stat_header(req_details)
     for tr in response["data"]["records"]:
-        state, last_time, p_complete = get_transaction_state(tr)
-        if state == None:
-            continue
-        last_time = last_time.isoformat().replace("T", " ")[0:19]
-        if "label" in tr:
-            label = tr["label"]
-        else:
-            label = ""
-        if "job_label" in tr and tr["job_label"]:
-            job_label = tr["job_label"]
-        else:
-            job_label = ""  # tr['transaction_id'][0:8]
-        click.echo(
-            f"{'':<4}{tr['user']:<16}{tr['id']:<12}{tr['api_action']:<16}"
-            f"{job_label:16}{label:16}{p_complete:>3}%  "
-            f"{state:<23}{last_time:<23}"
-        )
+        _print_multi_stat_row(tr)
 
 
+@timings.timed("render")
 def print_stat(response: dict, req_details, sub_records, errors, failed_files):
     """Print out the response from the list command"""
-    L = len(response["data"]["records"])
-    # L of 0 should be trapped by exceptions on the server
+    print_stat_records(
+        response["data"]["records"], req_details, sub_records, errors, failed_files
+    )
+
+
+@timings.timed("render")
+def print_stat_records(records, req_details, sub_records, errors, failed_files):
+    """Print out the transaction records from the stat command.  records can be any
+    iterable, including a stream, and is only iterated over once."""
+    records = iter(records)
+    # only the first two records are needed to decide how to print them
+    head = [tr for tr in islice(records, 2)]
+    # no records should be trapped by exceptions on the server
     if failed_files:
-        print_failed_files(response, req_details)
-    elif L == 1:
-        print_single_stat(response, req_details, sub_records, errors)
+        for tr in chain(head, records):
+            _print_failed_files_record(tr)
+    elif len(head) == 1:
+        click.echo(f"State of transaction for {req_details}")
+        _print_single_stat_record(head[0], sub_records, errors)
     else:
-        print_multi_stat(response, req_details)
+        _print_multi_stat_header(req_details)
+        for tr in chain(head, records):
+            _print_multi_stat_row(tr)
+
+
+@timings.timed("render")
+def print_stat_summary(states, req_details):
+    """Print the number of transactions in each state, from a TransactionStates"""
+    click.echo(f"Summary of transactions for {req_details}")
+    click.echo(f"{'':<4}{'state':<24}{'count':>10}")
+    for state, count in states.counts().items():
+        click.echo(f"{'':<4}{state:<24}{count:>10}")
+    click.echo(f"{'':<4}{'total':<24}{len(states):>10}")
+
+
+def print_watch_stat(fetch_records, req_details, config):
+    """Print the transactions table, then poll the transactions and print the rows
+    of the transactions that change, until every transaction has finished.
+    Returns the number of transactions watched."""
+    from nlds_client.clientlib.monitor import watch_transactions
+
+    n_records = 0
+    for changed in watch_transactions(
+        fetch_records,
+        min_interval=get_option(config, "watch_min_interval"),
+        max_interval=get_option(config, "watch_max_interval"),
+    ):
+        if n_records == 0:
+            _print_multi_stat_header(req_details)
+        n_records += len(changed)
+        for tr, tr_state in changed:
+            _print_multi_stat_row(tr, tr_state)
+    return n_records
 
 
 def __count_files(response: dict):
@@ -318,8 +481,9 @@ def __count_files(response: dict):
     return n_files
 
 
-def print_single_file(response, print_url=False):
-    """Print (full) details of one file"""
+def _iter_find_response(response: dict):
+    """Iterate over the (holding, transaction, file) of each file in a find
+    response"""
     # NRM - note: still using loops over dictionary keys as its
     # 1. easier than trying to just use the first key
     # 2. a bit more robust - in case more than one file matches, for example, in
@@ -328,32 +492,44 @@ def print_single_file(response, print_url=False):
         h = response["data"]["holdings"][hkey]
         for tkey in h["transactions"]:
             t = h["transactions"][tkey]
-            time = t["ingest_time"].replace("T", " ")[0:19]
             for f in t["filelist"]:
-                click.echo(f"{'':<4}{'path':<16}: {f['original_path']}")
-                click.echo(f"{'':<4}{'type':<16}: {f['path_type']}")
-                if f["path_type"] == "LINK" and f["link_path"]:
-                    click.echo(f"{'':<4}{'link path':<16}: {f['link_path']}")
-                size = pretty_size(f["size"])
-                click.echo(f"{'':<4}{'size':<16}: {size}")
-                click.echo(f"{'':<4}{'user uid':<16}: {f['user']}")
-                click.echo(f"{'':<4}{'group gid':<16}: {f['group']}")
-                click.echo(
-                    f"{'':<4}{'permissions':<16}: "
-                    f"{integer_permissions_to_string(f['permissions'])}"
-                )
-                click.echo(f"{'':<4}{'ingest time':<16}: {time}")
-                # locations - if not a link file
-                if not f["path_type"] == "LINK":
-                    stls = " "
-                    for s in f["locations"]:
-                        stls += s["storage_type"] + ", "
-                    click.echo(f"{'':<4}{'storage location':<16}:{stls[0:-2]}")
+                yield h, t, f
+
+
+def _print_single_file(h, t, f, print_url=False):
+    """Print (full) details of one file"""
+    time = t["ingest_time"].replace("T", " ")[0:19]
+    click.echo(f"{'':<4}{'path':<16}: {f['original_path']}")
+    click.echo(f"{'':<4}{'type':<16}: {f['path_type']}")
+    if f["path_type"] == "LINK" and f["link_path"]:
+        click.echo(f"{'':<4}{'link path':<16}: {f['link_path']}")
+    size = pretty_size(f["size"])
+    click.echo(f"{'':<4}{'size':<16}: {size}")
+    click.echo(f"{'':<4}{'user uid':<16}: {f['user']}")
+    click.echo(f"{'':<4}{'group gid':<16}: {f['group']}")
+    click.echo(
+        f"{'':<4}{'permissions':<16}: "
+        f"{integer_permissions_to_string(f['permissions'])}"
+    )
+    click.echo(f"{'':<4}{'ingest time':<16}: {time}")
+    # locations - if not a link file
+    if not f["path_type"] == "LINK":
+        stls = " "
+        for s in f["locations"]:
+            stls += s["storage_type"] + ", "
+        click.echo(f"{'':<4}{'storage location':<16}:{stls[0:-2]}")
+
+    # url if requested
+    url = _get_url_from_file(f)
+    if url is not None and print_url:
+        click.echo(f"{'':<4}{'url':<16}: {url}")
 
-                # url if requested
-                url = _get_url_from_file(f)
-                if url is not None and print_url:
-                    click.echo(f"{'':<4}{'url':<16}: {url}")
+
+@timings.timed("render")
+def print_single_file(response, print_url=False):
+    """Print (full) details of one file"""
+    for h, t, f in _iter_find_response(response):
+        _print_single_file(h, t, f, print_url)
 
 
 def _get_url_from_file(f):
@@ -364,17 +540,18 @@ def _get_url_from_file(f):
     return url
 
 
+def _print_simple_file(h, t, f, print_url=False):
+    url = _get_url_from_file(f)
+    if print_url and url:
+        click.echo(url)
+    else:
+        click.echo(f"{f['original_path']}")
+
+
+@timings.timed("render")
 def print_simple_file(response, print_url=False):
-    for hkey in response["data"]["holdings"]:
-        h = response["data"]["holdings"][hkey]
-        for tkey in h["transactions"]:
-            t = h["transactions"][tkey]
-            for f in t["filelist"]:
-                url = _get_url_from_file(f)
-                if print_url and url:
-                    click.echo(url)
-                else:
-                    click.echo(f"{f['original_path']}")
+    for h, t, f in _iter_find_response(response):
+        _print_simple_file(h, t, f, print_url)
 
 
 def get_location_letters(file):
@@ -394,30 +571,36 @@ def get_location_letters(file):
     return ll
 
 
-def print_multi_file(response, print_url):
+def _print_multi_file_header():
     click.echo(
         f"{'':<4}{'user':<16}{'h-id':<6}{'h-label':<16}{'size':<8}{'date':<12}{'storage':<8}{'path'}"
     )
-    for hkey in response["data"]["holdings"]:
-        h = response["data"]["holdings"][hkey]
-        for tkey in h["transactions"]:
-            t = h["transactions"][tkey]
-            time = t["ingest_time"].replace("T", " ")[0:19]
-            for f in t["filelist"]:
-                size = pretty_size(f["size"])
-                url = _get_url_from_file(f)
-                if url and print_url:
-                    path_print = _get_url_from_file(f)
-                else:
-                    path_print = f["original_path"]
-                storage = get_location_letters(f)
-                click.echo(
-                    f"{'':4}{h['user']:<16}"
-                    f"{h['holding_id']:<6}{h['label']:<16}"
-                    f"{size:<8}{time[:11]:<12}{storage:^8}{path_print}"
-                )
 
 
+def _print_multi_file_row(h, t, f, print_url):
+    time = t["ingest_time"].replace("T", " ")[0:19]
+    size = pretty_size(f["size"])
+    url = _get_url_from_file(f)
+    if url and print_url:
+        path_print = _get_url_from_file(f)
+    else:
+        path_print = f["original_path"]
+    storage = get_location_letters(f)
+    click.echo(
+        f"{'':4}{h['user']:<16}"
+        f"{h['holding_id']:<6}{h['label']:<16}"
+        f"{size:<8}{time[:11]:<12}{storage:^8}{path_print}"
+    )
+
+
+@timings.timed("render")
+def print_multi_file(response, print_url):
+    _print_multi_file_header()
+    for h, t, f in _iter_find_response(response):
+        _print_multi_file_row(h, t, f, print_url)
+
+
+@timings.timed("render")
 def print_find(response: dict, req_details, simple, url):
     """Print out the response from the find command"""
     n_holdings = len(response["data"]["holdings"])
@@ -438,6 +621,32 @@ def print_find(response: dict, req_details, simple, url):
         print_multi_file(response, url)
 
 
+@timings.timed("render")
+def print_find_records(files, req_details, simple, url):
+    """Print out the (holding, transaction, file) records from the find command.
+    files can be any iterable, including a stream, and is only iterated over
+    once."""
+    files = iter(files)
+    if simple:
+        for h, t, f in files:
+            _print_simple_file(h, t, f, url)
+        return
+    # only the first two files are needed to decide how to print them.  The files
+    # are printed as they arrive, so the number of holdings they are in is not
+    # known when the header is printed.
+    head = [hf for hf in islice(files, 2)]
+    list_string = "Listing files for holding(s) for "
+    list_string += req_details
+    click.echo(list_string)
+    if len(head) == 1:
+        _print_single_file(*head[0], url)
+    else:
+        _print_multi_file_header()
+        for h, t, f in chain(head, files):
+            _print_multi_file_row(h, t, f, url)
+
+
+@timings.timed("render")
 def print_meta(response: dict, req_details: str):
     """Print out the response from the meta command"""
     meta_string = "Changed metadata for holding for "
@@ -453,6 +662,7 @@ def print_meta(response: dict, req_details: str):
         click.echo(f"{'':<12}{'tags':<8}: {h['new_meta']['tags']}")
 
 
+@timings.timed("render")
 def print_response(tr: dict):
     if "msg" in tr and len(tr["msg"]) > 0:
         click.echo(tr["msg"])
@@ -472,6 +682,9 @@ def print_response(tr: dict):
         and len(tr["transaction_id"]) > 0
     ):
         click.echo(f"{'':<4}{'transaction id':<16}: {tr['transaction_id']}")
+    if "transaction_ids" in tr and len(tr["transaction_ids"]) > 0:
+        trans_str = f"\n{'':<22}".join(tr["transaction_ids"])
+        click.echo(f"{'':<4}{'transaction ids':<16}: {trans_str}")
     if "label" in tr and tr["label"] and len(tr["label"]) > 0:
         click.echo(f"{'':<4}{'label':<16}: {tr['label']}")
     if "tag" in tr and tr["tag"] and len(tr["tag"]) > 0:
@@ -489,7 +702,29 @@ user_help_text = (
 """Put files command"""
 
 
-@nlds_client.command("put", help="Put a single file.")
+def _print_job_start(job_label: str, checkpoint: str):
+    """Tell the user the job label that was created for a chunked submission, and
+    where its checkpoint is, before anything is sent, so that it can be resumed if
+    it is interrupted"""
+    click.echo(
+        f"Submitting with job label {job_label}, checkpoint {checkpoint}.  If this "
+        f"is interrupted, resubmit with --resume -b {job_label}.",
+        err=True,
+    )
+
+
+def _print_resume_hint(response: dict):
+    """Tell the user how to resume a chunked submission that did not complete"""
+    if "checkpoint" in response:
+        click.echo(
+            f"Resubmit with --resume -b {response['job_label']} to submit only the "
+            "transactions that were not accepted."
+        )
+
+
+@nlds_client.command(
+    "put", help="Put a single file, or a directory tree with -r/--recursive."
+)
 @click.option(
     "-u", "--user", default=None, type=str, help="The username to put the file for."
 )
@@ -537,12 +772,71 @@ user_help_text = (
 @click.option(
     "-j", "--json", default=False, is_flag=True, help="Output the result as JSON."
 )
+@click.option(
+    "-r",
+    "--recursive",
+    default=False,
+    is_flag=True,
+    help="Put all of the files in the directory tree at FILEPATH.",
+)
+@click.option(
+    "--include",
+    multiple=True,
+    type=str,
+    help="Only put files matching this glob pattern, e.g. '*.nc'.  Patterns that "
+    "contain a / are matched against the whole path.  Can be given more than once.",
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    type=str,
+    help="Do not put files or directories matching this glob pattern.  Can be "
+    "given more than once.",
+)
+@click.option(
+    "--scan_workers",
+    default=None,
+    type=int,
+    help="The number of directories to list at the same time.",
+)
 @click.argument("filepath", type=str)
-def put(filepath, user, group, label, job_label, holding_id, tag, json):
+def put(
+    filepath,
+    user,
+    group,
+    label,
+    job_label,
+    holding_id,
+    tag,
+    json,
+    recursive,
+    include,
+    exclude,
+    scan_workers,
+):
+    from nlds_client.clientlib.transactions import put_filelist
+    from nlds_client.clientlib.submission import put_directory
+
+    if (include or exclude) and not recursive:
+        raise click.UsageError("--include and --exclude need -r/--recursive")
     try:
-        response = put_filelist(
-            [filepath], user, group, job_label, label, holding_id, tag
-        )
+        if recursive:
+            response = put_directory(
+                filepath,
+                user,
+                group,
+                job_label,
+                label,
+                holding_id,
+                tag,
+                include=include,
+                exclude=exclude,
+                scan_workers=scan_workers,
+            )
+        else:
+            response = put_filelist(
+                [filepath], user, group, job_label, label, holding_id, tag
+            )
         if json:
             click.echo(json_dumps(response))
         else:
@@ -640,6 +934,7 @@ def get(
     json,
     regex,
 ):
+    from nlds_client.clientlib.transactions import get_filelist
     try:
         response = get_filelist(
             [filepath],
@@ -730,7 +1025,9 @@ def get(
 
 
 @nlds_client.command(
-    "putlist", help=f"Put a number of files specified in a list.{user_help_text}"
+    "putlist",
+    help="Put a number of files specified in a list, one file per line.  Use - as "
+    f"FILELIST to read the list from stdin.{user_help_text}",
 )
 @click.argument("filelist", type=str)
 @click.option(
@@ -780,28 +1077,82 @@ def get(
 @click.option(
     "-j", "--json", default=False, is_flag=True, help="Output the result as JSON."
 )
-def putlist(filelist, user, group, label, job_label, holding_id, tag, json):
-    # read the filelist from the file
+@click.option(
+    "--chunk_files",
+    default=None,
+    type=int,
+    help="Split the list into transactions of at most this many files.  All of the "
+    "transactions share the job label, and add to the same holding.  If no "
+    "holding label, id or tags are given then a new holding is created with a "
+    "random label.",
+)
+@click.option(
+    "--chunk_bytes",
+    default=None,
+    type=SizeParamType(),
+    help="Split the list into transactions of at most this total size, e.g. 500G.",
+)
+@click.option(
+    "--workers",
+    default=None,
+    type=int,
+    help="The number of transactions to submit at the same time, when the list is "
+    "split.",
+)
+@click.option(
+    "--resume",
+    default=False,
+    is_flag=True,
+    help="Resume an interrupted submission of a list that was split into "
+    "transactions, skipping the transactions that were accepted.  The job label "
+    "must be the same as for the interrupted submission.",
+)
+def putlist(
+    filelist,
+    user,
+    group,
+    label,
+    job_label,
+    holding_id,
+    tag,
+    json,
+    chunk_files,
+    chunk_bytes,
+    workers,
+    resume,
+):
+    from nlds_client.clientlib.submission import put_filelist_chunked
+    from nlds_client.clientlib.filelist import open_filelist
+
+    # open the filelist, which is read a line at a time as the files are submitted
     try:
-        fh = open(filelist)
-        files = fh.readlines()
-        fh.close()
+        files = open_filelist(filelist)
     except FileNotFoundError as fe:
         raise click.UsageError(fe)
 
-    # clean the list of any newlines / spaces
-    for i, v in enumerate(files):
-        files[i] = v.strip()
-        if len(files[i]) == 0:
-            files.pop(i)
-
     try:
-        response = put_filelist(files, user, group, job_label, label, holding_id, tag)
+        response = put_filelist_chunked(
+            files,
+            user,
+            group,
+            job_label,
+            label,
+            holding_id,
+            tag,
+            chunk_files=chunk_files,
+            chunk_bytes=chunk_bytes,
+            workers=workers,
+            resume=resume,
+            on_start=_print_job_start if job_label is None else None,
+        )
         if json:
             click.echo(json_dumps(response))
         else:
             print_response(response)
+            _print_resume_hint(response)
 
+    except UsageError as ue:
+        raise click.UsageError(ue)
     except ConnectionError as ce:
         raise click.UsageError(ce)
     except AuthenticationError as ae:
@@ -814,7 +1165,9 @@ def putlist(filelist, user, group, label, job_label, holding_id, tag, json):
 
 
 @nlds_client.command(
-    "getlist", help=f"Get a number of files specified in a list.{user_help_text}"
+    "getlist",
+    help="Get a number of files specified in a list, one file per line.  Use - as "
+    f"FILELIST to read the list from stdin.{user_help_text}",
 )
 @click.option(
     "-u", "--user", default=None, type=str, help="The username to get files for."
@@ -869,26 +1222,85 @@ def putlist(filelist, user, group, label, job_label, holding_id, tag, json):
 @click.option(
     "-j", "--json", default=False, is_flag=True, help="Output the result as JSON."
 )
+@click.option(
+    "--chunk_files",
+    default=None,
+    type=int,
+    help="Split the list into transactions of at most this many files.  All of the "
+    "transactions share the job label.",
+)
+@click.option(
+    "--workers",
+    default=None,
+    type=int,
+    help="The number of transactions to submit at the same time, when the list is "
+    "split.",
+)
+@click.option(
+    "--no_resolve",
+    default=False,
+    is_flag=True,
+    help="Do not resolve the filepaths in the list to absolute paths with the "
+    "symlinks resolved.  Use this when the list already contains resolved paths.",
+)
+@click.option(
+    "--resume",
+    default=False,
+    is_flag=True,
+    help="Resume an interrupted retrieval of a list that was split into "
+    "transactions, skipping the transactions that were accepted.  The job label "
+    "must be the same as for the interrupted retrieval.",
+)
 @click.argument("filelist", type=str)
 def getlist(
-    filelist, user, group, groupall, target, job_label, label, holding_id, tag, json
+    filelist,
+    user,
+    group,
+    groupall,
+    target,
+    job_label,
+    label,
+    holding_id,
+    tag,
+    json,
+    chunk_files,
+    workers,
+    no_resolve,
+    resume,
 ):
-    # read the filelist from the file
+    from nlds_client.clientlib.submission import get_filelist_chunked
+    from nlds_client.clientlib.filelist import open_filelist
+
+    # open the filelist, which is read a line at a time as the files are submitted
     try:
-        fh = open(filelist)
-        files = fh.readlines()
-        fh.close()
+        files = open_filelist(filelist)
     except FileNotFoundError as fe:
         raise click.UsageError(fe)
 
     try:
-        response = get_filelist(
-            files, user, group, groupall, target, job_label, label, holding_id, tag
+        response = get_filelist_chunked(
+            files,
+            user,
+            group,
+            groupall,
+            target,
+            job_label,
+            label,
+            holding_id,
+            tag,
+            chunk_files=chunk_files,
+            workers=workers,
+            resolve=not no_resolve,
+            resume=resume,
+            on_start=_print_job_start if job_label is None and label is None else None,
         )
         if json:
             click.echo(json_dumps(response))
         else:
             print_response(response)
+            _print_resume_hint(response)
+    except UsageError as ue:
+        raise click.UsageError(ue)
     except ConnectionError as ce:
         raise click.UsageError(ce)
     except AuthenticationError as ae:
@@ -983,51 +1395,191 @@ def getlist(
 #         raise click.UsageError(re)
 
 
-"""List (holdings) command"""
+"""Sync command"""
 
 
-@nlds_client.command("list", help=f"List holdings.{user_help_text}")
-@click.option(
-    "-u", "--user", default=None, type=str, help="The username to list holdings for."
+@nlds_client.command(
+    "sync",
+    help="Put the files in a directory tree into a holding, skipping the files that "
+    f"are already in the holding with the same size.{user_help_text}",
 )
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
 @click.option(
-    "-g", "--group", default=None, type=str, help="The group to list holdings for."
+    "-u", "--user", default=None, type=str, help="The username to put files for."
 )
 @click.option(
-    "-A",
-    "--groupall",
-    default=False,
-    is_flag=True,
-    help="List holdings that belong to a group, rather than a single user",
+    "-g", "--group", default=None, type=str, help="The group to put files for."
 )
 @click.option(
     "-l",
     "--label",
-    default=None,
+    required=True,
     type=str,
-    help="The label of the holding(s) to list.  This can be a regular"
-    "expression (regex) if the -x/--regex flag is also used.",
-)
-@click.option(
-    "-i",
-    "--holding_id",
-    default=None,
-    type=int,
-    help="The numeric id of the holding to list.",
+    help="The label of the holding to sync the directory to.  If the holding does "
+    "not exist then it will be created with the label.",
 )
 @click.option(
-    "-n",
-    "--transaction_id",
+    "-b",
+    "--job_label",
     default=None,
     type=str,
-    help="The UUID transaction id of the transaction to list.",
+    help="An optional label for the PUT job, that can be viewed when "
+    "using the stat command",
 )
 @click.option(
     "-t",
     "--tag",
     default=None,
     type=TagParamType(),
-    help="The tag(s) of the holding(s) to list.",
+    help="The tags to add to the holding, if it is created.",
+)
+@click.option(
+    "--include",
+    multiple=True,
+    type=str,
+    help="Only put files matching this glob pattern, e.g. '*.nc'.  Patterns that "
+    "contain a / are matched against the whole path.  Can be given more than once.",
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    type=str,
+    help="Do not put files or directories matching this glob pattern.  Can be "
+    "given more than once.",
+)
+@click.option(
+    "--scan_workers",
+    default=None,
+    type=int,
+    help="The number of directories to list at the same time.",
+)
+@click.option(
+    "-n",
+    "--dry_run",
+    default=False,
+    is_flag=True,
+    help="List the files that would be put, without putting them.",
+)
+@click.option(
+    "-j", "--json", default=False, is_flag=True, help="Output the result as JSON."
+)
+@click.option(
+    "--chunk_files",
+    default=None,
+    type=int,
+    help="Split the files into transactions of at most this many files.",
+)
+@click.option(
+    "--chunk_bytes",
+    default=None,
+    type=SizeParamType(),
+    help="Split the files into transactions of at most this total size, e.g. 500G.",
+)
+@click.option(
+    "--workers",
+    default=None,
+    type=int,
+    help="The number of transactions to submit at the same time, when the files "
+    "are split.",
+)
+def sync(
+    directory,
+    user,
+    group,
+    label,
+    job_label,
+    tag,
+    include,
+    exclude,
+    scan_workers,
+    dry_run,
+    json,
+    chunk_files,
+    chunk_bytes,
+    workers,
+):
+    from nlds_client.clientlib.sync import sync_directory
+
+    try:
+        response = sync_directory(
+            directory,
+            label,
+            user,
+            group,
+            job_label,
+            tag=tag,
+            include=include,
+            exclude=exclude,
+            scan_workers=scan_workers,
+            dry_run=dry_run,
+            chunk_files=chunk_files,
+            chunk_bytes=chunk_bytes,
+            workers=workers,
+        )
+        if json:
+            click.echo(json_dumps(response))
+        else:
+            click.echo(response["msg"])
+            if dry_run:
+                for fp in response["filelist"]:
+                    click.echo(fp)
+            elif "response" in response:
+                print_response(response["response"])
+    except ConnectionError as ce:
+        raise click.UsageError(ce)
+    except AuthenticationError as ae:
+        raise click.UsageError(ae)
+    except RequestError as re:
+        raise click.UsageError(re)
+    except ServerError as se:
+        raise click.UsageError(se)
+
+
+"""List (holdings) command"""
+
+
+@nlds_client.command("list", help=f"List holdings.{user_help_text}")
+@click.option(
+    "-u", "--user", default=None, type=str, help="The username to list holdings for."
+)
+@click.option(
+    "-g", "--group", default=None, type=str, help="The group to list holdings for."
+)
+@click.option(
+    "-A",
+    "--groupall",
+    default=False,
+    is_flag=True,
+    help="List holdings that belong to a group, rather than a single user",
+)
+@click.option(
+    "-l",
+    "--label",
+    default=None,
+    type=str,
+    help="The label of the holding(s) to list.  This can be a regular"
+    "expression (regex) if the -x/--regex flag is also used.",
+)
+@click.option(
+    "-i",
+    "--holding_id",
+    default=None,
+    type=int,
+    help="The numeric id of the holding to list.",
+)
+@click.option(
+    "-n",
+    "--transaction_id",
+    default=None,
+    type=str,
+    help="The UUID transaction id of the transaction to list.",
+)
+@click.option(
+    "-t",
+    "--tag",
+    default=None,
+    type=TagParamType(),
+    help="The tag(s) of the holding(s) to list.",
 )
 @click.option(
     "-j", "--json", default=False, is_flag=True, help="Output the result as JSON."
@@ -1054,6 +1606,27 @@ def getlist(
     default=True,
     help="Switch between ascending and descending time order.",
 )
+@click.option(
+    "-P",
+    "--page_size",
+    default=None,
+    type=int,
+    help="Request the holdings from the server this many at a time, rather than "
+    "all at once.  Cannot be used with --json.",
+)
+@click.option(
+    "--no_cache",
+    default=False,
+    is_flag=True,
+    help="Do not use the query cache, even if it is enabled in the config.",
+)
+@click.option(
+    "--refresh",
+    default=False,
+    is_flag=True,
+    help="Request the holdings from the server, even if they are in the query "
+    "cache, and update the cache.",
+)
 def list(
     user,
     group,
@@ -1066,10 +1639,51 @@ def list(
     regex,
     limit,
     time,
+    page_size,
+    no_cache,
+    refresh,
 ):
-    #
+    from nlds_client.clientlib.transactions import (
+        list_holding,
+        stream_list_holding,
+        iter_holdings,
+    )
+    if page_size is not None and json:
+        raise click.UsageError("--page_size cannot be used with --json")
+    cache = False if no_cache else None
     try:
-        response = list_holding(
+        if page_size is None and not json:
+            page_size = get_option(load_config(), "catalog_page_size")
+        if page_size and not json:
+            req_details = format_request_details(
+                user,
+                group,
+                groupall=groupall,
+                label=label,
+                holding_id=holding_id,
+                tag=tag,
+            )
+            holdings = iter_holdings(
+                user,
+                group,
+                groupall=groupall,
+                label=label,
+                holding_id=holding_id,
+                transaction_id=transaction_id,
+                tag=tag,
+                regex=regex,
+                limit=limit,
+                descending=time,
+                page_size=page_size,
+                cache=cache,
+                refresh=refresh,
+            )
+            print_list_records(holdings, req_details)
+            return
+        # the JSON output needs the whole response, otherwise the holdings are
+        # printed as they are decoded from the response
+        list_method = list_holding if json else stream_list_holding
+        response = list_method(
             user,
             group,
             groupall=groupall,
@@ -1080,16 +1694,20 @@ def list(
             regex=regex,
             limit=limit,
             descending=time,
+            cache=cache,
+            refresh=refresh,
         )
         req_details = format_request_details(
             user, group, groupall=groupall, label=label, holding_id=holding_id, tag=tag
         )
-        if response["success"]:
-            if json:
+        if json:
+            if response["success"]:
                 click.echo(json_dumps(response))
-            else:
-                print_list(response, req_details)
         else:
+            head, holdings, response = _open_stream(response)
+            if response["success"]:
+                print_list_records(chain(head, holdings), req_details)
+        if not response["success"]:
             fail_string = "Failed to list holding with "
             fail_string += req_details
             if "failure" in response["details"]:
@@ -1102,11 +1720,72 @@ def list(
         raise click.UsageError(ae)
     except RequestError as re:
         raise click.UsageError(re)
+    except ServerError as se:
+        raise click.UsageError(se)
 
 
 """Stat (monitoring) command"""
 
 
+def _stat_journal(
+    user,
+    group,
+    groupall,
+    n_recent,
+    json,
+    sub_records,
+    errors,
+    failed_files,
+    watch,
+    summary,
+):
+    """Show the state of the transactions most recently submitted from this
+    machine, looking them up by the transaction ids in the local journal."""
+    from nlds_client.clientlib.journal import read_journal
+    from nlds_client.clientlib.monitor import TransactionPoller
+
+    config = load_config()
+    user = get_user(config, user)
+    group = get_group(config, group)
+    entries = read_journal(
+        config, limit=n_recent, user=None if groupall else user, group=group
+    )
+    req_details = format_request_details(user, group, groupall=groupall)
+    if not entries:
+        raise click.UsageError(
+            "Failed to get status of transaction(s) with "
+            f"{req_details}\nReason: no transactions found in the local journal"
+        )
+    transaction_ids = [e["transaction_id"] for e in entries]
+    # with --watch, the transactions are polled by their job labels once found
+    _fetch_records = TransactionPoller(user, group, groupall, transaction_ids).poll
+
+    if watch:
+        n_records = print_watch_stat(_fetch_records, req_details, config)
+    elif summary:
+        from nlds_client.clientlib.states import aggregate_transaction_states
+
+        states = aggregate_transaction_states(_fetch_records())
+        n_records = len(states)
+        if json:
+            click.echo(json_dumps({"counts": states.counts(), "total": n_records}))
+        elif n_records:
+            print_stat_summary(states, req_details)
+    else:
+        records = [tr for tr in _fetch_records()]
+        n_records = len(records)
+        if json:
+            click.echo(json_dumps({"success": True, "data": {"records": records}}))
+        elif n_records:
+            print_stat_records(records, req_details, sub_records, errors, failed_files)
+    if n_records == 0:
+        raise click.UsageError(
+            "Failed to get status of transaction(s) with "
+            f"{req_details}\nReason: the transactions in the local journal were not "
+            "found on the server"
+        )
+
+
 @nlds_client.command("stat", help=f"List transactions.{user_help_text}")
 @click.option(
     "-u",
@@ -1239,6 +1918,32 @@ COMPLETE_WITH_WARNINGS | SPLIT
     default=True,
     help="Switch between ascending and descending time order.",
 )
+@click.option(
+    "-w",
+    "--watch",
+    default=False,
+    type=bool,
+    is_flag=True,
+    help="Keep polling the transactions, printing a row for each one when it "
+    "changes, until they have all finished.",
+)
+@click.option(
+    "-Z",
+    "--summary",
+    default=False,
+    type=bool,
+    is_flag=True,
+    help="Print the number of transactions in each state, rather than the "
+    "transactions.",
+)
+@click.option(
+    "-R",
+    "--mine_recent",
+    default=None,
+    type=int,
+    help="List the MINE_RECENT transactions most recently submitted from this "
+    "machine, which are looked up by their ids in the local journal.",
+)
 def stat(
     user,
     group,
@@ -1256,15 +1961,98 @@ def stat(
     failed_files,
     limit,
     time,
+    watch,
+    summary,
+    mine_recent,
 ):
+    from nlds_client.clientlib.transactions import (
+        monitor_transactions,
+        stream_monitor_transactions,
+    )
     api_action_list = [a for a in api_action]
     state_list = [s for s in state]
     exclude_api_action_list = [x for x in exclude_api_action]
     # users don't need to know about `archive-put`!
     # if "archive-put" not in exclude_api_action_list:
     #     exclude_api_action_list.append("archive-put")
+    if watch and (json or failed_files or sub_records or errors or summary):
+        raise click.UsageError(
+            "--watch cannot be used with --json, --failed_files, --sub_records, "
+            "--errors or --summary"
+        )
+    if summary and (failed_files or sub_records or errors):
+        raise click.UsageError(
+            "--summary cannot be used with --failed_files, --sub_records or --errors"
+        )
     try:
-        response = monitor_transactions(
+        if mine_recent is not None:
+            _stat_journal(
+                user,
+                group,
+                groupall,
+                mine_recent,
+                json,
+                sub_records,
+                errors,
+                failed_files,
+                watch,
+                summary,
+            )
+            return
+
+        if watch:
+            req_details = format_request_details(
+                user,
+                group,
+                groupall=groupall,
+                id=id,
+                transaction_id=transaction_id,
+                state=state,
+                job_label=job_label,
+                api_action=api_action,
+            )
+
+            def _fetch_records():
+                stream = stream_monitor_transactions(
+                    user,
+                    group,
+                    groupall=groupall,
+                    idd=id,
+                    transaction_id=transaction_id,
+                    job_label=job_label,
+                    api_action=api_action_list,
+                    exclude_api_action=exclude_api_action_list,
+                    state=state_list,
+                    regex=regex,
+                    limit=limit,
+                    descending=time,
+                )
+                # the failure of the response is only known once the stream has
+                # been closed, which also happens if watching stops early
+                try:
+                    yield from stream
+                finally:
+                    stream.close()
+                if not stream.root["success"]:
+                    msg = stream.root.get("msg") or "Failed to get status"
+                    if "failure" in stream.root.get("details", {}):
+                        msg += "\nReason: " + stream.root["details"]["failure"]
+                    raise RequestError(msg)
+
+            n_records = print_watch_stat(_fetch_records, req_details, load_config())
+            if n_records == 0:
+                raise click.UsageError(
+                    "Failed to get status of transaction(s) with " + req_details
+                )
+            return
+
+        # the JSON output needs the whole response, otherwise the records are
+        # printed as they are decoded from the response
+        if json and not summary:
+            stat_method = monitor_transactions
+        else:
+            stat_method = stream_monitor_transactions
+        response = stat_method(
             user,
             group,
             groupall=groupall,
@@ -1288,13 +2076,33 @@ def stat(
             job_label=job_label,
             api_action=api_action,
         )
-        n_records = len(response["data"]["records"])
-        if response["success"] and n_records:
-            if json:
+        if summary:
+            from nlds_client.clientlib.states import aggregate_transaction_states
+
+            # the states are computed as the records are decoded, and the records
+            # are not kept
+            states = aggregate_transaction_states(response)
+            response = response.root
+            n_records = len(states)
+            if response["success"] and n_records:
+                if json:
+                    click.echo(
+                        json_dumps({"counts": states.counts(), "total": n_records})
+                    )
+                else:
+                    print_stat_summary(states, req_details)
+        elif json:
+            n_records = len(response["data"]["records"])
+            if response["success"] and n_records:
                 click.echo(json_dumps(response))
-            else:
-                print_stat(response, req_details, sub_records, errors, failed_files)
         else:
+            head, records, response = _open_stream(response)
+            n_records = len(head)
+            if response["success"] and n_records:
+                print_stat_records(
+                    chain(head, records), req_details, sub_records, errors, failed_files
+                )
+        if not response["success"] or n_records == 0:
             fail_string = "Failed to get status of transaction(s) with "
             fail_string += req_details
             if "failure" in response["details"]:
@@ -1313,6 +2121,254 @@ def stat(
         raise click.UsageError(ae)
     except RequestError as re:
         raise click.UsageError(re)
+    except ServerError as se:
+        raise click.UsageError(se)
+
+
+"""Wait (for transactions) command"""
+
+
+@nlds_client.command("wait", help=f"Wait for transactions to finish.{user_help_text}")
+@click.option(
+    "-u",
+    "--user",
+    default=None,
+    type=str,
+    help="The username to wait for transactions for.",
+)
+@click.option(
+    "-g",
+    "--group",
+    default=None,
+    type=str,
+    help="The group to wait for transactions for.",
+)
+@click.option(
+    "-A",
+    "--groupall",
+    default=False,
+    is_flag=True,
+    help="Wait for transactions that belong to a group, rather than a single user",
+)
+@click.option(
+    "-b",
+    "--job_label",
+    default=None,
+    type=str,
+    help="Wait for all the transactions with this job label.",
+)
+@click.option(
+    "-T",
+    "--timeout",
+    default=None,
+    type=float,
+    help="The longest time to wait, in seconds.",
+)
+@click.option(
+    "-e",
+    "--exec",
+    "hook",
+    default=None,
+    type=str,
+    help="A shell command to run when each transaction finishes.  The details of "
+    "the transaction are in the environment variables NLDS_TRANSACTION_ID, NLDS_ID, "
+    "NLDS_JOB_LABEL, NLDS_ACTION and NLDS_STATE.",
+)
+@click.option(
+    "-J",
+    "--journal",
+    default=None,
+    type=int,
+    help="Wait for the JOURNAL transactions most recently submitted from this "
+    "machine, from the local journal.",
+)
+@click.option(
+    "-j", "--json", default=False, is_flag=True, help="Output the result as JSON."
+)
+@click.argument("transaction_ids", type=str, nargs=-1)
+def wait(
+    user, group, groupall, job_label, timeout, hook, journal, json, transaction_ids
+):
+    from nlds_client.clientlib.monitor import wait_for_transactions
+
+    transaction_ids = [t for t in transaction_ids]
+    if journal is not None:
+        from nlds_client.clientlib.journal import read_journal
+
+        config = load_config()
+        entries = read_journal(
+            config,
+            limit=journal,
+            user=None if groupall else get_user(config, user),
+            group=get_group(config, group),
+        )
+        transaction_ids.extend(e["transaction_id"] for e in entries)
+        if not transaction_ids:
+            raise click.UsageError("No transactions found in the local journal")
+    if not transaction_ids and job_label is None:
+        raise click.UsageError("Give the transaction id(s) or a job label to wait for")
+
+    def _finished(tr, tr_state):
+        if not json:
+            click.echo(f"{tr['transaction_id']:<40}{tr_state[0]}")
+
+    try:
+        response = wait_for_transactions(
+            transaction_ids=transaction_ids,
+            job_label=job_label,
+            user=user,
+            group=group,
+            groupall=groupall,
+            timeout=timeout,
+            callback=_finished,
+            hook=hook,
+        )
+    except ConnectionError as ce:
+        raise click.UsageError(ce)
+    except AuthenticationError as ae:
+        raise click.UsageError(ae)
+    except RequestError as re:
+        raise click.UsageError(re)
+
+    if json:
+        click.echo(json_dumps(response))
+    if not response["success"]:
+        # the message names any transactions that were not found
+        fail_string = response["msg"]
+        failed = [
+            tid
+            for tid, t in response["transactions"].items()
+            if t["state"] in ("FAILED", "COMPLETE_WITH_ERRORS")
+        ]
+        if failed:
+            fail_string += "\nFailed: " + ", ".join(failed)
+        raise click.UsageError(fail_string)
+
+
+"""Retry (failed files) command"""
+
+
+@timings.timed("render")
+def print_retry(response: dict, dry_run: bool):
+    click.echo(response["msg"])
+    for filepath, reason in response["dropped"].items():
+        click.echo(f"{'':<4}dropped {filepath} : {reason}")
+    if dry_run:
+        for r in response["retry"]:
+            for filepath in r["filelist"]:
+                click.echo(f"{'':<4}{r['action']} {filepath}")
+    for r in response["responses"]:
+        print_response(r)
+
+
+@nlds_client.command(
+    "retry",
+    help="Resubmit the files that failed in transactions, given by their "
+    "transaction ids or job labels.  Files that failed for a reason that a retry "
+    f"will not fix, e.g. they do not exist, are dropped.{user_help_text}",
+)
+@click.option(
+    "-u",
+    "--user",
+    default=None,
+    type=str,
+    help="The username to retry transactions for.",
+)
+@click.option(
+    "-g",
+    "--group",
+    default=None,
+    type=str,
+    help="The group to retry transactions for.",
+)
+@click.option(
+    "-A",
+    "--groupall",
+    default=False,
+    is_flag=True,
+    help="Retry transactions that belong to a group, rather than a single user",
+)
+@click.option(
+    "-b",
+    "--job_label",
+    default=None,
+    type=str,
+    help="The job label of the resubmitted transactions.  Default is the job label "
+    "of the first transaction retried, followed by -retry.",
+)
+@click.option(
+    "-r",
+    "--target",
+    default=None,
+    type=click.Path(exists=True),
+    help="The target path for files that are retrieved again.  Default is to "
+    "retrieve files to their original path.",
+)
+@click.option(
+    "--chunk_files",
+    default=None,
+    type=int,
+    help="Resubmit the files in transactions of at most this many files.",
+)
+@click.option(
+    "--workers",
+    default=None,
+    type=int,
+    help="The number of transactions to submit at the same time.",
+)
+@click.option(
+    "-n",
+    "--dry_run",
+    default=False,
+    is_flag=True,
+    help="List the files that would be resubmitted, without resubmitting them.",
+)
+@click.option(
+    "-j", "--json", default=False, is_flag=True, help="Output the result as JSON."
+)
+@click.argument("transactions", type=str, nargs=-1, required=True)
+def retry(
+    user,
+    group,
+    groupall,
+    job_label,
+    target,
+    chunk_files,
+    workers,
+    dry_run,
+    json,
+    transactions,
+):
+    from nlds_client.clientlib.retry import retry_failed_files, is_transaction_id
+
+    transaction_ids = [t for t in transactions if is_transaction_id(t)]
+    job_labels = [t for t in transactions if not is_transaction_id(t)]
+    try:
+        response = retry_failed_files(
+            transaction_ids=transaction_ids,
+            job_labels=job_labels,
+            user=user,
+            group=group,
+            groupall=groupall,
+            job_label=job_label,
+            target=target,
+            chunk_files=chunk_files,
+            workers=workers,
+            dry_run=dry_run,
+        )
+    except UsageError as ue:
+        raise click.UsageError(ue)
+    except ConnectionError as ce:
+        raise click.UsageError(ce)
+    except AuthenticationError as ae:
+        raise click.UsageError(ae)
+    except RequestError as re:
+        raise click.UsageError(re)
+
+    if json:
+        click.echo(json_dumps(response))
+    else:
+        print_retry(response, dry_run)
 
 
 """Find (files) command"""
@@ -1415,6 +2471,35 @@ def stat(
     default=True,
     help="Switch between ascending and descending time order.",
 )
+@click.option(
+    "-P",
+    "--page_size",
+    default=None,
+    type=int,
+    help="Request the files from the server this many at a time, rather than all "
+    "at once.  Cannot be used with --json.",
+)
+@click.option(
+    "--no_cache",
+    default=False,
+    is_flag=True,
+    help="Do not use the query cache, even if it is enabled in the config.",
+)
+@click.option(
+    "--refresh",
+    default=False,
+    is_flag=True,
+    help="Request the files from the server, even if they are in the query "
+    "cache, and update the cache.",
+)
+@click.option(
+    "-o",
+    "--offline",
+    default=False,
+    is_flag=True,
+    help="Search the local mirror of the catalog, made by `nlds sync-catalog`, "
+    "rather than the server.",
+)
 def find(
     user,
     group,
@@ -1430,9 +2515,84 @@ def find(
     regex,
     limit,
     time,
+    page_size,
+    no_cache,
+    refresh,
+    offline,
 ):
+    from nlds_client.clientlib.transactions import (
+        find_file,
+        stream_find_file,
+        iter_find_files,
+    )
+    if page_size is not None and json:
+        raise click.UsageError("--page_size cannot be used with --json")
+    cache = False if no_cache else None
     try:
-        response = find_file(
+        if offline:
+            from nlds_client.clientlib.mirror import find_offline, files_to_response
+
+            files = find_offline(
+                user,
+                group,
+                groupall=groupall,
+                label=label,
+                holding_id=holding_id,
+                transaction_id=transaction_id,
+                path=path,
+                tag=tag,
+                regex=regex,
+                limit=limit,
+                descending=time,
+            )
+            if json:
+                click.echo(json_dumps(files_to_response(files)))
+            else:
+                req_details = format_request_details(
+                    user,
+                    group,
+                    groupall=groupall,
+                    label=label,
+                    holding_id=holding_id,
+                    tag=tag,
+                    transaction_id=transaction_id,
+                )
+                print_find_records(files, req_details, simple, url)
+            return
+        if page_size is None and not json:
+            page_size = get_option(load_config(), "catalog_page_size")
+        if page_size and not json:
+            req_details = format_request_details(
+                user,
+                group,
+                groupall=groupall,
+                label=label,
+                holding_id=holding_id,
+                tag=tag,
+                transaction_id=transaction_id,
+            )
+            files = iter_find_files(
+                user,
+                group,
+                groupall=groupall,
+                label=label,
+                holding_id=holding_id,
+                transaction_id=transaction_id,
+                path=path,
+                tag=tag,
+                regex=regex,
+                limit=limit,
+                descending=time,
+                page_size=page_size,
+                cache=cache,
+                refresh=refresh,
+            )
+            print_find_records(files, req_details, simple, url)
+            return
+        # the JSON output needs the whole response, otherwise the files are
+        # printed as they are decoded from the response
+        find_method = find_file if json else stream_find_file
+        response = find_method(
             user,
             group,
             groupall=groupall,
@@ -1444,6 +2604,8 @@ def find(
             regex=regex,
             limit=limit,
             descending=time,
+            cache=cache,
+            refresh=refresh,
         )
         req_details = format_request_details(
             user,
@@ -1454,12 +2616,14 @@ def find(
             tag=tag,
             transaction_id=transaction_id,
         )
-        if response["success"]:
-            if json:
+        if json:
+            if response["success"]:
                 click.echo(json_dumps(response))
-            else:
-                print_find(response, req_details, simple, url)
         else:
+            head, files, response = _open_stream(response)
+            if response["success"]:
+                print_find_records(chain(head, files), req_details, simple, url)
+        if not response["success"]:
             fail_string = "Failed to list files with "
             fail_string += req_details
             if response["details"]["failure"]:
@@ -1472,6 +2636,78 @@ def find(
         raise click.UsageError(ae)
     except RequestError as re:
         raise click.UsageError(re)
+    except ServerError as se:
+        raise click.UsageError(se)
+
+
+"""Sync catalog command"""
+
+
+@nlds_client.command(
+    "sync-catalog",
+    help="Update the local mirror of the catalog, used by `nlds find --offline`."
+    f"{user_help_text}",
+)
+@click.option(
+    "-u", "--user", default=None, type=str, help="The username to mirror holdings for."
+)
+@click.option(
+    "-g", "--group", default=None, type=str, help="The group to mirror holdings for."
+)
+@click.option(
+    "-A",
+    "--groupall",
+    default=False,
+    is_flag=True,
+    help="Mirror holdings that belong to a group, rather than a single user",
+)
+@click.option(
+    "-F",
+    "--full",
+    default=False,
+    is_flag=True,
+    help="Fetch every holding, rather than only the holdings created since the last "
+    "sync.  Use this to pick up files added to existing holdings, and to remove "
+    "deleted holdings from the mirror.",
+)
+@click.option(
+    "-P",
+    "--page_size",
+    default=None,
+    type=int,
+    help="Request the holdings from the server this many at a time.",
+)
+@click.option(
+    "-j", "--json", default=False, is_flag=True, help="Output the result as JSON."
+)
+def sync_catalog(user, group, groupall, full, page_size, json):
+    from nlds_client.clientlib.mirror import sync_catalog as sync_mirror
+
+    def _progress(holding, n_files):
+        if not json:
+            click.echo(f"{'':<4}{holding['id']:<6}{holding['label']:<32}{n_files} files")
+
+    try:
+        response = sync_mirror(
+            user,
+            group,
+            groupall=groupall,
+            full=full,
+            page_size=page_size,
+            progress=_progress,
+        )
+        if json:
+            click.echo(json_dumps(response))
+        else:
+            click.echo(response["msg"])
+    except ConnectionError as ce:
+        raise click.UsageError(ce)
+    except AuthenticationError as ae:
+        raise click.UsageError(ae)
+    except RequestError as re:
+        raise click.UsageError(re)
+    except ServerError as se:
+        raise click.UsageError(se)
 
 
 """Meta command"""
@@ -1539,6 +2775,7 @@ def find(
     help="Output the result as JSON.",
 )
 def meta(user, group, label, holding_id, tag, new_label, new_tag, del_tag, json):
+    from nlds_client.clientlib.transactions import change_metadata
     #
     try:
         req_details = format_request_details(
@@ -1598,6 +2835,7 @@ def meta(user, group, label, holding_id, tag, new_label, new_tag, del_tag, json)
     " for the staging/test version of the NLDS.",
 )
 def init(url: str = None, user: str = None, group: str = None, insecure: bool = False):
+    from nlds_client.clientlib.transactions import init_client
     click.echo(click.style("\nInitialising the Near-line Data Store...", fg="yellow"))
     try:
         response = init_client(url, user, group, verify_certificates=(not insecure))
@@ -1639,6 +2877,7 @@ def init(url: str = None, user: str = None, group: str = None, insecure: bool =
     ),
 )
 def renew():
+    from nlds_client.clientlib.transactions import renew_keys
     click.echo(
         click.style(
             "Renewing access tokens and object storage keys for the "
@@ -0,0 +1,42 @@
+import importlib.util
+import os
+import threading
+
+import pytest
+
+from nlds_client.clientlib import config
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+
+
+def _load_benchmark(name):
+    spec = importlib.util.spec_from_file_location(
+        f"benchmark_{name}", os.path.join(BENCHMARKS, f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def start_stand_in(tmp_path, monkeypatch):
+    """Run the benchmarks' stand-in server, with the given sizes, and point the
+    config at it."""
+    servers = []
+
+    def _start(**sizes):
+        server = _load_benchmark("server").StandInServer(("127.0.0.1", 0), **sizes)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        _load_benchmark("client").write_home(str(tmp_path), server.url)
+        monkeypatch.setattr(
+            config, "CONFIG_FILE_LOCATION", str(tmp_path / ".nlds-config")
+        )
+        config.invalidate_config_cache()
+        return server
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    config.invalidate_config_cache()
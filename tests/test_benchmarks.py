@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+
+
+def test_client_benchmarks_smoke(tmp_path):
+    # run the benchmarks with small sizes against the stand-in server
+    output = tmp_path / "results.json"
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.join(BENCHMARKS, "client.py"),
+            "--quick",
+            "--runs",
+            "1",
+            "--output",
+            str(output),
+        ],
+        capture_output=True,
+        check=True,
+        timeout=120,
+    )
+    results = json.loads(output.read_text())["results"]
+    assert sorted(results) == [
+        "find_fetch",
+        "get_transaction_state",
+        "main_loop",
+        "print_find",
+        "putlist",
+        "stat_fetch",
+    ]
+    assert all(r["rate"] > 0 for r in results.values())
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import nlds_client.clientlib.cache as clcache
+import nlds_client.clientlib.transactions as cltr
+from nlds_client.clientlib.exceptions import ConnectionError
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        "options": {
+            "query_cache": True,
+            "query_cache_file": str(tmp_path / "cache.sqlite"),
+            "query_cache_ttl": 300,
+            "query_cache_max_bytes": 1000,
+        }
+    }
+
+
+def test_store_and_lookup(config):
+    params = {"user": "u", "group": "g", "groupall": False}
+    clcache.store_query(config, "url", params, '{"data": 1}')
+    # the order of the parameters does not change the key
+    params = {"groupall": False, "group": "g", "user": "u"}
+    assert clcache.lookup_query(config, "url", params) == '{"data": 1}'
+    assert clcache.lookup_query(config, "url", {"user": "v"}) is None
+    assert clcache.lookup_query(config, "url", params, max_age=-1) is None
+
+
+def test_eviction(config):
+    for i in range(5):
+        clcache.store_query(config, "url", {"i": i}, "x" * 300)
+    # only the most recently used responses fit in 1000 bytes
+    present = [
+        i for i in range(5) if clcache.lookup_query(config, "url", {"i": i})
+    ]
+    assert present == [2, 3, 4]
+    # a response larger than the cache is not stored
+    clcache.store_query(config, "url", {"i": 5}, "x" * 2000)
+    assert clcache.lookup_query(config, "url", {"i": 5}) is None
+
+
+def test_text_recorder():
+    recorder = clcache.TextRecorder(5)
+    assert "".join(recorder.record(["ab", "cd"])) == "abcd"
+    assert recorder.text == "abcd"
+    recorder = clcache.TextRecorder(3)
+    assert "".join(recorder.record(["ab", "cd"])) == "abcd"
+    assert recorder.text is None
+
+
+def test_cached_main_loop(config, monkeypatch):
+    monkeypatch.setattr(cltr, "load_config", lambda: config)
+    calls = []
+
+    def _main_loop(url, input_params, method):
+        calls.append(url)
+        return {"data": {"holdings": {}}, "details": {}, "success": True}
+
+    monkeypatch.setattr(cltr, "main_loop", _main_loop)
+    first = cltr.cached_main_loop("url", {"user": "u"})
+    second = cltr.cached_main_loop("url", {"user": "u"})
+    assert first == second
+    assert len(calls) == 1
+    cltr.cached_main_loop("url", {"user": "u"}, refresh=True)
+    assert len(calls) == 2
+    cltr.cached_main_loop("url", {"user": "u"}, cache=False)
+    assert len(calls) == 3
+
+    # a stale response is returned if the server cannot be reached
+    def _unreachable(url, input_params, method):
+        raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(cltr, "main_loop", _unreachable)
+    config["options"]["query_cache_ttl"] = -1
+    assert cltr.cached_main_loop("url", {"user": "u"}) == first
+    with pytest.raises(ConnectionError):
+        cltr.cached_main_loop("url", {"user": "v"})
+
+
+def test_cached_main_loop_stream(config, monkeypatch):
+    monkeypatch.setattr(cltr, "load_config", lambda: config)
+    calls = []
+    text = json.dumps({"data": {"holdings": {"a": {"id": 1}}}, "details": {}})
+
+    def _main_loop_stream(url, path, input_params, transform, text_filter, on_close):
+        calls.append(url)
+        stream = cltr.JSONItemStream(
+            text_filter(iter([text])), path, transform, lambda: on_close(stream)
+        )
+        stream.root["success"] = True
+        return stream
+
+    monkeypatch.setattr(cltr, "main_loop_stream", _main_loop_stream)
+    path = ("data", "holdings", "*")
+    assert list(cltr.cached_main_loop_stream("url", path, {})) == [{"id": 1}]
+    assert list(cltr.cached_main_loop_stream("url", path, {})) == [{"id": 1}]
+    assert len(calls) == 1
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+from click.testing import CliRunner
+
+import nlds_client.clientlib.submission as clsub
+from nlds_client.nlds_client import nlds_client
+from nlds_client.clientlib.exceptions import UsageError
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {"options": {"checkpoint_dir": str(tmp_path / "checkpoints")}}
+
+
+def _chunks(n=5, prefix="/f"):
+    return [[f"{prefix}{i}a", f"{prefix}{i}b"] for i in range(n)]
+
+
+def _submitter(fail_at=None, error_at=None):
+    """A submit function that records the chunks submitted, failing the chunk
+    containing fail_at and raising an exception for the chunk containing error_at."""
+    submitted = []
+
+    def _submit(chunk, transaction_id):
+        if error_at in chunk:
+            raise ConnectionError("connection dropped")
+        submitted.append(chunk[0])
+        return {"msg": "ok", "success": fail_at not in chunk}
+
+    return _submit, submitted
+
+
+def _run(config, submit, chunks, resume=False, header=None):
+    return clsub.submit_resumable(
+        config, "put", "job", header or {"label": "h"}, submit, chunks, resume=resume
+    )
+
+
+def test_resume_after_interruption(config, monkeypatch):
+    monkeypatch.setattr(clsub, "_transaction_exists", lambda *args: False)
+    submit, submitted = _submitter(error_at="/f2a")
+    with pytest.raises(ConnectionError):
+        _run(config, submit, _chunks())
+    assert submitted == ["/f0a", "/f1a"]
+
+    submit, submitted = _submitter()
+    response = _run(config, submit, _chunks(), resume=True)
+    assert submitted == ["/f2a", "/f3a", "/f4a"]
+    assert response["success"]
+    assert len(response["transaction_ids"]) == 5
+    assert [r.get("resumed", False) for r in response["responses"]] == [
+        True, True, False, False, False
+    ]
+    # the checkpoint is removed once every chunk is accepted
+    assert os.listdir(config["options"]["checkpoint_dir"]) == []
+
+
+def test_resume_after_failed_chunk(config):
+    submit, submitted = _submitter(fail_at="/f1a")
+    response = _run(config, submit, _chunks(3))
+    assert not response["success"]
+    assert os.path.exists(response["checkpoint"])
+
+    submit, submitted = _submitter()
+    response = _run(config, submit, _chunks(3), resume=True)
+    assert submitted == ["/f1a"]
+    assert response["success"]
+
+
+def test_resume_unacknowledged_chunk(config, monkeypatch):
+    # the chunk was sent, and the server has it, but the acknowledgement was lost
+    submit, submitted = _submitter(error_at="/f1a")
+    with pytest.raises(ConnectionError):
+        _run(config, submit, _chunks(3))
+    looked_up = []
+    monkeypatch.setattr(
+        clsub, "_transaction_exists", lambda *args: looked_up.append(args[3]) or True
+    )
+    submit, submitted = _submitter()
+    response = _run(config, submit, _chunks(3), resume=True)
+    assert submitted == ["/f2a"]
+    assert len(looked_up) == 1
+    assert response["transaction_ids"][1] == looked_up[0]
+
+
+def test_resume_checks_job(config):
+    submit, _ = _submitter(fail_at="/f1a")
+    _run(config, submit, _chunks(3))
+    with pytest.raises(UsageError, match="label"):
+        _run(config, submit, _chunks(3), resume=True, header={"label": "other"})
+    with pytest.raises(UsageError, match="filelist has changed"):
+        _run(config, submit, _chunks(3, prefix="/g"), resume=True)
+
+
+def test_resume_needs_checkpoint(config):
+    # e.g. the job was submitted in full, or the job label is mistyped
+    submit, submitted = _submitter()
+    with pytest.raises(UsageError, match="No checkpoint for job job"):
+        _run(config, submit, _chunks(3), resume=True)
+    assert submitted == []
+
+
+def test_resume_needs_chunks():
+    with pytest.raises(UsageError):
+        clsub._check_resume(True, "job", None)
+    with pytest.raises(UsageError):
+        clsub._check_resume(True, None, 10)
+    clsub._check_resume(False, None, None)
+
+
+def test_putlist_shows_job_label_when_interrupted(config, tmp_path, monkeypatch):
+    filelist = tmp_path / "filelist"
+    filelist.write_text("".join(f"/f{i}\n" for i in range(4)))
+
+    def _put_filelist(chunk, *args):
+        if "/f2" in chunk:
+            raise ConnectionError("connection dropped")
+        return {"msg": "ok", "success": True}
+
+    monkeypatch.setattr(clsub, "load_config", lambda: config)
+    monkeypatch.setattr(clsub, "put_filelist", _put_filelist)
+    result = CliRunner().invoke(
+        nlds_client,
+        ["putlist", str(filelist), "-u", "user", "-g", "group", "--chunk_files", "2"],
+    )
+    assert result.exit_code != 0
+    # the job label was created by the client, so the user must be told it to resume
+    checkpoints = os.listdir(config["options"]["checkpoint_dir"])
+    assert len(checkpoints) == 1
+    assert "--resume -b " in result.output
+    job_label = result.output.split("--resume -b ")[1].split(".")[0]
+    assert job_label in checkpoints[0]
@@ -0,0 +1,35 @@
+import json
+import os
+
+import pytest
+
+import nlds_client.clientlib.config as clcnf
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    template_filename = os.path.join(
+        os.path.dirname(__file__), "../nlds_client/templates/nlds-config.j2"
+    )
+    with open(template_filename) as fh:
+        template = json.load(fh)
+    path = tmp_path / "nlds-config"
+    path.write_text(json.dumps(template))
+    monkeypatch.setattr(clcnf, "CONFIG_FILE_LOCATION", str(path))
+    clcnf.invalidate_config_cache()
+    yield path
+    clcnf.invalidate_config_cache()
+
+
+def test_load_config_cached(config_file, monkeypatch):
+    config = clcnf.load_config()
+    # modifying the returned config does not modify the cached one
+    config["server"]["url"] = "changed"
+    monkeypatch.setattr(clcnf, "validate_config_file", None)
+    assert clcnf.load_config()["server"]["url"] != "changed"
+
+
+def test_load_config_reloads_when_written(config_file):
+    config = clcnf.load_config()
+    clcnf.write_os_section(config, {"access_key": "a_new_access_key"})
+    assert clcnf.load_config()["object_storage"]["access_key"] == "a_new_access_key"
@@ -0,0 +1,22 @@
+import io
+
+import pytest
+
+from nlds_client.clientlib.filelist import open_filelist, iter_filelist
+
+
+def test_iter_filelist_skips_empty_lines():
+    # consecutive empty lines were skipped incorrectly by the old putlist
+    fh = io.StringIO("  /a/b  \n\n\n/c/d\n   \n/e/f")
+    assert [fp for fp in iter_filelist(fh)] == ["/a/b", "/c/d", "/e/f"]
+    assert not fh.closed
+
+
+def test_open_filelist(tmp_path, monkeypatch):
+    path = tmp_path / "list.txt"
+    path.write_text("/a\n/b\n")
+    assert [fp for fp in open_filelist(str(path))] == ["/a", "/b"]
+    monkeypatch.setattr("sys.stdin", io.StringIO("/c\n"))
+    assert [fp for fp in open_filelist("-")] == ["/c"]
+    with pytest.raises(FileNotFoundError):
+        open_filelist(str(tmp_path / "missing.txt"))
@@ -0,0 +1,65 @@
+import pytest
+
+from nlds_client.clientlib import hooks, config
+from nlds_client.clientlib.exceptions import UsageError
+
+
+@pytest.fixture(autouse=True)
+def clear_hooks():
+    yield
+    hooks.clear()
+
+
+def test_register_and_emit():
+    events = []
+    assert not hooks.active("retry")
+    # nothing is called when no hook is registered
+    hooks.emit("retry", url="u")
+    hooks.register("retry", events.append)
+    assert hooks.active("retry")
+    hooks.emit("retry", url="u")
+    assert events == [{"event": "retry", "url": "u"}]
+    hooks.unregister("retry", events.append)
+    assert not hooks.active("retry")
+    with pytest.raises(UsageError):
+        hooks.register("no_such_event", events.append)
+
+
+@pytest.fixture
+def stand_in(start_stand_in):
+    return start_stand_in(find_files=10)
+
+
+def test_request_hooks(stand_in):
+    from nlds_client.clientlib.transactions import (
+        construct_server_url,
+        main_loop,
+        stream_find_file,
+    )
+
+    events = []
+    for event in hooks.EVENTS:
+        hooks.register(event, events.append)
+    url = construct_server_url(config.load_config(), "catalog/list")
+    assert main_loop(url, {"user": "bench", "group": "bench"})["success"]
+    # the token had expired, so was refreshed before the request
+    assert [e["event"] for e in events] == [
+        "token_refresh",
+        "request_start",
+        "request_end",
+        "decode",
+    ]
+    refresh, _, end, decode = events
+    assert refresh["grant_type"] == "refresh_token"
+    assert refresh["status_code"] == 200
+    assert end["status_code"] == 200 and end["url"] == url
+    assert end["bytes_received"] > 0 and end["elapsed"] >= 0
+    assert decode["bytes_received"] == end["bytes_received"]
+    assert not decode["streamed"]
+
+    events.clear()
+    files = [f for f in stream_find_file("bench", "bench")]
+    assert len(files) == 10
+    assert [e["event"] for e in events] == ["request_start", "request_end", "decode"]
+    assert events[1]["bytes_received"] is None
+    assert events[2]["streamed"] and events[2]["bytes_received"] > 0
@@ -0,0 +1,55 @@
+import hashlib
+import json
+
+from nlds_client.clientlib.journal import (
+    FilelistDigest,
+    record_transaction,
+    read_journal,
+)
+
+
+def _config(tmp_path, **options):
+    options.setdefault("journal_file", str(tmp_path / "journal.jsonl"))
+    return {"options": options}
+
+
+def _record(config, transaction_id, user="u", group="g", n_files=2):
+    digest = FilelistDigest()
+    files = [fp for fp in digest.wrap(f"/f{i}" for i in range(n_files))]
+    record_transaction(config, transaction_id, "job", "putlist", user, group, digest)
+    return files
+
+
+def test_filelist_digest():
+    digest = FilelistDigest()
+    assert [fp for fp in digest.wrap(iter(["/a", "/b"]))] == ["/a", "/b"]
+    assert digest.n_files == 2
+    assert digest.hexdigest == hashlib.sha256(b"/a\n/b\n").hexdigest()
+
+
+def test_record_and_read_journal(tmp_path):
+    config = _config(tmp_path)
+    assert read_journal(config) == []
+    _record(config, "t1")
+    _record(config, "t2", user="other")
+    _record(config, "t3", n_files=5)
+    # a partly written line is skipped
+    with open(tmp_path / "journal.jsonl", "a") as fh:
+        fh.write('{"transaction_id": "t4"')
+    entries = read_journal(config, user="u")
+    assert [e["transaction_id"] for e in entries] == ["t3", "t1"]
+    assert entries[0]["n_files"] == 5
+    assert entries[0]["job_label"] == "job"
+    assert [e["transaction_id"] for e in read_journal(config, limit=2)] == ["t3", "t2"]
+
+
+def test_journal_is_compacted(tmp_path):
+    config = _config(tmp_path, journal_max_bytes=2000)
+    for i in range(50):
+        _record(config, f"t{i}")
+    assert (tmp_path / "journal.jsonl").stat().st_size <= 2000
+    entries = read_journal(config)
+    assert entries[0]["transaction_id"] == "t49"
+    assert 0 < len(entries) < 50
+    with open(tmp_path / "journal.jsonl") as fh:
+        assert all(json.loads(line) for line in fh)
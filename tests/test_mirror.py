@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+import nlds_client.clientlib.mirror as clmirror
+from nlds_client.clientlib.streaming import JSONItemStream
+from nlds_client.clientlib.transactions import _find_file_transform
+
+
+def _holding(id, label, transactions, tags=None):
+    return {
+        "id": id,
+        "label": label,
+        "user": "u",
+        "group": "g",
+        "date": f"2024-01-0{id}T00:00:00",
+        "transactions": transactions,
+        "tags": tags or {},
+    }
+
+
+class FakeServer:
+    def __init__(self):
+        self.holdings = []
+        self.files = {}
+        self.find_calls = []
+
+    def add(self, holding, files):
+        self.holdings.append(holding)
+        self.files[holding["id"]] = files
+
+    def _stream(self, document, path, transform=None):
+        stream = JSONItemStream([json.dumps(document)], path, transform)
+        stream.root["success"] = True
+        return stream
+
+    def stream_list_holding(self, user, group, groupall, descending, cache):
+        holdings = sorted(self.holdings, key=lambda h: h["id"], reverse=descending)
+        document = {"data": {"holdings": {h["label"]: h for h in holdings}}}
+        return self._stream(document, ("data", "holdings", "*"))
+
+    def stream_find_file(self, user, group, groupall, holding_id, cache):
+        self.find_calls.append(holding_id)
+        h = [h for h in self.holdings if h["id"] == holding_id][0]
+        transactions = {}
+        for tid, path in self.files[holding_id]:
+            # as on the server, the transactions are keyed by their id, which is not
+            # repeated in the transaction, and can share an ingest time
+            t = transactions.setdefault(tid, {"ingest_time": h["date"], "filelist": []})
+            t["filelist"].append({"original_path": path, "size": 1})
+        document = {
+            "data": {
+                "holdings": {
+                    h["label"]: {
+                        "holding_id": holding_id,
+                        "label": h["label"],
+                        "transactions": transactions,
+                    }
+                }
+            }
+        }
+        return self._stream(
+            document,
+            ("data", "holdings", "*", "transactions", "*", "filelist", "*"),
+            _find_file_transform,
+        )
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    config = {
+        "server": {"url": "http://nlds", "api": "api/v1"},
+        "user": {"default_user": "u", "default_group": "g"},
+        "options": {"catalog_mirror_file": str(tmp_path / "mirror.sqlite")},
+    }
+    server = FakeServer()
+    monkeypatch.setattr(clmirror, "load_config", lambda: config)
+    monkeypatch.setattr(clmirror, "stream_list_holding", server.stream_list_holding)
+    monkeypatch.setattr(clmirror, "stream_find_file", server.stream_find_file)
+    return server
+
+
+def test_sync_incremental(server):
+    server.add(_holding(1, "one", ["t1"], {"key": "val"}), [("t1", "/a/x.nc")])
+    server.add(_holding(2, "two", ["t2"]), [("t2", "/a/y.nc"), ("t2", "/b/z.txt")])
+    response = clmirror.sync_catalog()
+    assert response["holdings_added"] == 2
+    assert response["files"] == 3
+
+    # only the new holding is fetched, the walk stops at holding 2
+    server.add(_holding(3, "three", ["t3"]), [("t3", "/c/w.nc")])
+    server.find_calls.clear()
+    response = clmirror.sync_catalog()
+    assert server.find_calls == [3]
+    assert response["holdings_added"] == 1
+
+    # a full sync removes deleted holdings and refetches changed holdings
+    server.holdings = [h for h in server.holdings if h["id"] != 2]
+    server.holdings[0]["transactions"].append("t1b")
+    server.files[1].append(("t1b", "/a/v.nc"))
+    server.find_calls.clear()
+    response = clmirror.sync_catalog(full=True)
+    assert server.find_calls == [1]
+    assert response["holdings_removed"] == 1
+    assert response["holdings_updated"] == 1
+
+
+def test_find_offline(server):
+    server.add(_holding(1, "one", ["t1"], {"key": "val"}), [("t1", "/a/x.nc")])
+    server.add(_holding(2, "two", ["t2"]), [("t2", "/a/y.nc"), ("t2", "/b/z.txt")])
+    clmirror.sync_catalog()
+
+    def paths(**kwargs):
+        return [f["original_path"] for _, _, f in clmirror.find_offline(**kwargs)]
+
+    assert paths() == ["/a/x.nc", "/a/y.nc", "/b/z.txt"]
+    assert paths(path="/a/") == ["/a/x.nc", "/a/y.nc"]
+    assert paths(path="*.nc", descending=True) == ["/a/y.nc", "/a/x.nc"]
+    assert paths(path=r"z\.txt$", regex=True) == ["/b/z.txt"]
+    assert paths(tag={"key": "val"}) == ["/a/x.nc"]
+    assert paths(label="two", limit=1) == ["/a/y.nc"]
+    assert paths(holding_id=1, transaction_id="t1") == ["/a/x.nc"]
+
+    # transactions ingested into a holding at the same time are kept apart
+    server.add(
+        _holding(3, "three", ["t3a", "t3b"]), [("t3a", "/c/u.nc"), ("t3b", "/c/v.nc")]
+    )
+    clmirror.sync_catalog()
+    assert paths(transaction_id="t3a") == ["/c/u.nc"]
+    assert paths(transaction_id="t3b") == ["/c/v.nc"]
+
+    response = clmirror.files_to_response(clmirror.find_offline(label="two"))
+    filelist = response["data"]["holdings"]["two"]["transactions"]["t2"]["filelist"]
+    assert len(filelist) == 2
@@ -0,0 +1,204 @@
+import pytest
+
+from nlds_client.clientlib.monitor import watch_transactions
+import nlds_client.clientlib.monitor as monitor
+
+
+def _record(idd, *states):
+    return {
+        "id": idd,
+        "transaction_id": f"t{idd}",
+        "creation_time": "2024-01-01T00:00:00",
+        "sub_records": [
+            {"id": i, "state": s, "last_updated": f"2024-01-01T00:00:0{i}"}
+            for i, s in enumerate(states)
+        ],
+    }
+
+
+def _watch(polls, **kwargs):
+    """Watch a sequence of polls, returning the ids of the changed records in each
+    poll and the intervals slept for."""
+    polls = iter(polls)
+    sleeps = []
+    changed = [
+        [(tr["id"], state[0]) for tr, state in c]
+        for c in watch_transactions(lambda: next(polls), sleep=sleeps.append, **kwargs)
+    ]
+    return changed, sleeps
+
+
+def test_watch_only_changed_records(monkeypatch):
+    polls = [
+        [_record(1, "ROUTING"), _record(2, "COMPLETE")],
+        [_record(1, "ROUTING"), _record(2, "COMPLETE")],
+        [_record(1, "COMPLETE", "FAILED"), _record(2, "COMPLETE")],
+    ]
+    calls = []
+    get_state = monitor.get_transaction_state
+    monkeypatch.setattr(
+        monitor,
+        "get_transaction_state",
+        lambda tr: calls.append(tr["id"]) or get_state(tr),
+    )
+    changed, sleeps = _watch(polls, min_interval=1, max_interval=10, backoff=2)
+    assert changed == [[(1, "ROUTING"), (2, "COMPLETE")], [(1, "COMPLETE_WITH_ERRORS")]]
+    # the state of an unchanged record is not recomputed
+    assert calls == [1, 2, 1]
+    # backs off while nothing changes
+    assert sleeps == [1, 2]
+
+
+def test_watch_interval_limits():
+    polls = [[_record(1, "ROUTING")]] * 6 + [[_record(1, "COMPLETE")]]
+    changed, sleeps = _watch(polls, min_interval=1, max_interval=5, backoff=2)
+    assert sleeps == [1, 2, 4, 5, 5, 5]
+    assert changed[-1] == [(1, "COMPLETE")]
+
+
+@pytest.mark.parametrize("records", [[], [_record(1, "FAILED")]])
+def test_watch_stops(records):
+    changed, sleeps = _watch([records])
+    assert sleeps == []
+    assert len(changed) == len(records)
+
+
+def _wait_record(transaction_id, *states, job_label="job"):
+    tr = _record(int(transaction_id[1:]), *states)
+    tr["transaction_id"] = transaction_id
+    tr["job_label"] = job_label
+    return tr
+
+
+def _patch_status(monkeypatch, polls):
+    """Replace the status query with one that returns the next poll's records for
+    the batched query, and records how many queries were made."""
+    polls = iter(polls)
+    queries = []
+
+    def _stream(user, group, groupall, transaction_id=None, **kwargs):
+        queries.append(transaction_id)
+        if transaction_id is None:
+            return next(polls)
+        return []
+
+    monkeypatch.setattr(monitor, "stream_monitor_transactions", _stream)
+    monkeypatch.setattr(monitor, "load_config", lambda: {})
+    return queries
+
+
+def test_wait_for_transactions(monkeypatch):
+    polls = [
+        [_wait_record("t1", "ROUTING"), _wait_record("t2", "ROUTING")],
+        [_wait_record("t1", "COMPLETE"), _wait_record("t2", "ROUTING")],
+        [
+            _wait_record("t1", "COMPLETE"),
+            _wait_record("t2", "FAILED"),
+            _wait_record("t3", "ROUTING"),
+        ],
+    ]
+    queries = _patch_status(monkeypatch, polls)
+    finished = []
+    response = monitor.wait_for_transactions(
+        ["t1", "t2"],
+        callback=lambda tr, state: finished.append((tr["transaction_id"], state[0])),
+        sleep=lambda s: None,
+    )
+    # one batched query per poll
+    assert queries == [None, None, None]
+    assert finished == [("t1", "COMPLETE"), ("t2", "FAILED")]
+    assert not response["success"]
+    assert not response["timed_out"]
+    assert set(response["transactions"]) == {"t1", "t2"}
+
+
+def test_wait_for_transactions_timeout(monkeypatch):
+    queries = _patch_status(monkeypatch, [[_wait_record("t1", "ROUTING")]] * 100)
+    response = monitor.wait_for_transactions(
+        ["t1", "t9"], timeout=0, sleep=lambda s: None
+    )
+    assert response["timed_out"]
+    assert response["missing"] == ["t9"]
+    # the missing transaction is requested on its own
+    assert queries == [None, "t9"]
+
+
+def test_wait_for_unknown_transaction(monkeypatch):
+    # t9 is never found, so it is given up on after MISSING_POLLS polls, once t1
+    # has finished
+    polls = [[_wait_record("t1", "ROUTING")]] * 5 + [[_wait_record("t1", "COMPLETE")]]
+    queries = _patch_status(monkeypatch, polls * 10)
+    response = monitor.wait_for_transactions(["t1", "t9"], sleep=lambda s: None)
+    assert not response["success"]
+    assert not response["timed_out"]
+    assert response["missing"] == ["t9"]
+    assert "t9" in response["msg"]
+    assert queries.count(None) == 6
+
+    # with only unknown transactions, it stops after MISSING_POLLS polls
+    queries = _patch_status(monkeypatch, [[]] * 100)
+    response = monitor.wait_for_transactions(["t8", "t9"], sleep=lambda s: None)
+    assert response["missing"] == ["t8", "t9"]
+    assert queries.count(None) == monitor.MISSING_POLLS
+
+
+def test_fetch_transaction_records_limits_query(monkeypatch):
+    queries = []
+
+    def _stream(user, group, groupall, transaction_id=None, **kwargs):
+        queries.append(dict(kwargs, transaction_id=transaction_id))
+        if transaction_id is None:
+            return [_wait_record("t1", "ROUTING"), _wait_record("t5", "ROUTING")]
+        return [_wait_record(transaction_id, "ROUTING")]
+
+    monkeypatch.setattr(monitor, "stream_monitor_transactions", _stream)
+    records = monitor.fetch_transaction_records(
+        "u", "g", False, ["t1", "t2", "t3"], finished={"t3"}
+    )
+    assert sorted(tr["transaction_id"] for tr in records) == ["t1", "t2"]
+    # only as many of the most recent transactions as were asked for, then the
+    # unfinished transaction that was not amongst them on its own
+    assert queries == [
+        {"transaction_id": None, "job_label": None, "limit": 3, "descending": True},
+        {"transaction_id": "t2"},
+    ]
+
+    queries.clear()
+    [tr for tr in monitor.fetch_transaction_records("u", "g", False, [], "job")]
+    assert queries == [{"transaction_id": None, "job_label": "job"}]
+
+
+def test_poller_queries_by_job_label(monkeypatch):
+    # t1 and t2 were submitted together, t3 on its own, and other transactions
+    # have been submitted since, so they are not amongst the most recent
+    jobs = {
+        "job": [_wait_record("t1", "ROUTING"), _wait_record("t2", "ROUTING")],
+        "other": [_wait_record("t3", "ROUTING", job_label="other")],
+    }
+    by_id = {tr["transaction_id"]: tr for trs in jobs.values() for tr in trs}
+    queries = []
+
+    def _stream(user, group, groupall, transaction_id=None, job_label=None, **kw):
+        queries.append(transaction_id or job_label)
+        if transaction_id is not None:
+            return [by_id[transaction_id]] if transaction_id in by_id else []
+        if job_label is not None:
+            return jobs[job_label]
+        return [_wait_record("t9", "ROUTING", job_label="new")]
+
+    monkeypatch.setattr(monitor, "stream_monitor_transactions", _stream)
+    poller = monitor.TransactionPoller("u", "g", False, ["t1", "t2", "t3", "t4"])
+    for _ in range(5):
+        records = [tr["transaction_id"] for tr in poller.poll()]
+        assert sorted(records) == ["t1", "t2", "t3"]
+    # the first poll looks for each transaction on its own, and then they are
+    # requested by job label, with the unknown t4 looked for until MISSING_POLLS
+    assert queries[:5] == [None, "t1", "t2", "t3", "t4"]
+    assert queries[5:9] == ["job", "other", None, "t4"]
+    assert queries[-4:] == ["job", "other", "job", "other"]
+    assert queries.count("t4") == monitor.MISSING_POLLS
+
+
+def test_wait_for_transactions_needs_ids():
+    with pytest.raises(monitor.UsageError):
+        monitor.wait_for_transactions()
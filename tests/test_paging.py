@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+import nlds_client.clientlib.transactions as cltr
+from nlds_client.nlds_client import nlds_client
+from nlds_client.clientlib.exceptions import ServerError
+from nlds_client.clientlib.streaming import JSONItemStream
+
+
+def _page(holdings):
+    text = json.dumps({"data": {"holdings": holdings}, "details": {}})
+    stream = JSONItemStream([text], ("data", "holdings", "*"))
+    stream.root["success"] = True
+    return stream
+
+
+def _pager(records, shift=None, ignore_offset=False):
+    calls = []
+
+    def _fetch_page(offset, limit):
+        calls.append((offset, limit))
+        if ignore_offset:
+            offset = 0
+        # optionally insert new records at the start after the first page
+        current = records if shift is None or len(calls) == 1 else shift + records
+        return _page(current[offset : offset + limit])
+
+    return _fetch_page, calls
+
+
+def test_iter_pages_fetches_all_pages():
+    records = [{"id": i} for i in range(5)]
+    fetch_page, calls = _pager(records)
+    assert list(cltr._iter_pages(fetch_page, 2, cltr._holding_key)) == records
+    assert calls == [(0, 2), (2, 2), (4, 2)]
+
+
+def test_iter_pages_limit():
+    records = [{"id": i} for i in range(5)]
+    fetch_page, calls = _pager(records)
+    assert list(cltr._iter_pages(fetch_page, 2, cltr._holding_key, limit=3)) == (
+        records[:3]
+    )
+    assert len(calls) == 2
+
+
+def test_iter_pages_skips_records_shifted_by_inserts():
+    records = [{"id": i} for i in range(4)]
+    fetch_page, _ = _pager(records, shift=[{"id": 10}])
+    ids = [r["id"] for r in cltr._iter_pages(fetch_page, 2, cltr._holding_key)]
+    assert ids == [0, 1, 2, 3]
+
+
+def test_iter_pages_server_ignores_offset():
+    records = [{"id": i} for i in range(4)]
+    fetch_page, _ = _pager(records, ignore_offset=True)
+    with pytest.raises(ServerError):
+        list(cltr._iter_pages(fetch_page, 2, cltr._holding_key))
+
+
+def test_find_and_list_pages(start_stand_in):
+    start_stand_in(holdings=23, find_files=25)
+    result = CliRunner().invoke(nlds_client, ["find", "--page_size", "10"])
+    assert result.exit_code == 0, result.output
+    paths = [line.split()[-1] for line in result.output.splitlines()[2:]]
+    assert paths == [f"/gws/bench/dir0/file{i}.nc" for i in range(25)]
+
+    result = CliRunner().invoke(nlds_client, ["list", "--page_size", "10"])
+    assert result.exit_code == 0, result.output
+    labels = [line.split()[2] for line in result.output.splitlines()[2:]]
+    assert labels == [f"holding-{i}" for i in range(23)]
+
+
+def test_find_page_fails_part_way(start_stand_in, monkeypatch):
+    start_stand_in(find_files=25)
+    first_page = list(cltr.iter_find_files("bench", "bench", page_size=10, limit=10))
+
+    def _iter_find_files(*args, **kwargs):
+        yield from first_page
+        raise ServerError("The server returned the same page of records twice.")
+
+    monkeypatch.setattr(cltr, "iter_find_files", _iter_find_files)
+    result = CliRunner().invoke(nlds_client, ["find", "--page_size", "10"])
+    # the files already found are listed, followed by the error, not a traceback
+    assert result.exit_code == 2
+    assert "file9.nc" in result.output
+    assert "Error: The server returned the same page" in result.output
+
+
+@pytest.mark.parametrize("command", ["find", "list"])
+def test_page_size_with_json(command):
+    result = CliRunner().invoke(nlds_client, [command, "--page_size", "10", "--json"])
+    assert result.exit_code == 2
+    assert "--page_size cannot be used with --json" in result.output
@@ -0,0 +1,28 @@
+import pstats
+import tracemalloc
+
+from click.testing import CliRunner
+
+from nlds_client.nlds_client import nlds_client
+
+
+def test_profile_option(tmp_path):
+    path = tmp_path / "out.prof"
+    result = CliRunner().invoke(
+        nlds_client, ["--profile", str(path), "--profile_memory", "--version"]
+    )
+    assert result.exit_code == 0
+    assert f"Profile written to {path}" in result.output
+    assert pstats.Stats(str(path)).total_calls > 0
+    snapshot = tracemalloc.Snapshot.load(f"{path}.tracemalloc")
+    assert snapshot.traces is not None
+
+
+def test_profile_environment_variable(tmp_path):
+    path = tmp_path / "env.prof"
+    result = CliRunner().invoke(
+        nlds_client, ["--version"], env={"NLDS_PROFILE": str(path)}
+    )
+    assert result.exit_code == 0
+    assert path.exists()
+    assert not (tmp_path / "env.prof.tracemalloc").exists()
@@ -0,0 +1,55 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from nlds_client.clientlib.resolve import PathResolver, resolve_paths
+
+
+@pytest.fixture
+def tree(tmp_path):
+    # real/sub/file, a link to the real directory and a link to the file
+    (tmp_path / "real" / "sub").mkdir(parents=True)
+    (tmp_path / "real" / "sub" / "file").write_text("x")
+    (tmp_path / "dirlink").symlink_to(tmp_path / "real")
+    (tmp_path / "real" / "filelink").symlink_to(tmp_path / "real" / "sub" / "file")
+    return tmp_path
+
+
+def _paths(root):
+    return [
+        str(root / "real" / "sub" / "file"),
+        str(root / "dirlink" / "sub" / "file"),
+        str(root / "dirlink" / "filelink"),
+        str(root / "dirlink" / "sub" / ".." / "filelink"),
+        str(root / "dirlink" / "missing" / "file"),
+        str(root / "dirlink") + "/./sub//file",
+        "relative/file",
+        "/",
+    ]
+
+
+def test_resolver_matches_pathlib(tree, monkeypatch):
+    monkeypatch.chdir(tree / "dirlink")
+    resolver = PathResolver()
+    for path in _paths(tree):
+        assert resolver.resolve(path) == str(Path(path).resolve()), path
+
+
+def test_resolver_caches_directories(tree, monkeypatch):
+    calls = []
+    islink = os.path.islink
+    monkeypatch.setattr(os.path, "islink", lambda p: calls.append(p) or islink(p))
+    resolver = PathResolver()
+    resolver.resolve(str(tree / "dirlink" / "sub" / "file"))
+    calls.clear()
+    resolver.resolve(str(tree / "dirlink" / "sub" / "other"))
+    # only the file itself is checked, the directories are cached
+    assert calls == [str(tree / "real" / "sub" / "other")]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_resolve_paths_order(tree, workers):
+    paths = [str(tree / "dirlink" / "sub" / f"f{i}") for i in range(1000)]
+    resolved = [fp for fp in resolve_paths((p for p in paths), workers=workers)]
+    assert resolved == [str(tree / "real" / "sub" / f"f{i}") for i in range(1000)]
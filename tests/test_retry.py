@@ -0,0 +1,97 @@
+import pytest
+
+from nlds_client.clientlib import retry
+from nlds_client.clientlib.exceptions import UsageError
+
+TID = "0b0e4e4e-7d0b-4a4b-9c4e-2f7e6a9c1d11"
+
+
+def _record(transaction_id, api_action, failed, job_label="job", label="hold"):
+    return {
+        "transaction_id": transaction_id,
+        "api_action": api_action,
+        "job_label": job_label,
+        "label": label,
+        "sub_records": [
+            {
+                "state": "FAILED",
+                "failed_files": [
+                    {"filepath": fp, "reason": reason} for fp, reason in failed
+                ],
+            }
+        ],
+    }
+
+
+def test_is_transaction_id():
+    assert retry.is_transaction_id(TID)
+    assert not retry.is_transaction_id("my-job")
+
+
+def test_collect_failed_files_dedupes():
+    records = [
+        _record("t1", "putlist", [("/a", "timeout"), ("/b", "timeout")]),
+        _record("t2", "put", [("/a", "other"), ("/c", "timeout")], job_label="j2"),
+        _record("t3", "getlist", [("/a", "timeout")]),
+        _record("t4", "meta", [("/d", "timeout")]),
+    ]
+    groups = retry.collect_failed_files(records)
+    assert sorted(groups) == [("get", "hold"), ("put", "hold")]
+    put = groups[("put", "hold")]
+    assert put["job_labels"] == ["job", "j2"]
+    # the first reason a file failed with is kept
+    assert put["files"] == {"/a": "timeout", "/b": "timeout", "/c": "timeout"}
+
+
+def test_is_permanent_failure(tmp_path):
+    present = tmp_path / "present"
+    present.write_text("x")
+    patterns = ["does not exist"]
+    assert retry.is_permanent_failure("get", "/x", "Path Does Not Exist", patterns)
+    assert not retry.is_permanent_failure("put", str(present), "timeout", patterns)
+    # a file to put that has since been removed cannot be retried
+    missing = str(tmp_path / "missing")
+    assert retry.is_permanent_failure("put", missing, "timeout", patterns)
+    assert not retry.is_permanent_failure("get", missing, "timeout", patterns)
+
+
+def test_retry_failed_files(tmp_path, monkeypatch):
+    ok = [str(tmp_path / f"f{i}") for i in range(3)]
+    for fp in ok:
+        open(fp, "w").close()
+    records = {
+        TID: [_record(TID, "putlist", [(ok[0], "timeout"), ("/gone", "timeout")])],
+        "job": [
+            _record("t2", "putlist", [(ok[1], "timeout"), (ok[0], "timeout")]),
+            _record("t3", "putlist", [(ok[2], "No such file or directory")]),
+        ],
+    }
+
+    def _fetch(user, group, groupall, transaction_ids, job_label=None):
+        if job_label is not None:
+            return iter(records[job_label])
+        return iter(r for t in transaction_ids for r in records[t])
+
+    submitted = []
+
+    def _put(filelist, user, group, job_label, label, chunk_files, workers):
+        submitted.append((list(filelist), job_label, label, chunk_files))
+        return {"success": True, "msg": "PUTLIST"}
+
+    monkeypatch.setattr(retry, "load_config", lambda: {})
+    monkeypatch.setattr(retry, "fetch_transaction_records", _fetch)
+    monkeypatch.setattr(retry, "put_filelist_chunked", _put)
+
+    response = retry.retry_failed_files([TID], ["job"], dry_run=True)
+    assert submitted == []
+    assert response["retry"][0]["filelist"] == [ok[0], ok[1]]
+    assert sorted(response["dropped"]) == ["/gone", ok[2]]
+
+    response = retry.retry_failed_files([TID], ["job"], chunk_files=10)
+    assert response["success"]
+    assert submitted == [([ok[0], ok[1]], "job-retry", "hold", 10)]
+
+
+def test_retry_needs_transactions():
+    with pytest.raises(UsageError):
+        retry.retry_failed_files()
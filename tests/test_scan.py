@@ -0,0 +1,43 @@
+import os
+
+from nlds_client.clientlib.scan import scan_tree
+
+
+def _make_tree(root):
+    paths = []
+    for d in range(5):
+        for s in range(3):
+            directory = root / f"d{d}" / f"s{s}"
+            directory.mkdir(parents=True)
+            for f in range(4):
+                ext = "nc" if f % 2 == 0 else "txt"
+                path = directory / f"f{f}.{ext}"
+                path.write_bytes(b"x" * f)
+                paths.append(str(path))
+    (root / "top.nc").write_bytes(b"")
+    paths.append(str(root / "top.nc"))
+    return paths
+
+
+def test_scan_tree_finds_all_files(tmp_path):
+    paths = _make_tree(tmp_path)
+    found = dict(scan_tree(str(tmp_path), workers=4))
+    assert sorted(found) == sorted(paths)
+    assert found[str(tmp_path / "d0" / "s0" / "f3.txt")] == 3
+
+
+def test_scan_tree_include_exclude(tmp_path):
+    _make_tree(tmp_path)
+    found = [p for p, _ in scan_tree(str(tmp_path), include=["*.nc"], exclude=["d1"])]
+    assert len(found) == 4 * 3 * 2 + 1
+    assert all(p.endswith(".nc") for p in found)
+    assert not any(os.sep + "d1" + os.sep in p for p in found)
+    found = [p for p, _ in scan_tree(str(tmp_path), exclude=["*/s2/*"])]
+    assert len(found) == 5 * 2 * 4 + 1
+
+
+def test_scan_tree_stop_early(tmp_path):
+    _make_tree(tmp_path)
+    tree = scan_tree(str(tmp_path), workers=2)
+    assert len([next(tree) for _ in range(3)]) == 3
+    tree.close()
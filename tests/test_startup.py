@@ -0,0 +1,20 @@
+import json
+import subprocess
+import sys
+
+
+def test_version_does_not_import_requests():
+    # the modules that make requests are only imported when a command runs
+    code = (
+        "import sys, json; sys.argv = ['nlds', '--version'];"
+        "from nlds_client.nlds_client import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass\n"
+        "print(json.dumps([m for m in ['requests', "
+        "'nlds_client.clientlib.transactions'] if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    lines = result.stdout.splitlines()
+    assert lines[0].startswith("Near Line Data Store client")
+    assert json.loads(lines[-1]) == []
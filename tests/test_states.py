@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+from nlds_client.clientlib.states import aggregate_transaction_states
+from nlds_client.clientlib.transactions import get_transaction_state
+
+
+def _record(idd, states, warnings=None):
+    tr = {
+        "id": idd,
+        "creation_time": "2024-01-01T00:00:00",
+        "sub_records": [
+            {"state": s, "last_updated": t} for s, t in states
+        ],
+    }
+    if warnings is not None:
+        tr["warnings"] = warnings
+    return tr
+
+
+RECORDS = [
+    _record(1, [("COMPLETE", "2024-01-02T10:00:00"), ("ROUTING", "2024-01-02T09:00:00.5")]),
+    _record(2, [("COMPLETE", "2024-01-02T10:00:00"), ("FAILED", "2024-01-03T00:00:00")]),
+    _record(3, [("COMPLETE", "2024-01-02T10:00:00"), ("SPLIT", "2024-01-01T00:00:00")], ["w"]),
+    _record(4, [("SEARCHING", "2024-01-05T00:00:00")]),
+    _record(5, [("COMPLETE", "2024-01-02T10:00:00")] * 2 + [("TRANSFER_PUTTING", "2024-01-02T10:00:00.25")]),
+]
+
+EXPECTED = [
+    ("ROUTING", datetime(2024, 1, 2, 10), 50),
+    ("COMPLETE_WITH_ERRORS", datetime(2024, 1, 3), 50),
+    ("COMPLETE_WITH_WARNINGS", datetime(2024, 1, 2, 10), 100),
+    ("QUEUED", datetime(2024, 1, 1), 0),
+    ("TRANSFER_PUTTING", datetime(2024, 1, 2, 10, 0, 0, 250000), 67),
+]
+
+
+@pytest.mark.parametrize("tr, expected", list(zip(RECORDS, EXPECTED)))
+def test_get_transaction_state(tr, expected):
+    assert get_transaction_state(tr) == expected
+
+
+def test_aggregate_transaction_states():
+    states = aggregate_transaction_states(iter(RECORDS))
+    assert len(states) == len(RECORDS)
+    assert [states.state(i) for i in range(len(states))] == EXPECTED
+    assert states.ids == [1, 2, 3, 4, 5]
+    assert states.counts() == {
+        "ROUTING": 1,
+        "TRANSFER_PUTTING": 1,
+        "COMPLETE_WITH_ERRORS": 1,
+        "COMPLETE_WITH_WARNINGS": 1,
+        "QUEUED": 1,
+    }
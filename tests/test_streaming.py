@@ -0,0 +1,163 @@
+import json
+import random
+
+import pytest
+from click.testing import CliRunner
+
+import nlds_client.clientlib.streaming as clstr
+import nlds_client.clientlib.exceptions as exc
+import nlds_client.clientlib.transactions as cltr
+from nlds_client.nlds_client import nlds_client, print_find_records
+
+FIND_PATH = ("data", "holdings", "*", "transactions", "*", "filelist", "*")
+
+
+@pytest.fixture
+def find_response():
+    return {
+        "details": {"user": "test", "group": "test_group"},
+        "data": {
+            "holdings": {
+                f"h{h}": {
+                    "holding_id": h,
+                    "label": f'label "{h}" é\U0001f600',
+                    "transactions": {
+                        f"t{t}": {
+                            "ingest_time": "2024-01-01T00:00:00",
+                            "filelist": [
+                                {"original_path": f"/{h}/{t}/{i}", "size": i * 1.5}
+                                for i in range(3)
+                            ],
+                        }
+                        for t in range(2)
+                    },
+                }
+                for h in range(3)
+            }
+        },
+        "msg": "after the data",
+    }
+
+
+def _random_chunks(text, max_size=16):
+    """Split the text into randomly sized chunks of bytes"""
+    data = text.encode()
+    pos = 0
+    while pos < len(data):
+        size = random.randint(1, max_size)
+        yield data[pos : pos + size]
+        pos += size
+
+
+def _expected_files(response):
+    return [
+        (h["label"], transaction_id, f)
+        for h in response["data"]["holdings"].values()
+        for transaction_id, t in h["transactions"].items()
+        for f in t["filelist"]
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_stream_double_encoded(find_response, seed):
+    random.seed(seed)
+    text = json.dumps(json.dumps(find_response))
+    stream = clstr.JSONItemStream(
+        clstr.unwrap_json_string(clstr.iter_text(_random_chunks(text))),
+        FIND_PATH,
+        # the transactions are keyed by their transaction id
+        transform=lambda c, f, k: (c[3]["label"], k[4], f),
+    )
+    assert list(stream) == _expected_files(find_response)
+    # the root contains everything that is not on the path
+    assert stream.root == {
+        "details": find_response["details"],
+        "msg": find_response["msg"],
+    }
+
+
+def test_stream_single_encoded(find_response):
+    text = json.dumps(find_response)
+    stream = clstr.JSONItemStream(
+        clstr.unwrap_json_string([text[:10], text[10:]]), ("data", "holdings", "*")
+    )
+    assert [h["holding_id"] for h in stream] == [0, 1, 2]
+
+
+def test_stream_number_split_across_chunks():
+    stream = clstr.JSONItemStream(['{"a": [12', "34, 5.", "5]}"], ("a", "*"))
+    assert list(stream) == [1234, 5.5]
+
+
+def test_stream_close_called():
+    closed = []
+    stream = clstr.JSONItemStream(
+        ['{"a": [1, 2, 3]}'], ("a", "*"), close=lambda: closed.append(True)
+    )
+    for _ in stream:
+        break
+    del _
+    stream.close()
+    assert closed == [True]
+
+
+def test_stream_truncated():
+    with pytest.raises(exc.ServerError):
+        list(clstr.JSONItemStream(['{"a": [1, 2'], ("a", "*")))
+    with pytest.raises(exc.ServerError):
+        list(clstr.unwrap_json_string(['"{\\"a\\": 1']))
+
+
+@pytest.mark.parametrize("params", [{}, {"label": "l", "tag": {"a": "b"}}])
+def test_json_body_stream(params):
+    filelist = [f'/dir/"{i}" é' for i in range(1000)]
+    body = clstr.JSONBodyStream(params, "filelist", filelist, chunk_size=100)
+    chunks = [c for c in body]
+    assert len(chunks) > 1
+    assert json.loads(b"".join(chunks)) == dict(params, filelist=filelist)
+
+
+def test_json_body_stream_replays_iterator():
+    # a generator can only be iterated over once, so the items are spooled and
+    # replayed when the body is sent again, even if the first send was cut short
+    filelist = [f"/dir/{i}" for i in range(100)]
+    body = clstr.JSONBodyStream({}, "filelist", iter(filelist), chunk_size=50)
+    first = iter(body)
+    next(first)
+    next(first)
+    first.close()
+    for _ in range(2):
+        assert json.loads(b"".join(body)) == {"filelist": filelist}
+    body.close()
+
+
+def test_print_find_records_header(capsys):
+    def _file(holding_id, i):
+        h = {"holding_id": holding_id, "label": f"h{holding_id}", "user": "u"}
+        t = {"transaction_id": "t", "ingest_time": "2024-01-29T12:00:00"}
+        f = {"original_path": f"/f{i}", "path_type": "FILE", "size": i, "locations": []}
+        return h, t, f
+
+    # the first two files are in the same holding, but the third is not
+    files = [_file(1, 0), _file(1, 1), _file(2, 2)]
+    print_find_records(iter(files), "user:u", False, False)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "Listing files for holding(s) for user:u"
+    assert len(lines) == 5
+
+
+@pytest.mark.parametrize("args", [[], ["--watch"]])
+def test_stat_truncated_response(start_stand_in, monkeypatch, args):
+    start_stand_in()
+    # the connection is dropped part way through the first record
+    text = '{"data": {"records": [{"id": 1, "transaction_id": "t1", "sub_rec'
+
+    def _stream(*args, **kwargs):
+        stream = clstr.JSONItemStream([text], ("data", "records", "*"))
+        stream.root["success"] = True
+        return stream
+
+    monkeypatch.setattr(cltr, "stream_monitor_transactions", _stream)
+    result = CliRunner().invoke(nlds_client, ["stat"] + args)
+    assert result.exit_code == 2
+    assert "Error: The response from the server" in result.output
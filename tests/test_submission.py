@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+import nlds_client.clientlib.submission as clsub
+
+
+def test_chunk_filelist_by_count():
+    chunks = list(clsub.chunk_filelist((f"/f{i}" for i in range(7)), max_files=3))
+    assert chunks == [["/f0", "/f1", "/f2"], ["/f3", "/f4", "/f5"], ["/f6"]]
+
+
+def test_chunk_filelist_by_bytes(tmp_path):
+    files = []
+    for i, size in enumerate([10, 10, 25, 5, 1]):
+        fp = tmp_path / f"f{i}"
+        fp.write_bytes(b"x" * size)
+        files.append(str(fp))
+    chunks = list(clsub.chunk_filelist(files, max_bytes=20))
+    # the 25 byte file is larger than max_bytes so goes into a chunk on its own
+    assert chunks == [files[0:2], files[2:3], files[3:5]]
+
+
+def test_chunk_filelist_with_sizes(monkeypatch):
+    # the sizes given with the filepaths are used, rather than read again
+    monkeypatch.setattr(clsub.os, "lstat", None)
+    filelist = [("/a", 6), ("/b", 5), ("/c", 4), ("/d", 20)]
+    chunks = list(clsub.chunk_filelist(filelist, max_bytes=10))
+    assert chunks == [["/a"], ["/b", "/c"], ["/d"]]
+
+
+def test_chunk_filelist_no_limit():
+    assert list(clsub.chunk_filelist(["/a", "/b"])) == [["/a", "/b"]]
+    assert list(clsub.chunk_filelist([], max_files=2)) == []
+
+
+def test_submit_chunks_order_and_concurrency():
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def _submit(chunk):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return {"n": len(chunk), "first": chunk[0]}
+
+    chunks = [[f"/f{i}"] * (i + 1) for i in range(10)]
+    responses = clsub.submit_chunks(_submit, iter(chunks), workers=3)
+    assert [r["first"] for r in responses] == [c[0] for c in chunks]
+    assert 1 < max_in_flight <= 3
+
+
+def test_put_filelist_chunked_names_holding(tmp_path, monkeypatch):
+    # every chunk must name the holding, or each would create a new holding
+    submitted = []
+    fail = set()
+
+    def _put_filelist(chunk, user, group, job_label, label, holding_id, tag, *args):
+        submitted.append((job_label, label, holding_id, tag))
+        return {"msg": "ok", "success": chunk[0] not in fail}
+
+    config = {"options": {"checkpoint_dir": str(tmp_path)}}
+    monkeypatch.setattr(clsub, "load_config", lambda: config)
+    monkeypatch.setattr(clsub, "put_filelist", _put_filelist)
+    files = [f"/f{i}" for i in range(6)]
+
+    def _put(job_label="job", resume=False, **kwargs):
+        submitted.clear()
+        return clsub.put_filelist_chunked(
+            files,
+            "user",
+            "group",
+            job_label,
+            chunk_files=2,
+            workers=3,
+            resume=resume,
+            **kwargs,
+        )
+
+    # the holding label is new for each submission, not the job label, so that
+    # reusing a job label does not add to the holding of the previous job
+    fail.add("/f2")
+    assert not _put()["success"]
+    label = submitted[0][1]
+    assert label not in (None, "job")
+    assert submitted == [("job", label, None, None)] * 3
+    # the same holding is used when the submission is resumed
+    fail.clear()
+    assert _put(resume=True)["success"]
+    assert submitted == [("job", label, None, None)]
+    _put()
+    assert submitted[0][1] != label
+
+    _put(holding_id=7)
+    assert submitted == [("job", None, 7, None)] * 3
+    # the holding is chosen by its tags
+    _put(tag={"k": "v"})
+    assert submitted == [("job", None, None, {"k": "v"})] * 3
+
+
+def test_submit_chunks_stops_on_error():
+    submitted = []
+
+    def _submit(chunk):
+        submitted.append(chunk[0])
+        if chunk[0] == "/f1":
+            raise ConnectionError("no server")
+        return {}
+
+    chunks = ([f"/f{i}"] for i in range(100))
+    with pytest.raises(ConnectionError):
+        clsub.submit_chunks(_submit, chunks, workers=1)
+    assert submitted == ["/f0", "/f1"]
+
+
+def test_aggregate_responses():
+    responses = [
+        {"transaction_id": "a", "success": True},
+        {"transaction_id": "b", "success": False},
+    ]
+    agg = clsub.aggregate_responses("PUT", "job", responses)
+    assert agg["transaction_ids"] == ["a", "b"]
+    assert agg["job_label"] == "job"
+    assert not agg["success"]
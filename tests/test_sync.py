@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+import nlds_client.clientlib.sync as clsync
+from nlds_client.clientlib.streaming import JSONItemStream
+from nlds_client.clientlib.transactions import _find_file_transform
+
+
+def _find_stream(files, failure=None):
+    document = {
+        "data": {
+            "holdings": {
+                "label": {
+                    "transactions": {"t1": {"transaction_id": "t1", "filelist": files}}
+                }
+            }
+        }
+    }
+    stream = JSONItemStream(
+        [json.dumps(document)],
+        ("data", "holdings", "*", "transactions", "*", "filelist", "*"),
+        _find_file_transform,
+    )
+    stream.root["success"] = failure is None
+    if failure is not None:
+        stream.root["msg"] = "FIND files failed"
+        stream.root["details"] = {"failure": failure}
+    return stream
+
+
+def test_sync_directory(tmp_path, monkeypatch):
+    (tmp_path / "sub").mkdir()
+    for name, size in [("a", 1), ("b", 2), ("sub/c", 3), ("sub/d", 4)]:
+        (tmp_path / name).write_bytes(b"x" * size)
+    archived = [
+        {"original_path": str(tmp_path / "a"), "size": 1},
+        {"original_path": str(tmp_path / "b"), "size": 5},
+        {"original_path": str(tmp_path / "sub/c"), "size": 3},
+    ]
+    monkeypatch.setattr(
+        clsync, "stream_find_file", lambda *args, **kwargs: _find_stream(archived)
+    )
+    submitted = []
+
+    def _put(filelist, *args, **kwargs):
+        submitted.extend(filelist)
+        return {"success": True}
+
+    monkeypatch.setattr(clsync, "put_filelist_chunked", _put)
+
+    result = clsync.sync_directory(str(tmp_path), "label", scan_workers=2, dry_run=True)
+    assert sorted(result["filelist"]) == [str(tmp_path / "b"), str(tmp_path / "sub/d")]
+    assert submitted == []
+
+    result = clsync.sync_directory(str(tmp_path), "label", scan_workers=2)
+    assert (result["new"], result["changed"], result["unchanged"]) == (1, 1, 2)
+    # with the sizes from the scan, so that they are not read again
+    assert sorted(submitted) == [(str(tmp_path / "b"), 2), (str(tmp_path / "sub/d"), 4)]
+    assert result["success"]
+
+
+def test_sync_directory_nothing_to_submit(tmp_path, monkeypatch):
+    (tmp_path / "a").write_bytes(b"x")
+    archived = [{"original_path": str(tmp_path / "a"), "size": 1}]
+    monkeypatch.setattr(
+        clsync, "stream_find_file", lambda *args, **kwargs: _find_stream(archived)
+    )
+    monkeypatch.setattr(clsync, "put_filelist_chunked", None)
+    result = clsync.sync_directory(str(tmp_path), "label", scan_workers=2)
+    assert result["unchanged"] == 1
+    assert "response" not in result
+
+
+def test_archived_files_holding_not_found(tmp_path, monkeypatch):
+    failure = "Holding with label:label not found"
+    monkeypatch.setattr(
+        clsync, "stream_find_file", lambda *args, **kwargs: _find_stream([], failure)
+    )
+    assert clsync.archived_files("label", str(tmp_path)) == {}
+
+
+def test_archived_files_find_failed(tmp_path, monkeypatch):
+    # a failure that is not the holding being absent must not be taken as an empty
+    # holding, or the whole directory would be submitted again
+    failure = "User:bob does not have permission to read holding with label:label"
+    monkeypatch.setattr(
+        clsync, "stream_find_file", lambda *args, **kwargs: _find_stream([], failure)
+    )
+    with pytest.raises(clsync.ServerError, match="permission"):
+        clsync.archived_files("label", str(tmp_path))
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from nlds_client.clientlib import timings
+from nlds_client.nlds_client import nlds_client
+
+
+@pytest.fixture
+def enabled():
+    timings.enable()
+    yield
+    timings.disable()
+
+
+def test_disabled_records_nothing():
+    timings.disable()
+    with timings.phase("http"):
+        pass
+    timings.count("bytes_sent", 10)
+    assert list(timings.timed_iter("http", [1, 2])) == [1, 2]
+
+
+def test_phases_are_exclusive(enabled):
+    with timings.phase("render"):
+        time.sleep(0.02)
+        with timings.phase("http"):
+            time.sleep(0.05)
+    r = timings.results()
+    assert r["phases"]["http"]["calls"] == 1
+    assert r["phases"]["http"]["seconds"] >= 0.05
+    # the nested http phase is not counted in render
+    assert 0.02 <= r["phases"]["render"]["seconds"] < 0.05
+    assert r["total"] >= 0.07
+
+
+def test_timed_and_counters(enabled):
+    @timings.timed("decode")
+    def decode(x):
+        return x * 2
+
+    assert decode(2) == 4
+    assert list(timings.timed_iter("http", iter([b"ab", b"c"]))) == [b"ab", b"c"]
+    timings.count("bytes_received", 3)
+    timings.count("retries")
+    r = timings.results()
+    assert r["phases"]["decode"]["calls"] == 1
+    # one call per item, and one for the end of the iterator
+    assert r["phases"]["http"]["calls"] == 3
+    assert r["counters"] == {"bytes_received": 3, "retries": 1}
+    report = timings.report()
+    assert report.index("http") < report.index("decode") < report.index("total")
+    assert "retries" in report
+
+
+def test_timings_option():
+    result = CliRunner().invoke(nlds_client, ["--timings", "--version"])
+    timings.disable()
+    assert result.exit_code == 0
+    assert "Near Line Data Store client" in result.output
+    assert "render" not in result.output
+    assert "total" in result.output
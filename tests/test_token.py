@@ -0,0 +1,89 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import nlds_client.clientlib.authentication as clau
+import nlds_client.clientlib.exceptions as exc
+
+
+def _config(tmp_path):
+    return {
+        "authentication": {"oauth_token_file_location": str(tmp_path / "token")},
+        "options": {"token_refresh_margin": 60},
+    }
+
+
+def test_load_token_cached_until_file_changes(tmp_path, monkeypatch):
+    config = _config(tmp_path)
+    clau.save_token(config, {"access_token": "a"})
+    # the cached token is returned without reading the file again
+    monkeypatch.setattr("builtins.open", None)
+    assert clau.load_token(config) == {"access_token": "a"}
+    monkeypatch.undo()
+
+    token_file = config["authentication"]["oauth_token_file_location"]
+    with open(token_file, "w") as fh:
+        json.dump({"access_token": "bb"}, fh)
+    assert clau.load_token(config) == {"access_token": "bb"}
+
+
+def test_get_token_refreshes_before_expiry(tmp_path, monkeypatch):
+    config = _config(tmp_path)
+    clau.save_token(config, {"access_token": "a", "expires_at": time.time() + 3600})
+    monkeypatch.setattr(clau, "fetch_oauth2_token_from_refresh", None)
+    assert clau.get_token(config)["access_token"] == "a"
+
+    clau.save_token(config, {"access_token": "a", "expires_at": time.time() + 30})
+    monkeypatch.setattr(
+        clau, "fetch_oauth2_token_from_refresh", lambda c, t: {"access_token": "new"}
+    )
+    assert clau.get_token(config)["access_token"] == "new"
+
+    def _fail(c, t):
+        raise exc.RequestError("refresh failed")
+
+    # a failed refresh falls back to the existing token
+    monkeypatch.setattr(clau, "fetch_oauth2_token_from_refresh", _fail)
+    assert clau.get_token(config)["access_token"] == "a"
+
+
+def test_set_token_expiry():
+    token = {"expires_in": 300}
+    clau._set_token_expiry(token)
+    assert abs(token["expires_at"] - time.time() - 300) < 5
+
+
+def test_concurrent_refresh_only_refreshes_once(tmp_path, monkeypatch):
+    config = _config(tmp_path)
+    stale = {"access_token": "old", "refresh_token": "r"}
+    clau.save_token(config, stale)
+    calls = []
+
+    def _refresh(config, token):
+        calls.append(token)
+        time.sleep(0.05)
+        new = {"access_token": f"new{len(calls)}"}
+        clau._write_token(config, new)
+        return new
+
+    monkeypatch.setattr(clau, "_refresh_token", _refresh)
+    with ThreadPoolExecutor(8) as executor:
+        tokens = list(
+            executor.map(
+                lambda _: clau.fetch_oauth2_token_from_refresh(config, stale),
+                range(8),
+            )
+        )
+    assert len(calls) == 1
+    assert all(t["access_token"] == "new1" for t in tokens)
+
+
+def test_remove_token_keeps_newer_token(tmp_path):
+    config = _config(tmp_path)
+    token_file = config["authentication"]["oauth_token_file_location"]
+    clau.save_token(config, {"access_token": "new"})
+    clau.remove_token(config, {"access_token": "old"})
+    assert os.path.exists(token_file)
+    clau.remove_token(config, {"access_token": "new"})
+    assert not os.path.exists(token_file)